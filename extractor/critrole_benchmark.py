@@ -0,0 +1,874 @@
+import argparse
+import colorsys
+import copy
+import json
+import logging
+import multiprocessing
+import multiprocessing.pool
+import tempfile
+import time
+from os import path
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from extractor import (cache, color, constants, data, executor, image, io,
+                       model, prefetch, scenecut, scheduler, search)
+
+logging.basicConfig(level=logging.INFO)
+
+TESTING = path.join(path.dirname(path.abspath(__file__)), "tests", "testdata")
+
+
+def _measure(function: Callable[[], object], repetitions: int) -> float:
+    """Returns the average runtime of the function in seconds."""
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        function()
+    return (time.perf_counter() - start) / repetitions
+
+
+def benchmark_similarity(arguments: argparse.Namespace):
+    from sewar.full_ref import uqi
+
+    mask, reference, _, _ = io.find_frames(arguments.frames, arguments.quality)
+    frame = io.load_frame(arguments.frame)
+
+    def sewar_similarity():
+        return float(uqi(image.apply_mask(frame, mask), image.apply_mask(reference, mask)))
+
+    similarity = image.MaskedSimilarity(reference, mask)
+
+    expected = sewar_similarity()
+    actual = similarity(frame)
+    logging.info(
+        f"UQI sewar={expected:.12f} native={actual:.12f} (difference {abs(expected-actual):.2e})")
+
+    sewar_time = _measure(sewar_similarity, arguments.repetitions)
+    native_time = _measure(lambda: similarity(frame), arguments.repetitions)
+    logging.info(
+        f"sewar {sewar_time*1000:.1f}ms, native {native_time*1000:.1f}ms per frame (speedup {sewar_time/native_time:.1f}x)")
+
+
+def benchmark_video(arguments: argparse.Namespace):
+    video = data.VideoFile(arguments.video)
+    indexed = data.VideoFile(arguments.video, keyframes=True)
+    # Random order to include backward seeks.
+    seconds = np.random.default_rng(0).uniform(
+        0, video.length, arguments.frames)
+
+    def reopen():
+        for second in seconds:
+            io.get_frame(arguments.video, second)
+
+    def reuse():
+        for second in seconds:
+            video.get_frame(second)
+
+    def reuse_indexed():
+        for second in seconds:
+            indexed.get_frame(second)
+
+    reopen_time = _measure(reopen, arguments.repetitions) / len(seconds)
+    reuse_time = _measure(reuse, arguments.repetitions) / len(seconds)
+    indexed_time = _measure(
+        reuse_indexed, arguments.repetitions) / len(seconds)
+    video.close()
+    logging.info(
+        f"open per frame {reopen_time*1000:.1f}ms, reused capture {reuse_time*1000:.1f}ms, with keyframe index {indexed_time*1000:.1f}ms per frame (speedup {reopen_time/indexed_time:.1f}x)")
+
+
+def benchmark_scan(arguments: argparse.Namespace):
+    video = data.VideoFile(arguments.video, keyframes=arguments.keyframes)
+    seconds = list(np.arange(0, video.length, arguments.step))
+    seeking = data.VideoFile(
+        arguments.video, seek_cost=0, keyframes=arguments.keyframes)
+
+    def seek():
+        for _ in seeking.frames(seconds):
+            pass
+
+    def scan():
+        for _ in video.frames(seconds):
+            pass
+
+    seek_time = _measure(seek, arguments.repetitions) / len(seconds)
+    scan_time = _measure(scan, arguments.repetitions) / len(seconds)
+    video.close()
+    logging.info(
+        f"seeking {seek_time*1000:.1f}ms, streaming {scan_time*1000:.1f}ms per frame every {arguments.step:.1f}s (speedup {seek_time/scan_time:.1f}x)")
+
+
+def benchmark_cache(arguments: argparse.Namespace):
+    video = data.VideoFile(arguments.video, keyframes=arguments.keyframes)
+    seconds = np.random.default_rng(0).uniform(
+        0, video.length, arguments.frames)
+
+    with tempfile.TemporaryDirectory() as directory:
+        frames = cache.FrameCache(video, directory)
+        for second in seconds:
+            frames.get_frame(second)
+
+        def decode():
+            for second in seconds:
+                video.get_frame(second)
+
+        def cached():
+            for second in seconds:
+                frames.get_frame(second)
+
+        decode_time = _measure(decode, arguments.repetitions) / len(seconds)
+        cached_time = _measure(cached, arguments.repetitions) / len(seconds)
+    video.close()
+    logging.info(
+        f"decoding {decode_time*1000:.1f}ms, cached {cached_time*1000:.2f}ms per frame (speedup {decode_time/cached_time:.0f}x)")
+
+
+class _Latency(data.FrameGenerator):
+    def __init__(self, generator: data.FrameGenerator, latency: float):
+        """Emulates the network latency of a remote video."""
+        self._generator = generator
+        self._latency = latency
+
+    def get_frame(self, second: float):
+        time.sleep(self._latency)
+        return self._generator.get_frame(second)
+
+    def frames(self, seconds):
+        for second, frame in self._generator.frames(seconds):
+            time.sleep(self._latency)
+            yield second, frame
+
+    @property
+    def length(self) -> float:
+        return self._generator.length
+
+
+def benchmark_prefetch(arguments: argparse.Namespace):
+    mask, reference, hues, temps = io.find_frames(TESTING, "hd")
+    extractor = search.Extractor(color.Color(), hues, temps, mask, reference)
+    video = _Latency(data.VideoFile(
+        arguments.video, keyframes=arguments.keyframes), arguments.latency)
+    prefetcher = prefetch.Prefetcher(video, arguments.lookahead)
+    seconds = list(np.arange(0, video.length, arguments.step))
+
+    def process(frames: data.FrameGenerator):
+        for _, frame in frames.frames(seconds):
+            if extractor.is_valid(frame):
+                extractor.extract(frame)
+
+    direct_time = _measure(lambda: process(video),
+                           arguments.repetitions) / len(seconds)
+    prefetch_time = _measure(lambda: process(prefetcher),
+                             arguments.repetitions) / len(seconds)
+    video.close()
+    logging.info(
+        f"direct {direct_time*1000:.1f}ms, prefetched {prefetch_time*1000:.1f}ms per frame (speedup {direct_time/prefetch_time:.1f}x, {prefetcher.counters})")
+
+
+class _SyntheticVideo(data.FrameGenerator):
+    def __init__(self, length: float, latency: float):
+        """Frames are their index at 60fps and take `latency` seconds to obtain."""
+        self._length = length
+        self._latency = latency
+
+    def get_frame(self, second: float):
+        time.sleep(self._latency)
+        return np.array([round(second * 60)])
+
+    @property
+    def frame_rate(self):
+        return 60.0
+
+    @property
+    def length(self) -> float:
+        return self._length
+
+
+class _SyntheticExtractor(search.AbstractExtractor):
+    def __init__(self, transitions: list[float]):
+        """The color changes at the given seconds."""
+        self._transitions = [round(t * 60) for t in transitions]
+
+    def is_valid(self, frame) -> bool:
+        return True
+
+    def extract(self, frame) -> model.ColorUpdate:
+        return model.ColorUpdate([], [float(np.searchsorted(self._transitions, frame.item(), side="right"))])
+
+    def similar(self, update1: model.ColorUpdate, update2: model.ColorUpdate) -> bool:
+        return update1._temps == update2._temps
+
+
+def benchmark_refine(arguments: argparse.Namespace):
+    transitions = list(np.random.default_rng(0).uniform(
+        0, arguments.length, arguments.transitions))
+    extractor = _SyntheticExtractor(transitions)
+    video = _SyntheticVideo(arguments.length, arguments.latency)
+
+    with multiprocessing.Pool(arguments.workers) as p:
+        s = search.Search(extractor, video, step=arguments.step, workers=arguments.workers,
+                          refinement_accuracy=arguments.accuracy, quiet=True, pool=p, memoize=False)
+        raw = s._search_raw()
+        pairs = [(first, second) for first, second in zip(
+            raw, raw[1:]) if not extractor.similar(first, second)]
+
+        def per_transition():
+            return list(p.imap(s._refine, pairs))
+
+        def waves():
+            return s._search_compact(copy.deepcopy(raw))
+
+        transition_time = _measure(per_transition, arguments.repetitions)
+        wave_time = _measure(waves, arguments.repetitions)
+    logging.info(
+        f"{len(pairs)} transitions: per transition {transition_time:.2f}s, waves {wave_time:.2f}s (speedup {transition_time/wave_time:.1f}x)")
+
+
+class _CountingVideo(_SyntheticVideo):
+    def __init__(self, length: float):
+        """Counts the frames obtained."""
+        super().__init__(length, 0.0)
+        self.decodes = 0
+
+    def get_frame(self, second: float):
+        self.decodes += 1
+        return super().get_frame(second)
+
+
+class _FadeExtractor(search.AbstractExtractor):
+    def __init__(self, transitions: list[float], fade: float):
+        """The temperature fades by 10 over `fade` seconds from the given seconds on, 1 apart is similar."""
+        self._transitions = np.array(transitions)
+        self._fade = fade
+
+    def is_valid(self, frame) -> bool:
+        return True
+
+    def extract(self, frame) -> model.ColorUpdate:
+        progress = np.clip((frame.item() / 60 - self._transitions) /
+                           self._fade, 0.0, 1.0)
+        return model.ColorUpdate([], [float(progress.sum() * 10)])
+
+    def similar(self, update1: model.ColorUpdate, update2: model.ColorUpdate) -> bool:
+        return self.distance(update1, update2) <= 1
+
+    def distance(self, update1: model.ColorUpdate, update2: model.ColorUpdate) -> float:
+        return abs(update1._temps[0] - update2._temps[0])
+
+
+def benchmark_interpolate(arguments: argparse.Namespace):
+    transitions = sorted(np.random.default_rng(0).uniform(
+        0, arguments.length - arguments.fade, arguments.transitions))
+    extractor = _FadeExtractor(transitions, arguments.fade)
+    video = _CountingVideo(arguments.length)
+
+    for interpolate in [False, True]:
+        s = search.Search(extractor, video, step=arguments.step,
+                          refinement_accuracy=arguments.accuracy, quiet=True, memoize=False, interpolate=interpolate)
+        raw = [s._search_step(step)
+               for step in range(0, int(arguments.length)+1, arguments.step)]
+        pairs = [(first, second) for first, second in zip(
+            raw, raw[1:]) if not extractor.similar(first, second)]
+
+        video.decodes = 0
+        refined = [s._refine(pair) for pair in pairs]
+        # Distance to the middle of the closest fade.
+        errors = [min(abs(timestamp - t - arguments.fade/2)
+                      for t in transitions) for timestamp in refined]
+        logging.info(
+            f"{'interpolation' if interpolate else 'bisection'}: {video.decodes/len(pairs):.1f} frame decodes per transition, {np.mean(errors):.1f}s from the middle of the fade on average ({len(pairs)} transitions)")
+
+
+def benchmark_adaptive(arguments: argparse.Namespace):
+    rng = np.random.default_rng(0)
+    # Clusters of rapid changes within otherwise static stretches.
+    transitions = sorted(t + offset for t in rng.uniform(0, arguments.length - 60, arguments.clusters)
+                         for offset in rng.uniform(0, 60, arguments.cluster_size))
+    extractor = _SyntheticExtractor(transitions)
+    video = _CountingVideo(arguments.length)
+
+    def run(step: int, min_step=None, budget=None):
+        video.decodes = 0
+        with multiprocessing.pool.ThreadPool(1) as p:
+            s = search.Search(extractor, video, step=step, quiet=True, pool=p,
+                              memoize=False, min_step=min_step, budget=budget)
+            raw = s._search_raw() if min_step is None else s._search_adaptive()
+        # Transitions alone in their interval are refined separately, the others merge.
+        counts = np.diff(np.searchsorted(
+            transitions, [update._timestamp for update in raw]))
+        logging.info(
+            f"step {step}s{'' if min_step is None else f' down to {min_step}s'}{'' if budget is None else f' (budget {budget})'}: {video.decodes} frames, {np.sum(counts == 1)} of {len(transitions)} transitions separated, coverage {s.coverage:.1%}")
+
+    run(arguments.step)
+    run(int(arguments.min_step))
+    run(arguments.step, arguments.min_step)
+    for budget in arguments.budgets:
+        run(arguments.step, arguments.min_step, budget)
+
+
+def benchmark_executor(arguments: argparse.Namespace):
+    transitions = list(np.random.default_rng(0).uniform(
+        0, arguments.length, arguments.transitions))
+    extractor = _SyntheticExtractor(transitions)
+    video = _SyntheticVideo(arguments.length, arguments.latency)
+    logging.getLogger(search.__name__).setLevel(logging.WARNING)
+
+    expected = None
+    for workers in arguments.workers:
+        times = []
+        for backend in executor.BACKENDS:
+            s = search.Search(extractor, video, step=arguments.step, workers=workers,
+                              refinement_accuracy=arguments.accuracy, quiet=True, backend=backend)
+            updates = s.search()
+            if expected is None:
+                expected = updates
+            assert updates == expected, f"{backend} differs"
+            times.append(_measure(s.search, arguments.repetitions))
+        logging.info(f"{workers} workers: " + ", ".join(
+            f"{backend} {t:.2f}s" for backend, t in zip(executor.BACKENDS, times)))
+
+
+class _SlowExtractor(_SyntheticExtractor):
+    def __init__(self, transitions: list[float], validate: float, extract: float):
+        """Takes `validate` and `extract` seconds per frame (without holding the GIL)."""
+        super().__init__(transitions)
+        self._validate = validate
+        self._extract = extract
+
+    def is_valid(self, frame) -> bool:
+        time.sleep(self._validate)
+        return True
+
+    def extract(self, frame) -> model.ColorUpdate:
+        time.sleep(self._extract)
+        return super().extract(frame)
+
+
+def benchmark_stages(arguments: argparse.Namespace):
+    transitions = list(np.random.default_rng(0).uniform(
+        0, arguments.length, arguments.transitions))
+    extractor = _SlowExtractor(
+        transitions, arguments.validate, arguments.extract)
+    video = _SyntheticVideo(arguments.length, arguments.decode)
+    logging.getLogger(search.__name__).setLevel(logging.WARNING)
+
+    serial = search.Search(extractor, video, step=arguments.step, workers=arguments.workers,
+                           refinement_accuracy=arguments.accuracy, quiet=True, backend="process")
+    staged = search.Search(extractor, video, step=arguments.step, workers=arguments.workers, refinement_accuracy=arguments.accuracy, quiet=True,
+                           stages={name: (processes, arguments.queue) for name, processes in zip(["decode", "validate", "extract"], arguments.processes)})
+    assert serial.search() == staged.search()
+
+    serial_time = _measure(serial.search, arguments.repetitions)
+    staged.stage_metrics.clear()
+    staged_time = _measure(staged.search, arguments.repetitions)
+    logging.info(
+        f"{arguments.workers} serial workers {serial_time:.2f}s, stages {arguments.processes} {staged_time:.2f}s (speedup {serial_time/staged_time:.1f}x)")
+    for metrics in staged.stage_metrics.values():
+        logging.info(f"stage {metrics}")
+
+
+class _TintedVideo(data.FrameGenerator):
+    def __init__(self, frame, areas: list, transitions: list[float], cutaways: list[tuple[float, float]], length: float, latency: float, size: Optional[tuple[int, int]] = None):
+        """The areas of the frame change their tint at the transitions, an invalid frame is shown during the cutaways. Frames are resized to `size` and take `latency` seconds to obtain."""
+        self._transitions = transitions
+        self._cutaways = cutaways
+        self._length = length
+        self._latency = latency
+        self._size = size
+        self._frame = frame
+        self._inside = np.any([area > 127 for area in areas], axis=0)
+        self._segments: dict[int, object] = {}
+        self._cutaway = self._resize(255 - frame)
+        self.decodes = 0
+
+    def _resize(self, frame):
+        return frame if self._size is None else cv2.resize(frame, self._size, interpolation=cv2.INTER_AREA)
+
+    def get_frame(self, second: float):
+        self.decodes += 1
+        time.sleep(self._latency)
+        if any(start <= second < end for start, end in self._cutaways):
+            return self._cutaway
+
+        index = int(np.searchsorted(self._transitions, second, side="right"))
+        if index not in self._segments:
+            r, g, b = colorsys.hsv_to_rgb((index * 0.37) % 1.0, 0.8, 0.9)
+            # Noisy like real lamps, a uniform area has no spread to remove outliers with.
+            tinted = 0.3 * self._frame + 0.7 * np.array([b, g, r]) * 255 + \
+                np.random.default_rng(index).normal(0, 8, self._frame.shape)
+            tinted = np.clip(tinted, 0, 255)
+            self._segments[index] = self._resize(
+                np.where(self._inside, tinted.astype(np.uint8), self._frame))
+        return self._segments[index]
+
+    @property
+    def frame_rate(self):
+        return 60.0
+
+    @property
+    def length(self) -> float:
+        return self._length
+
+
+class _CountedVideo(data.FrameGenerator):
+    def __init__(self, d: data.FrameGenerator):
+        """Counts the frames obtained from the data."""
+        self._data = d
+        self.frames_obtained = 0
+
+    def get_frame(self, second: float):
+        self.frames_obtained += 1
+        return self._data.get_frame(second)
+
+    def frames(self, seconds):
+        for second, frame in self._data.frames(seconds):
+            self.frames_obtained += 1
+            yield second, frame
+
+    def align(self, seconds, tolerance: float) -> list[float]:
+        return self._data.align(seconds, tolerance)
+
+    def close(self):
+        self._data.close()
+
+    @property
+    def identity(self) -> Optional[str]:
+        return self._data.identity
+
+    @property
+    def frame_rate(self) -> Optional[float]:
+        return self._data.frame_rate
+
+    @property
+    def length(self) -> float:
+        return self._data.length
+
+
+def _recall(found: list[float], expected: list[float], tolerance: float) -> float:
+    """Share of the expected time points with a found one within the tolerance."""
+    return float(np.mean([any(abs(f - e) <= tolerance for f in found) for e in expected])) if expected else 1.0
+
+
+def benchmark_scenecut(arguments: argparse.Namespace):
+    frame_mask, frame, hues, temps = io.find_frames(arguments.frames, "hd")
+    extractor = search.Extractor(
+        color.Color(brightness_cutoff=constants.DEFAULT_BRIGHTNESS_CUTOFF), hues, temps, frame_mask, frame)
+    logging.getLogger(search.__name__).setLevel(logging.WARNING)
+
+    if arguments.reference is not None:
+        with open(arguments.reference) as f:
+            reference = [float(update["time"])
+                         for update in json.load(f)["updates"]]
+    else:
+        reference = list(np.random.default_rng(0).uniform(
+            0, arguments.length, arguments.transitions))
+    if arguments.video is None:
+        # The synthetic video starts with a valid frame, which is an update as well.
+        reference = sorted({0.0, *reference})
+    reference = [t for t in reference if t < arguments.length]
+    transitions = [t for t in reference if t > 0]
+
+    if arguments.video is not None:
+        video = _CountedVideo(data.VideoFile(
+            arguments.video, keyframes=arguments.keyframes))
+        stream = _CountedVideo(data.VideoFile(
+            arguments.video, keyframes=arguments.keyframes))
+    else:
+        # Cutaways to other shots in between the transitions, which the prepass must not report.
+        cutaways = [(t, t + 30) for t in np.random.default_rng(1).uniform(
+            0, arguments.length, arguments.cutaways)]
+        video = _CountedVideo(_TintedVideo(frame, hues + temps, transitions,
+                                           cutaways, arguments.length, arguments.latency))
+        # A low resolution stream decodes at a fraction of the cost.
+        stream = _CountedVideo(_TintedVideo(frame, hues + temps, transitions, cutaways, arguments.length,
+                                            arguments.latency * 0.25, (640, 360)))
+
+    def run(prepass: Optional[scenecut.Prepass]) -> tuple[list[float], float]:
+        s = search.Search(extractor, video, step=arguments.step, refinement_accuracy=arguments.accuracy,
+                          quiet=True, backend="inline", prepass=prepass)
+        start = time.perf_counter()
+        updates = s.search()
+        return [update._timestamp for update in updates], time.perf_counter() - start
+
+    prepass = scenecut.Prepass(stream, hues + temps, frame_mask,
+                               frame, step=arguments.prepass_step, color_threshold=arguments.threshold)
+    start = time.perf_counter()
+    _, intervals = prepass.candidates()
+    candidate_time = time.perf_counter() - start
+    hits = [any(a - arguments.tolerance <= t <= b + arguments.tolerance for t in transitions)
+            for a, b in intervals]
+    logging.info(
+        f"prepass every {arguments.prepass_step:.1f}s: {len(intervals)} candidates in {candidate_time:.2f}s ({stream.frames_obtained} frames), recall {_recall([(a + b) / 2 for a, b in intervals], transitions, arguments.prepass_step / 2 + arguments.tolerance):.1%}, precision {np.mean(hits) if hits else 1.0:.1%}")
+
+    for name, p in [("full", None), ("prepass", prepass)]:
+        video.frames_obtained = stream.frames_obtained = 0
+        found, runtime = run(p)
+        # The search runs the prepass itself, its time is included and its frames are counted on top.
+        frames = f"{video.frames_obtained} frames" + \
+            (f" + {stream.frames_obtained} prepass frames" if p is not None else "")
+        logging.info(
+            f"{name} search every {arguments.step}s: {len(found)} updates in {runtime:.2f}s ({frames}), recall {_recall(found, reference, arguments.tolerance):.1%}, precision {_recall(reference, found, arguments.tolerance):.1%}")
+    video.close()
+    stream.close()
+
+
+def benchmark_scheduler(arguments: argparse.Namespace):
+    rng = np.random.default_rng(0)
+    episodes = [list(rng.uniform(0, arguments.length, arguments.transitions))
+                for _ in range(arguments.episodes)]
+    video = _SyntheticVideo(arguments.length, arguments.latency)
+    logging.getLogger(search.__name__).setLevel(logging.WARNING)
+    logging.getLogger(scheduler.__name__).setLevel(logging.WARNING)
+
+    for jobs in [1] + arguments.jobs:
+        # Frames are fetched by the shared (latency-bound) threads, which the episodes interleave on.
+        with multiprocessing.pool.ThreadPool(arguments.workers) as p:
+            episode_jobs = [scheduler.Job(f"episode {i}", lambda transitions=transitions: search.Search(
+                _SyntheticExtractor(transitions), video, step=arguments.step, workers=arguments.workers,
+                refinement_accuracy=arguments.accuracy, quiet=True, pool=p).search())
+                for i, transitions in enumerate(episodes)]
+            start = time.perf_counter()
+            for _ in scheduler.Scheduler(jobs).run(episode_jobs):
+                pass
+            total = time.perf_counter() - start
+        logging.info(
+            f"{jobs} concurrent episodes on {arguments.workers} workers: {total:.2f}s ({len(episodes)/total:.2f} episodes/s)")
+        for job in episode_jobs:
+            logging.info(f"  {job}")
+
+
+parser = argparse.ArgumentParser(
+    prog="critrole_benchmark",
+    description="Benchmarks the performance critical parts of the color extraction"
+)
+parser.add_argument("-n", "--repetitions",
+                    default=10,
+                    type=int,
+                    help="Number of repetitions per measurement (default=10).")
+parser.add_argument("-k", "--keyframes",
+                    action="store_true",
+                    help="Keep a keyframe index next to local videos to estimate their seek costs (default=off).")
+benchmarks = parser.add_subparsers(required=True)
+
+similarity_parser = benchmarks.add_parser("similarity",
+                                          help="Compare the native validity check to sewar's UQI.")
+similarity_parser.add_argument("--frames",
+                               default=TESTING,
+                               type=str,
+                               help="Path to the frames directory (default=tests/testdata).")
+similarity_parser.add_argument("--frame",
+                               default=path.join(TESTING, "day_0_0.png"),
+                               type=str,
+                               help="Frame to check (default=tests/testdata/day_0_0.png).")
+similarity_parser.add_argument("-q", "--quality",
+                               default="hd",
+                               choices=["fullhd", "hd", "sd"],
+                               help="Quality of the frames (default=hd).")
+similarity_parser.set_defaults(benchmark=benchmark_similarity)
+
+video_parser = benchmarks.add_parser("video",
+                                     help="Compare opening the video per frame to reusing one capture.")
+video_parser.add_argument("--video",
+                          default=path.join(TESTING, "night.mp4"),
+                          type=str,
+                          help="Video to extract frames from (default=tests/testdata/night.mp4).")
+video_parser.add_argument("--frames",
+                          default=20,
+                          type=int,
+                          help="Number of random frames per repetition (default=20).")
+video_parser.set_defaults(benchmark=benchmark_video)
+
+scan_parser = benchmarks.add_parser("scan",
+                                    help="Compare seeking every frame to streaming them with the seek cost model.")
+scan_parser.add_argument("--video",
+                         default=path.join(TESTING, "night.mp4"),
+                         type=str,
+                         help="Video to extract frames from (default=tests/testdata/night.mp4).")
+scan_parser.add_argument("--step",
+                         default=1.0,
+                         type=float,
+                         help="Seconds between frames (default=1.0).")
+scan_parser.set_defaults(benchmark=benchmark_scan)
+
+cache_parser = benchmarks.add_parser("cache",
+                                     help="Compare decoding frames to reading them from the frame cache.")
+cache_parser.add_argument("--video",
+                          default=path.join(TESTING, "night.mp4"),
+                          type=str,
+                          help="Video to extract frames from (default=tests/testdata/night.mp4).")
+cache_parser.add_argument("--frames",
+                          default=20,
+                          type=int,
+                          help="Number of random frames per repetition (default=20).")
+cache_parser.set_defaults(benchmark=benchmark_cache)
+
+prefetch_parser = benchmarks.add_parser("prefetch",
+                                        help="Compare extracting colors with and without prefetching the frames.")
+prefetch_parser.add_argument("--video",
+                             default=path.join(TESTING, "day.mp4"),
+                             type=str,
+                             help="Video to extract frames from (default=tests/testdata/day.mp4).")
+prefetch_parser.add_argument("--step",
+                             default=1.0,
+                             type=float,
+                             help="Seconds between frames (default=1.0).")
+prefetch_parser.add_argument("--latency",
+                             default=0.0,
+                             type=float,
+                             help="Emulated network latency per frame in seconds (default=0).")
+prefetch_parser.add_argument("--lookahead",
+                             default=constants.DEFAULT_PREFETCH,
+                             type=int,
+                             help="Number of frames to prefetch (default=4).")
+prefetch_parser.set_defaults(benchmark=benchmark_prefetch)
+
+refine_parser = benchmarks.add_parser("refine",
+                                      help="Compare refining every transition in one worker to refining all transitions in waves on a synthetic video.")
+refine_parser.add_argument("--length",
+                           default=3600.0,
+                           type=float,
+                           help="Length of the synthetic video in seconds (default=3600).")
+refine_parser.add_argument("--transitions",
+                           default=3,
+                           type=int,
+                           help="Number of color transitions (default=3).")
+refine_parser.add_argument("--latency",
+                           default=0.05,
+                           type=float,
+                           help="Time to obtain a frame in seconds (default=0.05).")
+refine_parser.add_argument("--step",
+                           default=600,
+                           type=int,
+                           help="Coarse step in seconds (default=600).")
+refine_parser.add_argument("--accuracy",
+                           default=1.0,
+                           type=float,
+                           help="Refinement accuracy in seconds (default=1).")
+refine_parser.add_argument("-w", "--workers",
+                           default=8,
+                           type=int,
+                           help="Number of workers (default=8).")
+refine_parser.set_defaults(benchmark=benchmark_refine)
+
+interpolate_parser = benchmarks.add_parser("interpolate",
+                                           help="Compare the frame decodes of bisecting and interpolating transitions on a synthetic video with fades.")
+interpolate_parser.add_argument("--length",
+                                default=3600.0,
+                                type=float,
+                                help="Length of the synthetic video in seconds (default=3600).")
+interpolate_parser.add_argument("--transitions",
+                                default=5,
+                                type=int,
+                                help="Number of color transitions (default=5).")
+interpolate_parser.add_argument("--fade",
+                                default=30.0,
+                                type=float,
+                                help="Duration of a fade in seconds (default=30).")
+interpolate_parser.add_argument("--step",
+                                default=300,
+                                type=int,
+                                help="Coarse step in seconds (default=300).")
+interpolate_parser.add_argument("--accuracy",
+                                default=1.0,
+                                type=float,
+                                help="Refinement accuracy in seconds (default=1).")
+interpolate_parser.set_defaults(benchmark=benchmark_interpolate)
+
+adaptive_parser = benchmarks.add_parser("adaptive",
+                                        help="Compare sampling at a fixed step to sampling adaptively on a synthetic video with clustered transitions.")
+adaptive_parser.add_argument("--length",
+                             default=3600.0,
+                             type=float,
+                             help="Length of the synthetic video in seconds (default=3600).")
+adaptive_parser.add_argument("--clusters",
+                             default=4,
+                             type=int,
+                             help="Number of clusters of transitions (default=4).")
+adaptive_parser.add_argument("--cluster-size",
+                             default=4,
+                             type=int,
+                             help="Number of transitions per cluster, within a minute (default=4).")
+adaptive_parser.add_argument("--step",
+                             default=120,
+                             type=int,
+                             help="Coarse step in seconds (default=120).")
+adaptive_parser.add_argument("--min-step",
+                             default=5.0,
+                             type=float,
+                             help="Minimum adaptive step in seconds (default=5).")
+adaptive_parser.add_argument("--budgets",
+                             default=[40, 60],
+                             type=int,
+                             nargs="*",
+                             help="Frame budgets of the adaptive sampling (default=40 60).")
+adaptive_parser.set_defaults(benchmark=benchmark_adaptive)
+
+executor_parser = benchmarks.add_parser("executor",
+                                        help="Compare the executor backends of the search across worker counts on a synthetic video.")
+executor_parser.add_argument("--length",
+                             default=3600.0,
+                             type=float,
+                             help="Length of the synthetic video in seconds (default=3600).")
+executor_parser.add_argument("--transitions",
+                             default=10,
+                             type=int,
+                             help="Number of color transitions (default=10).")
+executor_parser.add_argument("--latency",
+                             default=0.005,
+                             type=float,
+                             help="Time to obtain a frame in seconds (default=0.005).")
+executor_parser.add_argument("--step",
+                             default=120,
+                             type=int,
+                             help="Coarse step in seconds (default=120).")
+executor_parser.add_argument("--accuracy",
+                             default=1.0,
+                             type=float,
+                             help="Refinement accuracy in seconds (default=1).")
+executor_parser.add_argument("-w", "--workers",
+                             default=[1, 2, 4],
+                             type=int,
+                             nargs="+",
+                             help="Worker counts to compare (default=1 2 4).")
+executor_parser.set_defaults(benchmark=benchmark_executor)
+
+stages_parser = benchmarks.add_parser("stages",
+                                      help="Compare evaluating frames serially per worker to the staged pipeline on a synthetic video.")
+stages_parser.add_argument("--length",
+                           default=3600.0,
+                           type=float,
+                           help="Length of the synthetic video in seconds (default=3600).")
+stages_parser.add_argument("--transitions",
+                           default=10,
+                           type=int,
+                           help="Number of color transitions (default=10).")
+stages_parser.add_argument("--decode",
+                           default=0.002,
+                           type=float,
+                           help="Time to decode a frame in seconds (default=0.002).")
+stages_parser.add_argument("--validate",
+                           default=0.001,
+                           type=float,
+                           help="Time to validate a frame in seconds (default=0.001).")
+stages_parser.add_argument("--extract",
+                           default=0.006,
+                           type=float,
+                           help="Time to extract the colors of a frame in seconds (default=0.006).")
+stages_parser.add_argument("--step",
+                           default=120,
+                           type=int,
+                           help="Coarse step in seconds (default=120).")
+stages_parser.add_argument("--accuracy",
+                           default=1.0,
+                           type=float,
+                           help="Refinement accuracy in seconds (default=1).")
+stages_parser.add_argument("-w", "--workers",
+                           default=2,
+                           type=int,
+                           help="Number of serial workers (default=2).")
+stages_parser.add_argument("--processes",
+                           default=[1, 1, 3],
+                           type=int,
+                           nargs=3,
+                           metavar=("DECODE", "VALIDATE", "EXTRACT"),
+                           help="Processes per stage (default=1 1 3).")
+stages_parser.add_argument("--queue",
+                           default=constants.DEFAULT_STAGE_QUEUE,
+                           type=int,
+                           help="Size of the queue of every stage (default=8).")
+stages_parser.set_defaults(benchmark=benchmark_stages)
+
+scenecut_parser = benchmarks.add_parser("scenecut",
+                                        help="Compare the full search to searching around the candidates of a scene-cut prepass, on a synthetic video (or a local one) against reference updates.")
+scenecut_parser.add_argument("--frames",
+                             default=path.join(path.dirname(
+                                 path.abspath(__file__)), "frames", "c3"),
+                             type=str,
+                             help="Directory of the hd frames and masks (default=frames/c3).")
+scenecut_parser.add_argument("--reference",
+                             default=None,
+                             type=str,
+                             help="Extracted updates (JSON) whose time points are the transitions (default=random transitions).")
+scenecut_parser.add_argument("--video",
+                             default=None,
+                             type=str,
+                             help="Local hd video of the reference instead of a synthetic one (default=synthetic).")
+scenecut_parser.add_argument("--length",
+                             default=3600.0,
+                             type=float,
+                             help="Length of the video in seconds (default=3600).")
+scenecut_parser.add_argument("--transitions",
+                             default=10,
+                             type=int,
+                             help="Number of random color transitions (default=10).")
+scenecut_parser.add_argument("--cutaways",
+                             default=10,
+                             type=int,
+                             help="Number of 30s cutaways of the synthetic video (default=10).")
+scenecut_parser.add_argument("--latency",
+                             default=0.005,
+                             type=float,
+                             help="Time to obtain an hd frame of the synthetic video in seconds (default=0.005).")
+scenecut_parser.add_argument("--step",
+                             default=120,
+                             type=int,
+                             help="Coarse step of the full search in seconds (default=120).")
+scenecut_parser.add_argument("--prepass-step",
+                             default=constants.DEFAULT_PREPASS_STEP,
+                             type=float,
+                             help="Step of the prepass in seconds (default=2).")
+scenecut_parser.add_argument("--threshold",
+                             default=constants.DEFAULT_PREPASS_THRESHOLD,
+                             type=float,
+                             help="Mean color difference of a candidate (default=0.05).")
+scenecut_parser.add_argument("--accuracy",
+                             default=1.0,
+                             type=float,
+                             help="Refinement accuracy in seconds (default=1).")
+scenecut_parser.add_argument("--tolerance",
+                             default=5.0,
+                             type=float,
+                             help="Maximum distance of a matching update in seconds (default=5).")
+scenecut_parser.set_defaults(benchmark=benchmark_scenecut)
+
+scheduler_parser = benchmarks.add_parser("scheduler",
+                                         help="Compare extracting synthetic episodes one after another to extracting several concurrently on shared workers.")
+scheduler_parser.add_argument("--episodes",
+                              default=6,
+                              type=int,
+                              help="Number of synthetic episodes (default=6).")
+scheduler_parser.add_argument("--length",
+                              default=3600.0,
+                              type=float,
+                              help="Length of every episode in seconds (default=3600).")
+scheduler_parser.add_argument("--transitions",
+                              default=10,
+                              type=int,
+                              help="Number of color transitions per episode (default=10).")
+scheduler_parser.add_argument("--latency",
+                              default=0.02,
+                              type=float,
+                              help="Time to fetch a frame in seconds (default=0.02).")
+scheduler_parser.add_argument("--step",
+                              default=120,
+                              type=int,
+                              help="Coarse step in seconds (default=120).")
+scheduler_parser.add_argument("--accuracy",
+                              default=1.0,
+                              type=float,
+                              help="Refinement accuracy in seconds (default=1).")
+scheduler_parser.add_argument("-w", "--workers",
+                              default=4,
+                              type=int,
+                              help="Number of shared workers (default=4).")
+scheduler_parser.add_argument("-j", "--jobs",
+                              default=[2, 3],
+                              type=int,
+                              nargs="+",
+                              help="Numbers of concurrent episodes to compare to one at a time (default=2 3).")
+scheduler_parser.set_defaults(benchmark=benchmark_scheduler)
+
+arguments = parser.parse_args()
+arguments.benchmark(arguments)
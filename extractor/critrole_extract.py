@@ -1,7 +1,7 @@
 import argparse
 import logging
 
-from extractor import constants, model, pipeline
+from extractor import constants, executor, model, pipeline
 
 logging.basicConfig(level=logging.INFO)
 
@@ -45,12 +45,56 @@ parser.add_argument("-c", "--cuttoff",
                     default=constants.DEFAULT_BRIGHTNESS_CUTOFF,
                     type=float,
                     help="Brightness cutoff for color extraction. (default=0.25).")
+parser.add_argument("--cache",
+                    action="store_true",
+                    help="Keep the downloaded frames on disk to speed up reruns.")
+parser.add_argument("-p", "--prefetch",
+                    default=constants.DEFAULT_PREFETCH,
+                    type=int,
+                    help="Number of frames to obtain ahead of the color extraction, 0 disables prefetching (default=4).")
+parser.add_argument("-i", "--interpolate",
+                    action="store_true",
+                    help="Refine color updates by interpolating the color distance instead of bisecting, which needs fewer frames on fades.")
+parser.add_argument("-m", "--min-step",
+                    default=None,
+                    type=float,
+                    help="Sample adaptively, splitting the initial steps where the colors differ down to this many seconds (default=off).")
+parser.add_argument("-b", "--budget",
+                    default=None,
+                    type=int,
+                    help="Maximum number of frames to sample adaptively (default=unlimited).")
+parser.add_argument("--checkpoint",
+                    default=None,
+                    type=str,
+                    help="Save the progress to this file and resume from it if it exists (default=off).")
+parser.add_argument("-e", "--executor",
+                    default=constants.DEFAULT_BACKEND,
+                    choices=executor.BACKENDS,
+                    help="How the workers run, threads avoid copying data to processes and inline eases profiling (default=process).")
+parser.add_argument("--stages",
+                    default=None,
+                    type=int,
+                    nargs=3,
+                    metavar=("DECODE", "VALIDATE", "EXTRACT"),
+                    help="Evaluate frames in a pipeline of decoding, validation and extraction processes instead of workers, which logs the utilization of every stage (default=off).")
+parser.add_argument("--stage-queue",
+                    default=constants.DEFAULT_STAGE_QUEUE,
+                    type=int,
+                    help="Number of frames waiting for every stage of the pipeline (default=8).")
+parser.add_argument("--prepass",
+                    default=None,
+                    type=float,
+                    help="Also extract around the color changes found by a cheap pass over every this many seconds (default=off).")
+parser.add_argument("--prepass-quality",
+                    default=constants.DEFAULT_PREPASS_QUALITY,
+                    choices=["fullhd", "hd", "sd"],
+                    help="Video quality of the prepass, which downloads the whole video once (default=sd).")
 
 arguments = parser.parse_args()
 if arguments.verbose:
     logging.getLogger().setLevel(logging.DEBUG)
 
-updates = pipeline.extract_from_youtube_video(
+updates = pipeline.stream_from_youtube_video(
     arguments.frames,
     arguments.video,
     arguments.quality,
@@ -59,7 +103,20 @@ updates = pipeline.extract_from_youtube_video(
     arguments.step,
     arguments.workers,
     arguments.accuracy,
+    arguments.cache,
+    arguments.prefetch,
+    interpolate=arguments.interpolate,
+    min_step=arguments.min_step,
+    budget=arguments.budget,
+    checkpoint=arguments.checkpoint,
+    backend=arguments.executor,
+    stages=None if arguments.stages is None else {
+        name: (processes, arguments.stage_queue) for name, processes in zip(["decode", "validate", "extract"], arguments.stages)},
+    prepass_step=arguments.prepass,
+    prepass_quality=arguments.prepass_quality,
 )
 
-with open(arguments.output, "w") as f:
-    f.write(model.to_json(updates, arguments.video))
+# Written as the updates become final, so an interruption keeps them.
+with model.JSONWriter(arguments.output, arguments.video) as writer:
+    for update in updates:
+        writer.write(update)
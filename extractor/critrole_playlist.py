@@ -3,13 +3,15 @@ import logging
 import os
 import re
 import sys
+import time
+from multiprocessing import Pool
 from nis import cat
 from pathlib import Path
 from typing import Union
 
 from yt_dlp import YoutubeDL
 
-from extractor import model, pipeline
+from extractor import constants, model, pipeline, scheduler, search
 
 
 def _episode_short_name(name: str) -> str:
@@ -58,7 +60,15 @@ parser.add_argument("output",
 parser.add_argument("-w", "--workers",
                     default=1,
                     type=int,
-                    help="Number of workers to use (default=1).")
+                    help="Number of workers to use, shared by all episodes (default=1).")
+parser.add_argument("-j", "--jobs",
+                    default=constants.DEFAULT_CONCURRENT_EPISODES,
+                    type=int,
+                    help="Number of episodes to extract concurrently (default=2).")
+parser.add_argument("--memory",
+                    default=None,
+                    type=int,
+                    help="Memory budget of the concurrent episodes in MiB (default=unlimited).")
 
 arguments = parser.parse_args()
 
@@ -69,6 +79,9 @@ with YoutubeDL({"quiet": True, "no_warnings": True, "noprogress": True, "extract
 entries: list = info['entries']
 url_id_name: list[tuple[str, str, str]] = list(
     map(lambda x: (x['url'], x['id'], x['title']), entries))
+# The memory of an episode grows with its length, which flat playlists usually list.
+lengths: dict[str, float] = {x['id']: x.get('duration') or constants.DEFAULT_EPISODE_LENGTH
+                             for x in entries}
 
 existing_episodes: list[str] = list(filter(lambda f: f.endswith(
     ".json"), os.listdir(arguments.output)))
@@ -85,24 +98,53 @@ for url, id, name in url_id_name:
     new_url_id_name.append((url, id, name))
 
 empty: list[str] = []
-for url, id, name in new_url_id_name:
-    logging.info(f'Extracting "{name}" ({id})')
-    updates = pipeline.extract_from_youtube_video(
-        arguments.frames, url, workers=arguments.workers)
-    if len(updates) == 0:
-        empty.append(f'No colors extracted for "{name}" ({id})')
-        continue
-
-    with open(os.path.join(arguments.output, f"{_episode_short_name(name)}_{id}.json"), "w") as f:
-        f.write(model.to_json(updates, url))
+# The masks are loaded once, only the evaluations differ with the length of the episodes.
+memory = {id: pipeline.episode_memory(arguments.frames, length=lengths[id], workers=arguments.workers)
+          for _, id, _ in new_url_id_name}
+start = time.perf_counter()
+# All episodes share the same workers, so their frames are fetched interleaved.
+# Every worker keeps the extractors of all concurrent episodes attached.
+with Pool(arguments.workers, search.limit_attached, (arguments.jobs,)) as pool:
+    jobs = [scheduler.Job(
+        id,
+        lambda url=url: pipeline.extract_from_youtube_video(
+            arguments.frames, url, workers=arguments.workers, pool=pool, quiet=arguments.jobs > 1),
+        memory[id],
+    ) for url, id, name in new_url_id_name]
+    names = {id: (url, name) for url, id, name in new_url_id_name}
+
+    s = scheduler.Scheduler(
+        arguments.jobs, None if arguments.memory is None else arguments.memory * 2**20)
+    for job, updates in s.run(jobs):
+        url, name = names[job.name]
+        if isinstance(updates, Exception):
+            empty.append(f'Error extracting "{name}" ({job.name}): {updates}')
+            continue
+        if len(updates) == 0:
+            empty.append(f'No colors extracted for "{name}" ({job.name})')
+            continue
 
-    # Create a symlink so the data can be accessed by ID as well.
-    _relative_symlink(
-        os.path.join(arguments.output,
-                     f"{_episode_short_name(name)}_{id}.json"),
-        os.path.join(arguments.output,
-                     f"{id}.json"),
-    )
+        # Written as soon as the episode finishes, so an interruption keeps it.
+        with open(os.path.join(arguments.output, f"{_episode_short_name(name)}_{job.name}.json"), "w") as f:
+            f.write(model.to_json(updates, url))
+
+        # Create a symlink so the data can be accessed by ID as well.
+        _relative_symlink(
+            os.path.join(arguments.output,
+                         f"{_episode_short_name(name)}_{job.name}.json"),
+            os.path.join(arguments.output,
+                         f"{job.name}.json"),
+        )
+        logging.info(f'Extracted "{name}" ({job})')
+
+    pool.close()
+    pool.join()
+
+if len(jobs) > 0:
+    logging.info(
+        f"Extracted {len(jobs)} episodes in {time.perf_counter() - start:.1f}s ({sum(job.running for job in jobs):.1f}s one after another)")
+    for job in jobs:
+        logging.info(f'"{names[job.name][1]}" ({job})')
 
 if len(empty) > 0:
     for error in empty:
@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from os import path
+
+import numpy as np
+import numpy.typing as npt
+
+from . import constants, data
+
+logger = logging.getLogger(__name__)
+
+
+def _touch(file: str):
+    """Marks the file as recently used, more precisely than the file system clock would."""
+    now = time.time_ns()
+    os.utime(file, ns=(now, now))
+
+
+class FrameCache(data.FrameGenerator):
+    def __init__(self, generator: data.FrameGenerator, directory: str = path.join(constants.CACHE, "frames"), max_size: int = constants.DEFAULT_FRAME_CACHE_SIZE):
+        """
+        Stores the frames of the generator on disk and maps them back into memory instead of obtaining them again.
+
+        Frames are keyed by the identity of the generator and the time point.
+        Once the cache exceeds `max_size` bytes, the least recently used frames are evicted.
+        The directory is only listed once per process, after that the frames are tracked in memory (so workers sharing the cache do not see each other's frames until they list it).
+        Generators without an identity are not cached.
+        """
+        self._generator = generator
+        self._directory = directory
+        self._max_size = max_size
+        self._identity = generator.identity
+        if self._identity is None:
+            logger.warning(
+                f"{type(generator).__name__} has no identity, frames are not cached")
+        # Size of every cached file, least recently used first (listed on the first store).
+        self._entries: OrderedDict[str, int] | None = None
+        self._size = 0
+        # Guards the entries and their size, which threads (e.g. of a prefetcher) update concurrently.
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Every worker lists the directory itself instead of receiving the entries with every task.
+        state = self.__dict__.copy()
+        state["_entries"] = None
+        state["_size"] = 0
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._lock = threading.Lock()
+
+    def _file(self, second: float) -> str:
+        key = hashlib.sha256(
+            f"{self._identity}@{float(second)!r}".encode()).hexdigest()
+        return path.join(self._directory, key + ".npy")
+
+    def _load(self, second: float) -> npt.NDArray | None:
+        """Maps the cached frame read-only into memory (if any)."""
+        if self._identity is None:
+            return None
+
+        file = self._file(second)
+        try:
+            frame = np.load(file, mmap_mode="r")
+            _touch(file)
+        except (OSError, ValueError):
+            return None
+
+        with self._lock:
+            if self._entries is not None and file in self._entries:
+                self._entries.move_to_end(file)
+        return frame
+
+    def _store(self, second: float, frame: npt.NDArray):
+        if self._identity is None or not isinstance(frame, np.ndarray):
+            return
+
+        try:
+            # Write atomically, since several workers share the cache.
+            os.makedirs(self._directory, exist_ok=True)
+            with self._lock:
+                self._list()
+            file = self._file(second)
+            with tempfile.NamedTemporaryFile(dir=self._directory, suffix=".tmp", delete=False) as f:
+                np.save(f, frame)
+                size = f.tell()
+            os.replace(f.name, file)
+            _touch(file)
+        except OSError as e:
+            logger.warning(f"could not cache frame {second:.2f}s: {e}")
+            return
+
+        with self._lock:
+            entries = self._list()
+            self._size += size - entries.pop(file, 0)
+            entries[file] = size
+            self._evict()
+
+    def _list(self) -> OrderedDict[str, int]:
+        """Returns the cached files by their last use, listing the directory if they are not tracked yet (while holding the lock)."""
+        if self._entries is not None:
+            return self._entries
+
+        entries = []
+        with os.scandir(self._directory) as files:
+            for entry in files:
+                if not entry.name.endswith(".npy"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Evicted by another worker.
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        self._entries = OrderedDict((file, size)
+                                    for _, size, file in sorted(entries))
+        self._size = sum(self._entries.values())
+        return self._entries
+
+    def _evict(self):
+        """Removes the least recently used frames until the cache fits its size (while holding the lock)."""
+        entries = self._list()
+        while self._size > self._max_size and entries:
+            file, size = entries.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(file)
+            except OSError:
+                pass  # Evicted by another worker.
+
+    def get_frame(self, second: float) -> npt.NDArray:
+        """Obtain a frame at a certain time point."""
+        frame = self._load(second)
+        if frame is not None:
+            return frame
+
+        frame = self._generator.get_frame(second)
+        self._store(second, frame)
+        return frame
+
+    def frames(self, seconds: Iterable[float]) -> Iterator[tuple[float, npt.NDArray | Exception]]:
+        """Obtain the frames at the given (sorted) time points, streaming only the missing ones from the generator."""
+        cached = [(second, self._load(second)) for second in seconds]
+        missing = self._generator.frames(
+            [second for second, frame in cached if frame is None])
+
+        for second, frame in cached:
+            if frame is None:
+                _, frame = next(missing)
+                if not isinstance(frame, Exception):
+                    self._store(second, frame)
+            yield second, frame
+
+    def align(self, seconds: Iterable[float], tolerance: float) -> list[float]:
+        return self._generator.align(seconds, tolerance)
+
+    def close(self):
+        self._generator.close()
+
+    @property
+    def identity(self) -> str | None:
+        return self._identity
+
+    @property
+    def frame_rate(self) -> float | None:
+        return self._generator.frame_rate
+
+    @property
+    def counters(self) -> dict[str, int]:
+        return self._generator.counters
+
+    @property
+    def length(self) -> float:
+        return self._generator.length
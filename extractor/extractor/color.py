@@ -1,90 +1,243 @@
+import math
+import os
+import tempfile
 import warnings
 from abc import ABC
-from colorsys import hsv_to_rgb, rgb_to_hsv
+from functools import lru_cache
+from os import path
 
 import numpy as np
 import numpy.typing as npt
-from colour import RGB_to_XYZ, XYZ_to_xy, xy_to_CCT
 
-from . import image, model
+from . import constants, image, model
+
+
+def rgb_to_hsv(rgb: npt.NDArray) -> npt.NDArray:
+    """
+    Convert RGB to HSV colors, mirroring `colorsys.rgb_to_hsv` on whole arrays.
+
+    rgb: npt.NDArray
+        Shape of `(..., 3)` with RGB channels in `[0, 1]`.
+
+    returns: npt.NDArray
+        Shape of `(..., 3)` with `(hue, saturation, value)` channels in `[0, 1]`.
+    """
+
+    r = rgb[..., 0]
+    g = rgb[..., 1]
+    b = rgb[..., 2]
+    maxc = np.max(rgb, axis=-1)
+    minc = np.min(rgb, axis=-1)
+    rangec = maxc - minc
+    gray = rangec == 0
+
+    # Avoid divisions by zero, gray pixels are reset below.
+    safe_maxc = np.where(maxc == 0, 1.0, maxc)
+    safe_rangec = np.where(gray, 1.0, rangec)
+
+    s = rangec / safe_maxc
+    rc = (maxc-r) / safe_rangec
+    gc = (maxc-g) / safe_rangec
+    bc = (maxc-b) / safe_rangec
+    h = np.where(
+        r == maxc,
+        bc-gc,
+        np.where(g == maxc, 2.0+rc-bc, 4.0+gc-rc),
+    )
+    h = (h/6.0) % 1.0
+
+    h = np.where(gray, 0.0, h)
+    s = np.where(gray, 0.0, s)
+
+    return np.stack((h, s, maxc), axis=-1)
+
+
+def hsv_to_rgb(hsv: npt.NDArray) -> npt.NDArray:
+    """
+    Convert HSV to RGB colors, mirroring `colorsys.hsv_to_rgb` on whole arrays.
+
+    hsv: npt.NDArray
+        Shape of `(..., 3)` with `(hue, saturation, value)` channels in `[0, 1]`.
+
+    returns: npt.NDArray
+        Shape of `(..., 3)` with RGB channels in `[0, 1]`.
+    """
+
+    h = hsv[..., 0]
+    s = hsv[..., 1]
+    v = hsv[..., 2]
+    i = np.floor(h*6.0)
+    f = (h*6.0) - i
+    p = v*(1.0 - s)
+    q = v*(1.0 - s*f)
+    t = v*(1.0 - s*(1.0-f))
+    i = i.astype(int) % 6
+
+    rgb = np.stack([
+        np.choose(i, [v, q, p, p, t, v]),
+        np.choose(i, [t, v, v, q, p, p]),
+        np.choose(i, [p, p, t, v, v, q]),
+    ], axis=-1)
+
+    return np.where((s == 0.0)[..., np.newaxis], v[..., np.newaxis], rgb)
 
 
 def _extract_hsv(
     frame: npt.NDArray,
-    mask: npt.NDArray,
-) -> list[tuple[float, float, float]]:
+    mask: npt.NDArray | image.MaskIndex,
+) -> npt.NDArray:
     """
     Extract colors from the given frame, respecting the given mask.
 
     frame: npt.NDArray
         Shape of `(<height>,<width>,3)` with RGB channels.
-    mask: npt.NDArray
-        Shape of `(<height>,<width>,3)` with black/white RGB channels.
+    mask: Union[npt.NDArray, image.MaskIndex]
+        Shape of `(<height>,<width>,3)` with black/white RGB channels, or its compiled pixel index.
 
-    returns: list[tuple[float, float, float]]
-        list of `(hue, saturation, value)` of length #(pixels included in the mask).
+    returns: npt.NDArray
+        Shape of `(<pixels>,3)` with `(hue, saturation, value)` of all pixels included in the mask.
     """
 
-    frame = image.apply_mask(frame, mask)
+    if isinstance(mask, image.MaskIndex):
+        pixels = mask.gather(frame)
+    else:
+        pixels = np.reshape(image.apply_mask(frame, mask), (-1, 3))
 
-    height = frame.shape[0]
-    width = frame.shape[1]
+    # Masked out (and completely black) pixels carry no color.
+    pixels = pixels[np.any(pixels != 0, axis=-1)]
 
-    frame = frame/255
+    return rgb_to_hsv(pixels/255)
 
-    hues: list[tuple[float, float, float]] = np.reshape(
-        frame, (height*width, 3)).tolist()
-    hues = list(filter(lambda rgb: not rgb[0] == rgb[1] == rgb[2] == 0, hues))
-    hues = list(map(lambda rgb: rgb_to_hsv(*rgb), hues))
 
-    return hues
+def _segment_mean(
+        values: npt.NDArray,
+        segments: npt.NDArray,
+        count: int
+) -> npt.NDArray:
+    """Mean of the `(<entries>,<channels>)` values per segment, `0.0` for empty segments."""
+    n = np.bincount(segments, minlength=count)
+    sums = np.stack([np.bincount(segments, weights=values[:, c], minlength=count)
+                    for c in range(values.shape[1])], axis=-1)
+    return sums / np.maximum(n, 1)[:, np.newaxis]
 
 
-def _average_hsv(
-        data: list[tuple[float, float, float]]
-) -> tuple[float, float, float]:
-    hsv: list[float] = np.mean(np.array(data), 0).tolist()
-    if len(hsv) == 3:
-        t: tuple[float, float, float] = (hsv[0], hsv[1], hsv[2])
-        return t
-    return (0.0, 0.0, 0.0)
+def _reduce_hsv(
+        colors: npt.NDArray,
+        segments: npt.NDArray,
+        count: int,
+        brightness_cutoff: float
+) -> npt.NDArray:
+    """
+    Average the given HSV colors per segment after removing dark pixels and outliers.
 
+    colors: npt.NDArray
+        Shape of `(<pixels>,3)` with `(hue, saturation, value)` channels.
+    segments: npt.NDArray
+        Shape of `(<pixels>,)` with the segment number of every pixel.
+    count: int
+        Number of segments.
 
-def _deviation_hsv(
-        data: list[tuple[float, float, float]]
-) -> tuple[float, float, float]:
-    hsv: list[float] = np.std(np.array(data), 0).tolist()
-    if len(hsv) == 3:
-        t: tuple[float, float, float] = (hsv[0], hsv[1], hsv[2])
-        return t
-    return (0.0, 0.0, 0.0)
+    returns: npt.NDArray
+        Shape of `(<count>,3)` with the `(hue, saturation, value)` of every segment, `(0.0, 0.0, 0.0)` if a segment has no pixels left.
+    """
+
+    # Remove pixels with a low "value" (brightness).
+    v_m = _segment_mean(colors, segments, count)[:, 2]
+    keep = colors[:, 2] > brightness_cutoff*v_m[segments]
+    colors = colors[keep]
+    segments = segments[keep]
+
+    # Remove pixels that are more then the standard-deviation away from the mean.
+    m = _segment_mean(colors, segments, count)
+    d = np.sqrt(_segment_mean((colors - m[segments])**2, segments, count))
+    m = m[segments]
+    d = d[segments]
+    keep = np.all((colors[:, :2] < m[:, :2] + d[:, :2]) &
+                  (colors[:, :2] > m[:, :2] - d[:, :2]), axis=-1)
+    colors = colors[keep]
+    segments = segments[keep]
+
+    return _segment_mean(colors, segments, count)
 
 
 class AbstractColor(ABC):
-    def hue(self, frame: npt.NDArray, mask: npt.NDArray) -> tuple[float, float, float]:
+    def hue(self, frame: npt.NDArray, mask: npt.NDArray | image.MaskIndex) -> tuple[float, float, float]:
+        raise NotImplementedError
+
+    def temp(self, frame: npt.NDArray, mask: npt.NDArray | image.MaskIndex) -> float:
+        raise NotImplementedError
+
+    def hues(self, frame: npt.NDArray, areas: image.MaskSet) -> list[tuple[float, float, float]]:
+        """Extracts the hue of every area at once."""
         raise NotImplementedError
 
-    def temp(self, frame: npt.NDArray, mask: npt.NDArray) -> float:
+    def temperatures(self, hues: list[tuple[float, float, float]]) -> list[float]:
+        """Converts hues (as obtained from `hues`) into temperatures."""
         raise NotImplementedError
 
     def similar(self, c1: model.ColorUpdate, c2: model.ColorUpdate) -> bool:
         raise NotImplementedError
 
+    def distance(self, c1: model.ColorUpdate, c2: model.ColorUpdate) -> float:
+        """Distance between the updates relative to the similarity thresholds, at most `1` if they are similar."""
+        raise NotImplementedError
+
+    def similar_neighbours(self, timeline: model.Timeline) -> npt.NDArray:
+        """Checks if every update in the timeline is similar to the next one, returns a shape of `(<updates>-1,)`."""
+        raise NotImplementedError
+
+    @property
+    def parameters(self) -> dict:
+        """Settings that affect the extracted colors or their comparison (e.g. to tell checkpoints apart)."""
+        return {}
+
 
 class Color(AbstractColor):
-    def __init__(self, brightness_cutoff=0.5, hue_threshold=0.1, sat_threshold=0.2, val_threshold=0.2, temp_threshold=1000):
+    def __init__(self, brightness_cutoff=0.5, hue_threshold=0.1, sat_threshold=0.2, val_threshold=0.2, temp_threshold=1000, temp_error=constants.DEFAULT_TEMPERATURE_ERROR):
+        """Defines how colors are extracted and compared, `temp_error` bounds the error of the temperature lookup table (`0` to always compute temperatures exactly)."""
         self._brightness_cutoff = brightness_cutoff
         self._hue_threshold = hue_threshold
         self._sat_threshold = sat_threshold
         self._val_threshold = val_threshold
         self._temp_threshold = temp_threshold
-
-    def hue(self, frame: npt.NDArray, mask: npt.NDArray) -> tuple[float, float, float]:
+        self._temp_error = temp_error
+        self._temp_table: TemperatureTable | None = None
+
+    @property
+    def parameters(self) -> dict:
+        return {
+            "brightness_cutoff": self._brightness_cutoff,
+            "hue_threshold": self._hue_threshold,
+            "sat_threshold": self._sat_threshold,
+            "val_threshold": self._val_threshold,
+            "temp_threshold": self._temp_threshold,
+            "temp_error": self._temp_error,
+            "temp_table": (constants.DEFAULT_TEMPERATURE_HUES, constants.DEFAULT_TEMPERATURE_SATURATIONS) if self._temp_error > 0 else None,
+        }
+
+    def _temperatures(self, hsv: npt.NDArray) -> npt.NDArray:
+        if self._temp_error <= 0:
+            return hues_to_temperatures(hsv)
+        if self._temp_table is None:
+            self._temp_table = TemperatureTable(max_error=self._temp_error)
+        return self._temp_table(hsv)
+
+    def hue(self, frame: npt.NDArray, mask: npt.NDArray | image.MaskIndex) -> tuple[float, float, float]:
         return extract_color(frame, mask, self._brightness_cutoff)
 
-    def temp(self, frame: npt.NDArray, mask: npt.NDArray) -> float:
+    def temp(self, frame: npt.NDArray, mask: npt.NDArray | image.MaskIndex) -> float:
         hue = self.hue(frame, mask)
-        return hue_to_temperature(*hue)
+        return self._temperatures(np.array(hue)).item()
+
+    def hues(self, frame: npt.NDArray, areas: image.MaskSet) -> list[tuple[float, float, float]]:
+        if areas.count == 0:
+            return []
+        return extract_colors(frame, areas, self._brightness_cutoff)
+
+    def temperatures(self, hues: list[tuple[float, float, float]]) -> list[float]:
+        if len(hues) == 0:
+            return []
+        return self._temperatures(np.array(hues)).tolist()
 
     def similar(self, c1: model.ColorUpdate, c2: model.ColorUpdate) -> bool:
         if c1._invalid != c2._invalid:
@@ -116,44 +269,189 @@ class Color(AbstractColor):
 
         return True
 
+    def distance(self, c1: model.ColorUpdate, c2: model.ColorUpdate) -> float:
+        if c1._invalid != c2._invalid:
+            return math.inf
+        elif c1._invalid:
+            return 0.0
+        elif len(c1._colors) != len(c2._colors):
+            raise ValueError(
+                f"ColorUpdate colors have different lengths ({len(c1._colors)} != {len(c2._colors)}).")
+        elif len(c1._temps) != len(c2._temps):
+            raise ValueError(
+                f"ColorUpdate temps have different lengths ({len(c1._temps)} != {len(c2._temps)}).")
+
+        distance = 0.0
+        for i in range(len(c1._colors)):
+            h, s, v = c1._colors[i]
+            h2, s2, v2 = c2._colors[i]
+            distance = max(distance, abs(h - h2) / self._hue_threshold,
+                           abs(s - s2) / self._sat_threshold, abs(v - v2) / self._val_threshold)
+
+        for i in range(len(c1._temps)):
+            distance = max(distance, abs(
+                c1._temps[i] - c2._temps[i]) / self._temp_threshold)
+
+        return distance
+
+    def similar_neighbours(self, timeline: model.Timeline) -> npt.NDArray:
+        colors = np.abs(np.diff(timeline.colors, axis=0))
+        temps = np.abs(np.diff(timeline.temps, axis=0))
+        thresholds = np.array(
+            [self._hue_threshold, self._sat_threshold, self._val_threshold])
+
+        # Comparisons with "nan" of invalid updates are false, which is overruled below anyway.
+        similar = np.all(colors <= thresholds, axis=(1, 2)) & np.all(
+            temps <= self._temp_threshold, axis=1)
+
+        invalid = timeline.invalid
+        return np.where(invalid[:-1] | invalid[1:], invalid[:-1] & invalid[1:], similar)
+
 
 def extract_color(
         frame: npt.NDArray,
-        mask: npt.NDArray,
+        mask: npt.NDArray | image.MaskIndex,
         brightness_cutoff=0.5
 ) -> tuple[float, float, float]:
     """Extract HSV colors from the given frame, respecting the given mask."""
 
     colors = _extract_hsv(frame, mask)
+    h, s, v = _reduce_hsv(colors, np.zeros(
+        len(colors), dtype=np.intp), 1, brightness_cutoff)[0].tolist()
+    return (h, s, v)
 
-    # Remove pixels with a low "value" (brightness).
-    _, _, v_m = _average_hsv(colors)
-    colors = list(filter(lambda c: c[2] > brightness_cutoff*v_m, colors))
-    if len(colors) == 0:
-        return (0.0, 0.0, 0.0)
 
-    # Remove pixels that are more then the standard-deviation away from the mean.
-    h_m, s_m, _ = _average_hsv(colors)
-    h_d, s_d, _ = _deviation_hsv(colors)
-    colors = list(
-        filter(lambda c: c[1] < s_m + s_d and c[1] > s_m - s_d, colors))
-    colors = list(
-        filter(lambda c: c[0] < h_m + h_d and c[0] > h_m - h_d, colors))
-    if len(colors) == 0:
-        return (0.0, 0.0, 0.0)
+def extract_colors(
+        frame: npt.NDArray,
+        areas: image.MaskSet,
+        brightness_cutoff=0.5
+) -> list[tuple[float, float, float]]:
+    """Extract HSV colors from the given frame for every area at once, converting every pixel only once."""
+
+    pixels = areas.gather(frame)
+    # Masked out (and completely black) pixels carry no color.
+    colored = np.any(pixels != 0, axis=-1)
+    colors = rgb_to_hsv(pixels/255)
 
-    return _average_hsv(colors)
+    positions = areas.positions[colored[areas.positions]]
+    segments = areas.segments[colored[areas.positions]]
+    colors = _reduce_hsv(colors[positions], segments,
+                         areas.count, brightness_cutoff)
+
+    return [(c[0], c[1], c[2]) for c in colors.tolist()]
 
 
 def hue_to_temperature(h: float, s: float, v: float) -> float:
-    rgb = hsv_to_rgb(h, s, v)
-    xyz = RGB_to_XYZ(np.array(rgb), "sRGB")
+    return hues_to_temperatures(np.array([h, s, v])).item()
+
+
+def hues_to_temperatures(hsv: npt.NDArray) -> npt.NDArray:
+    """
+    Compute the exact correlated color temperature of HSV colors.
+
+    hsv: npt.NDArray
+        Shape of `(..., 3)` with `(hue, saturation, value)` channels in `[0, 1]`.
+
+    returns: npt.NDArray
+        Shape of `(...)` with temperatures clipped to `[1667, 25000]`.
+    """
+
+    # Importing "colour" is slow, and only needed when building or bypassing the temperature table.
+    from colour import RGB_to_XYZ, XYZ_to_xy, xy_to_CCT
+
+    rgb = hsv_to_rgb(np.asarray(hsv, dtype=np.float64))
+    xyz = RGB_to_XYZ(rgb, "sRGB")
     xy = XYZ_to_xy(xyz)
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
-        temp = xy_to_CCT(xy, "kang2002").item()
-
-    temp = max(1667.0, temp)  # Clip at 1667.
-    temp = min(25000.0, temp)  # Clip at 25000.
-
-    return temp
+        temp = xy_to_CCT(xy, "kang2002")
+
+    return np.clip(temp, 1667.0, 25000.0)  # Clip at 1667 and 25000.
+
+
+class TemperatureTable:
+    def __init__(self, hues: int = constants.DEFAULT_TEMPERATURE_HUES, saturations: int = constants.DEFAULT_TEMPERATURE_SATURATIONS, max_error: float = constants.DEFAULT_TEMPERATURE_ERROR, cache: str | None = constants.CACHE):
+        """
+        Lookup table for `hues_to_temperatures` with bilinear interpolation.
+
+        The temperature does not depend on the value (brightness) of a color, so the table only spans `hues` x `saturations` evenly spaced points.
+        The interpolation error of every cell is measured on a grid with twice the resolution when the table is built, cells with an error above `max_error` (Kelvin) fall back to the exact computation.
+        Building the table is slow, so it is stored in the `cache` directory.
+        """
+        if hues < 2 or saturations < 2:
+            raise ValueError(
+                "the table needs at least two hues and saturations")
+
+        self._temps, errors = _temperature_table(hues, saturations, cache)
+        self._exact = errors > max_error
+
+    def __call__(self, hsv: npt.NDArray) -> npt.NDArray:
+        """
+        Look up the temperatures of HSV colors.
+
+        hsv: npt.NDArray
+            Shape of `(..., 3)` with `(hue, saturation, value)` channels in `[0, 1]`.
+
+        returns: npt.NDArray
+            Shape of `(...)` with temperatures.
+        """
+        hsv = np.asarray(hsv, dtype=np.float64)
+        shape = hsv.shape[:-1]
+        hsv = np.reshape(hsv, (-1, 3))
+
+        h = np.clip(hsv[:, 0], 0.0, 1.0) * (self._temps.shape[0]-1)
+        s = np.clip(hsv[:, 1], 0.0, 1.0) * (self._temps.shape[1]-1)
+        i = np.minimum(h.astype(int), self._temps.shape[0]-2)
+        j = np.minimum(s.astype(int), self._temps.shape[1]-2)
+        fh = h - i
+        fs = s - j
+
+        temps = self._temps[i, j]*(1-fh)*(1-fs) + self._temps[i+1, j]*fh*(1-fs) + \
+            self._temps[i, j+1]*(1-fh)*fs + self._temps[i+1, j+1]*fh*fs
+
+        # Black has no chromaticity, so it is not covered by the table either.
+        exact = self._exact[i, j] | (hsv[:, 2] <= 0.0)
+        if np.any(exact):
+            temps[exact] = hues_to_temperatures(hsv[exact])
+
+        return np.reshape(temps, shape)
+
+
+@lru_cache
+def _temperature_table(hues: int, saturations: int, cache: str | None) -> tuple[npt.NDArray, npt.NDArray]:
+    """Returns the table temperatures and the interpolation error of every cell, building and caching them if needed."""
+    file = path.join(
+        cache, f"temperature_{hues}x{saturations}.npz") if cache else None
+    if file and path.exists(file):
+        with np.load(file) as table:
+            return table["temps"], table["errors"]
+
+    # Compute the table with twice the resolution to measure the interpolation error.
+    h, s = np.meshgrid(np.linspace(0.0, 1.0, 2*hues-1),
+                       np.linspace(0.0, 1.0, 2*saturations-1), indexing="ij")
+    fine = hues_to_temperatures(np.stack([h, s, np.ones_like(h)], axis=-1))
+    temps = fine[::2, ::2]
+
+    interpolated = np.zeros_like(fine)
+    interpolated[::2, ::2] = temps
+    interpolated[1::2, ::2] = (temps[:-1, :] + temps[1:, :])/2
+    interpolated[::2, 1::2] = (temps[:, :-1] + temps[:, 1:])/2
+    interpolated[1::2, 1::2] = (temps[:-1, :-1] + temps[1:, :-1] +
+                                temps[:-1, 1:] + temps[1:, 1:])/4
+    deviation = np.abs(fine - interpolated)
+
+    # Every cell covers a 3x3 block of the fine grid.
+    errors = np.zeros((hues-1, saturations-1))
+    for a in range(3):
+        for b in range(3):
+            errors = np.maximum(
+                errors, deviation[a:a+2*(hues-1):2, b:b+2*(saturations-1):2])
+
+    if file and cache:
+        # Write atomically, since several workers might build the table at once.
+        os.makedirs(cache, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=cache, suffix=".npz", delete=False) as f:
+            np.savez(f, temps=temps, errors=errors)
+        os.replace(f.name, file)
+
+    return temps, errors
@@ -1,6 +1,9 @@
+import os
 from os import path
 
 ROOT = path.dirname(path.abspath(__file__))
+CACHE = path.join(os.environ.get("XDG_CACHE_HOME",
+                  path.join(path.expanduser("~"), ".cache")), "critrolehue")
 
 QUIET = False
 
@@ -9,3 +12,25 @@ DEFAULT_SEARCH_STEP = 120
 DEFAULT_REFINEMENT_ACCURACY = 20.0
 DEFAULT_VALID_THRESHOLD = 0.98
 DEFAULT_BRIGHTNESS_CUTOFF = 0.25
+DEFAULT_TEMPERATURE_ERROR = 50.0
+DEFAULT_TEMPERATURE_HUES = 49
+DEFAULT_TEMPERATURE_SATURATIONS = 17
+DEFAULT_CASCADE_SCALE = 0.25
+DEFAULT_CASCADE_MARGIN = 0.1
+DEFAULT_SEEK_COST = 100
+DEFAULT_FRAME_CACHE_SIZE = 10 * 2**30
+DEFAULT_DOWNLOAD_BATCH = 16
+DEFAULT_PREFETCH = 4
+DEFAULT_PREFETCH_MEMORY = 2**30
+DEFAULT_FRAME_RATE = 60.0
+DEFAULT_BACKEND = "process"
+DEFAULT_STAGE_QUEUE = 8
+DEFAULT_PREPASS_STEP = 2.0
+DEFAULT_PREPASS_SCALE = 0.1
+DEFAULT_PREPASS_THRESHOLD = 0.05
+DEFAULT_PREPASS_QUALITY = "sd"
+DEFAULT_CONCURRENT_EPISODES = 2
+DEFAULT_ATTACHED_EXTRACTORS = 4
+DEFAULT_EPISODE_LENGTH = 4 * 60 * 60
+MANAGER_MEMORY = 20 * 2**20
+EVALUATION_MEMORY = 2**11
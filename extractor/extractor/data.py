@@ -1,12 +1,18 @@
+import logging
+import os
 from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
 from os import path
 from tempfile import TemporaryDirectory
 from typing import Dict, Union
 
+import cv2
 import numpy.typing as npt
 from yt_dlp import YoutubeDL
 
-from . import io
+from . import constants, io
+
+logger = logging.getLogger(__name__)
 
 
 class FrameGenerator(ABC):
@@ -20,15 +26,90 @@ class FrameGenerator(ABC):
     def length(self) -> float:
         raise NotImplementedError
 
+    def frames(self, seconds: Iterable[float]) -> Iterator[tuple[float, npt.NDArray | Exception]]:
+        """Obtain the frames at the given (sorted) time points, yielding failed frames as their exception."""
+        for second in seconds:
+            try:
+                yield second, self.get_frame(second)
+            except Exception as e:
+                yield second, e
+
+    def align(self, seconds: Iterable[float], tolerance: float) -> list[float]:
+        """Moves the (sorted) time points within the tolerance to where frames are cheap to obtain."""
+        return list(seconds)
+
+    def close(self):
+        """Release resources held by the current process."""
+
+    @property
+    def identity(self) -> str | None:
+        """Identifies the frames of the generator across runs, or `None` if they cannot be identified."""
+        return None
+
+    @property
+    def frame_rate(self) -> float | None:
+        """Frames per second, or `None` if unknown."""
+        return None
+
+    @property
+    def counters(self) -> dict[str, int]:
+        """How the frames were obtained in the current process (e.g. whether they were prefetched), if that is counted."""
+        return {}
+
 
 class VideoFile(FrameGenerator):
-    def __init__(self, file: str):
+    def __init__(self, file: str, seek_cost: int = constants.DEFAULT_SEEK_COST, keyframes: bool = False):
+        """
+        A local video file, which is kept open once per process and reused for every frame.
+
+        With `keyframes`, a keyframe index is kept in a sidecar next to the video to estimate the seek costs.
+        Otherwise gaps of at most `seek_cost` frames are decoded instead of seeked.
+        """
         self._file = file
-        self._length = io.video_length(file)
+        self._seek_cost = seek_cost
+        self._keyframes: io.KeyframeIndex | None = None
+        if keyframes:
+            try:
+                self._keyframes = io.KeyframeIndex.load(file)
+            except OSError as e:
+                logger.warning(f"could not index keyframes of {file}: {e}")
+
+        if self._keyframes:
+            self._length = self._keyframes.length
+            self._fps = self._keyframes.fps
+        else:
+            self._length = io.capture_length(io.open_video(file))
+            self._fps = io.open_video(file).get(cv2.CAP_PROP_FPS)
 
     def get_frame(self, second: float) -> npt.NDArray:
         """Obtain a frame at a certain time point."""
-        return io.get_frame(self._file, second)
+        _, frame = next(self.frames([second]))
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+
+    def frames(self, seconds: Iterable[float]) -> Iterator[tuple[float, npt.NDArray | Exception]]:
+        """Obtain the frames at the given (sorted) time points, decoding small gaps sequentially."""
+        return io.read_frames(io.open_video(self._file), seconds, self._seek_cost, self._file, self._keyframes)
+
+    def align(self, seconds: Iterable[float], tolerance: float) -> list[float]:
+        """Moves the time points to cheap seek targets within the tolerance."""
+        if self._keyframes:
+            return self._keyframes.align(seconds, tolerance)
+        return list(seconds)
+
+    def close(self):
+        """Release the video of the current process."""
+        io.close_video(self._file)
+
+    @property
+    def identity(self) -> str | None:
+        stat = os.stat(self._file)
+        return f"file:{path.abspath(self._file)}:{stat.st_size}:{stat.st_mtime}"
+
+    @property
+    def frame_rate(self) -> float | None:
+        return self._fps
 
     @property
     def length(self) -> float:
@@ -58,49 +139,165 @@ _formats = {
 }
 
 
-class YouTubeVideo(FrameGenerator):
-    def __init__(self, url: str, quality: str = "hd"):
-        self._url = url
-        self._format = _formats[quality]
+class Downloader(ABC):
+    @abstractmethod
+    def length(self, url: str) -> float:
+        """Obtain the length of the video in seconds."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def download(self, url: str, format: str, sections: list[tuple[float, float]], directory: str) -> list[str | None]:
+        """Download the sections (start and end in seconds) of the video into the directory, returning the file of every section (`None` if missing)."""
+        raise NotImplementedError
 
+    def download_video(self, url: str, format: str, directory: str) -> str | None:
+        """Download the whole video into the directory, returning its file (`None` if missing)."""
+        return self.download(url, format, [(0.0, self.length(url))], directory)[0]
+
+
+class YoutubeDLDownloader(Downloader):
+    def length(self, url: str) -> float:
         with YoutubeDL({"quiet": True, "no_warnings": True, "noprogress": True}) as yt:
             info = yt.extract_info(url, download=False)
             if info is None:
-                raise Exception("url {url} not found")
-            self._length = float(info["duration"])
+                raise Exception(f"url {url} not found")
+            return float(info["duration"])
+
+    def download(self, url: str, format: str, sections: list[tuple[float, float]], directory: str) -> list[str | None]:
+        """Download all sections in a single invocation."""
+        def ranges(*args, **kwargs):
+            return [
+                {
+                    "start_time": start,
+                    "end_time": end,
+                    "index": i,
+                } for i, (start, end) in enumerate(sections)
+            ]
+
+        with YoutubeDL(
+            {
+                "format": format,
+                "download_ranges": ranges,
+                "force_keyframes_at_cuts": True,
+                "paths": {
+                    "home": directory,
+                },
+                "outtmpl": "section_%(section_number)s.mp4",
+                "quiet": True,
+                "no_warnings": True,
+                "noprogress": True
+            }
+        ) as yt:
+            yt.download([url])
+
+        files = [path.join(directory, f"section_{i}.mp4")
+                 for i in range(len(sections))]
+        return [file if path.exists(file) else None for file in files]
+
+    def download_video(self, url: str, format: str, directory: str) -> str | None:
+        """Download the whole video as is, without cutting it into sections."""
+        with YoutubeDL(
+            {
+                "format": format,
+                "paths": {
+                    "home": directory,
+                },
+                "outtmpl": "video.%(ext)s",
+                "quiet": True,
+                "no_warnings": True,
+                "noprogress": True
+            }
+        ) as yt:
+            info = yt.extract_info(url)
+            if info is None:
+                return None
+            file = yt.prepare_filename(info)
+        return file if path.exists(file) else None
+
+
+class YouTubeVideo(FrameGenerator):
+    def __init__(self, url: str, quality: str = "hd", downloader: Downloader | None = None, batch: int = constants.DEFAULT_DOWNLOAD_BATCH):
+        """A YouTube video, of which up to `batch` frames are downloaded at once."""
+        self._url = url
+        self._format = _formats[quality]
+        self._downloader = downloader or YoutubeDLDownloader()
+        self._batch = batch
+        self._length = self._downloader.length(url)
 
     def get_frame(self, second: float) -> Union[npt.NDArray, None]:
         if second > self._length - 0.1:
             return None
 
-        def section(*args, **kwargs):
-            return [
-                {
-                    "start_time": second - 0.1,
-                    "end_time": second + 0.1,
-                }
-            ]
+        _, frame = next(self.frames([second]))
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+
+    def frames(self, seconds: Iterable[float]) -> Iterator[tuple[float, npt.NDArray | Exception]]:
+        """Obtain the frames at the given (sorted) time points, downloading them in batches."""
+        seconds = list(seconds)
+        for start in range(0, len(seconds), self._batch):
+            yield from self._download(seconds[start:start+self._batch])
+
+    def _download(self, seconds: list[float]) -> list[tuple[float, npt.NDArray | Exception]]:
+        available = [second for second in seconds
+                     if second <= self._length - 0.1]
+        frames: dict[float, npt.NDArray | Exception] = {
+            second: Exception(f"no frame for {second}s") for second in seconds}
 
         with TemporaryDirectory() as temp:
-            yt = YoutubeDL(
-                {
-                    "format": self._format,
-                    "download_ranges": section,
-                    "force_keyframes_at_cuts": True,
-                    "paths": {
-                        "home": temp,
-                    },
-                    "outtmpl": "download.mp4",
-                    "quiet": True,
-                    "no_warnings": True,
-                    "noprogress": True
-                }
-            )
-
-            yt.download([self._url])
-
-            return io.get_frame(path.join(temp, "download.mp4"), 0.1)
+            try:
+                files = self._downloader.download(
+                    self._url, self._format, [(second - 0.1, second + 0.1) for second in available], temp)
+            except Exception as e:
+                files = [None] * len(available)
+                frames.update({second: e for second in available})
+
+            for second, file in zip(available, files):
+                if file is None:
+                    continue
+                try:
+                    frames[second] = io.get_frame(file, 0.1)
+                except Exception as e:
+                    frames[second] = e
+
+        return [(second, frames[second]) for second in seconds]
+
+    @property
+    def identity(self) -> str | None:
+        return f"youtube:{self._url}:{self._format}"
 
     @property
     def length(self) -> float:
         return self._length
+
+
+class YouTubeDownload(VideoFile):
+    def __init__(self, url: str, quality: str = "sd", downloader: Downloader | None = None):
+        """
+        A YouTube video downloaded once as a whole into a temporary directory, whose frames are then decoded locally.
+
+        Cheaper than a `YouTubeVideo` when frames are needed all over the video, like for a prepass at a low quality.
+        """
+        self._url = url
+        self._format = _formats[quality]
+        self._directory = TemporaryDirectory()
+        logger.info(f"downloading {url} in format {self._format}")
+        try:
+            file = (downloader or YoutubeDLDownloader()).download_video(
+                url, self._format, self._directory.name)
+            if file is None:
+                raise Exception(f"could not download {url}")
+        except Exception:
+            self._directory.cleanup()
+            raise
+        super().__init__(file)
+
+    def close(self):
+        """Release the video of the current process and remove the download."""
+        super().close()
+        self._directory.cleanup()
+
+    @property
+    def identity(self) -> str | None:
+        return f"youtube:{self._url}:{self._format}"
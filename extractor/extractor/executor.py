@@ -0,0 +1,121 @@
+import asyncio
+import multiprocessing.pool
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+from typing import TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BACKENDS = ["process", "thread", "inline", "async"]
+
+
+class Executor(ABC):
+    @abstractmethod
+    def imap(self, function: Callable[[T], R], iterable: Iterable[T]) -> Iterator[R]:
+        """Applies the function to every item on the workers, yielding the results in order."""
+        raise NotImplementedError
+
+    @property
+    def in_process(self) -> bool:
+        """Whether the workers share the memory of the current process (instead of receiving pickled copies)."""
+        return True
+
+    def close(self):
+        """Waits for the workers and releases them."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class ProcessExecutor(Executor):
+    def __init__(self, workers: int = 1, pool: multiprocessing.pool.Pool | None = None):
+        """Runs on worker processes, either a new pool of `workers` or the given `pool` (which is left open)."""
+        self._owned = pool is None
+        self._pool = Pool(workers) if pool is None else pool
+
+    def imap(self, function: Callable[[T], R], iterable: Iterable[T]) -> Iterator[R]:
+        return self._pool.imap(function, iterable)
+
+    @property
+    def in_process(self) -> bool:
+        return False
+
+    def close(self):
+        if self._owned:
+            self._pool.close()
+            self._pool.join()
+
+
+class ThreadExecutor(Executor):
+    def __init__(self, workers: int = 1):
+        """Runs on worker threads, which suits work that releases the GIL (decoding, most NumPy kernels)."""
+        self._pool = ThreadPoolExecutor(workers)
+
+    def imap(self, function: Callable[[T], R], iterable: Iterable[T]) -> Iterator[R]:
+        return self._pool.map(function, iterable)
+
+    def close(self):
+        self._pool.shutdown()
+
+
+class InlineExecutor(Executor):
+    def __init__(self, workers: int = 1):
+        """Runs in the calling thread, one item at a time (e.g. for profiling)."""
+
+    def imap(self, function: Callable[[T], R], iterable: Iterable[T]) -> Iterator[R]:
+        return map(function, iterable)
+
+
+class AsyncExecutor(Executor):
+    def __init__(self, workers: int = 1):
+        """Runs on an asyncio event loop (in its own thread), which hands at most `workers` items at a time to threads."""
+        self._workers = workers
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(ThreadPoolExecutor(workers))
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def imap(self, function: Callable[[T], R], iterable: Iterable[T]) -> Iterator[R]:
+        semaphore: asyncio.Semaphore | None = None
+
+        async def run(item: T) -> R:
+            nonlocal semaphore
+            if semaphore is None:
+                # Created on the loop it belongs to.
+                semaphore = asyncio.Semaphore(self._workers)
+            async with semaphore:
+                return await self._loop.run_in_executor(None, function, item)
+
+        futures = [asyncio.run_coroutine_threadsafe(
+            run(item), self._loop) for item in iterable]
+        return (future.result() for future in futures)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(
+            self._loop.shutdown_default_executor(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def create(backend: str, workers: int = 1) -> Executor:
+    """Creates the executor of the backend (one of `BACKENDS`) with `workers` workers."""
+    if backend == "process":
+        return ProcessExecutor(workers)
+    elif backend == "thread":
+        return ThreadExecutor(workers)
+    elif backend == "inline":
+        return InlineExecutor(workers)
+    elif backend == "async":
+        return AsyncExecutor(workers)
+
+    raise ValueError(
+        f"Unknown executor backend {backend} (expected one of {', '.join(BACKENDS)}).")
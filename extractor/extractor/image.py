@@ -1,12 +1,92 @@
-from typing import Optional
 
 import cv2
 import numpy as np
 import numpy.typing as npt
-from sewar.full_ref import uqi as similarity
 
+# Missing from the type stubs of OpenCV.
+_CV_16U: int = cv2.CV_16U  # pyright: ignore[reportAttributeAccessIssue]
+_CV_64F: int = cv2.CV_64F  # pyright: ignore[reportAttributeAccessIssue]
 
-def apply_mask(frame: npt.NDArray, mask: npt.NDArray) -> npt.NDArray:
+
+class MaskIndex:
+    def __init__(self, mask: npt.NDArray):
+        """
+        Compiles a black/white mask into the flat indexes of its pixels, so frames of the same size only need to be gathered at those pixels.
+
+        mask: npt.NDArray
+            Shape of `(<height>,<width>,3)` with black/white RGB channels.
+        """
+        selected = mask > 127
+        if selected.ndim == 3:
+            selected = np.all(selected, axis=-1)
+
+        self._shape = selected.shape
+        self._indexes = np.flatnonzero(selected)
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def _pixels(self, frame: npt.NDArray) -> npt.NDArray:
+        if frame.shape[:2] != self._shape:
+            raise ValueError(
+                f"frame shape {frame.shape[:2]} does not match mask shape {self._shape}")
+        return np.reshape(frame, (self._shape[0]*self._shape[1], -1))
+
+    def gather(self, frame: npt.NDArray) -> npt.NDArray:
+        """Returns the pixels of the frame inside the mask with shape `(<pixels>,<channels>)`."""
+        return self._pixels(frame)[self._indexes]
+
+    def apply(self, frame: npt.NDArray) -> npt.NDArray:
+        """Returns a copy of the frame where all pixels outside of the mask are black."""
+        masked = np.zeros_like(frame)
+        self._pixels(masked)[self._indexes] = self.gather(frame)
+        return masked
+
+
+class MaskSet(MaskIndex):
+    def __init__(self, masks: list[npt.NDArray]):
+        """
+        Compiles several black/white masks at once, so frames only need to be gathered once at the union of their pixels.
+
+        masks: list[npt.NDArray]
+            Each of shape `(<height>,<width>,3)` with black/white RGB channels.
+        """
+        areas = list(map(MaskIndex, masks))
+        shapes = {a._shape for a in areas}
+        if len(shapes) > 1:
+            raise ValueError(f"masks have different shapes {shapes}")
+
+        indexes = np.concatenate(
+            [a._indexes for a in areas]) if len(areas) > 0 else np.zeros(0, dtype=np.intp)
+
+        self._shape = shapes.pop() if len(shapes) > 0 else (0, 0)
+        self._indexes = np.unique(indexes)
+        self._count = len(areas)
+
+        # Map every area pixel to its position in the gathered union.
+        self._positions = np.searchsorted(self._indexes, indexes)
+        self._segments = np.repeat(
+            np.arange(self._count, dtype=np.intp), [len(a) for a in areas])
+
+    @property
+    def count(self) -> int:
+        """Number of masks in the set."""
+        return self._count
+
+    @property
+    def positions(self) -> npt.NDArray:
+        """Position of every mask pixel in the gathered union, concatenated for all masks."""
+        return self._positions
+
+    @property
+    def segments(self) -> npt.NDArray:
+        """Mask number of every entry in `positions`."""
+        return self._segments
+
+
+def apply_mask(frame: npt.NDArray, mask: npt.NDArray | MaskIndex) -> npt.NDArray:
+    if isinstance(mask, MaskIndex):
+        return mask.apply(frame)
     return np.where(mask > 127, frame, np.zeros_like(frame))
 
 
@@ -15,19 +95,124 @@ def subtract_mask(mask_0: npt.NDArray, mask_1: npt.NDArray) -> npt.NDArray:
     return np.where(mask > 0, mask, np.zeros_like(mask))
 
 
+class MaskedSimilarity:
+    def __init__(self, reference: npt.NDArray, mask: npt.NDArray | MaskIndex | None = None, blur: int = 0):
+        """
+        Compares frames to a fixed reference frame using the Universal Quality Index (UQI), like `similar_image`.
+
+        The window statistics of the masked reference are computed once, so every comparison only needs the box-filtered moments of the candidate frame.
+        Windows that do not overlap the mask compare two black areas and always score `1.0`, so they are skipped.
+        """
+        height, width = reference.shape[:2]
+        if mask is None:
+            mask = MaskIndex(np.full((height, width), 255, dtype=np.uint8))
+        elif not isinstance(mask, MaskIndex):
+            mask = MaskIndex(mask)
+
+        self._mask = mask
+        self._blur = blur
+        # Same window layout as `sewar.full_ref.uqi`, which leaves out a margin of half a window.
+        self._window = window = 8
+        self._windows = max(height-window, 0) * max(width-window, 0)
+        self._box = None
+
+        # Blurring spreads the masked content.
+        rows, cols = np.unravel_index(mask._indexes, (height, width))
+        if len(rows) == 0 or self._windows == 0:
+            return
+        top = max(0, int(rows.min()) - blur - window + 1)
+        bottom = min(height - window - 1, int(rows.max()) + blur)
+        left = max(0, int(cols.min()) - blur - window + 1)
+        right = min(width - window - 1, int(cols.max()) + blur)
+        if top > bottom or left > right:
+            return
+        self._box = (slice(top, bottom + window),
+                     slice(left, right + window))
+
+        selected = np.zeros((height, width), dtype=np.float64)
+        selected[rows, cols] = 1.0
+        self._crop_mask = selected[self._box].astype(np.uint8)[
+            :, :, np.newaxis]
+
+        # Only windows which overlap the (blurred) mask need to be computed, addressed by their top left pixel.
+        if blur > 0:
+            selected = cv2.blur(selected, (blur, blur))
+        selected = cv2.boxFilter(selected[self._box], _CV_64F, (window, window), anchor=(
+            0, 0), normalize=False, borderType=cv2.BORDER_CONSTANT)
+        selected[selected.shape[0]-window+1:] = 0
+        selected[:, selected.shape[1]-window+1:] = 0
+        self._selected = np.flatnonzero(np.greater(selected, 0))
+
+        self._reference = self._prepare(reference)
+        self._reference_mean = self._means(self._reference)
+        self._reference_sq_mean = self._means(self._reference, squared=True)
+
+    def _prepare(self, frame: npt.NDArray) -> npt.NDArray:
+        """Mask, blur and crop the frame to the computed windows."""
+        if frame.ndim == 2:
+            frame = frame[:, :, np.newaxis]
+        if self._blur > 0:
+            frame = cv2.blur(self._mask.apply(frame), (self._blur, self._blur))
+            if frame.ndim == 2:
+                frame = frame[:, :, np.newaxis]
+            return frame[self._box]
+        return frame[self._box] * self._crop_mask
+
+    def _means(self, frame: npt.NDArray, squared: bool = False) -> npt.NDArray:
+        """Means of all selected windows, with a shape of `(<windows>,<channels>)`."""
+        box = cv2.sqrBoxFilter if squared else cv2.boxFilter
+        means = box(frame, _CV_64F, (self._window, self._window), anchor=(
+            0, 0), normalize=True, borderType=cv2.BORDER_CONSTANT)
+        return np.reshape(means, (-1, frame.shape[2]))[self._selected]
+
+    def _product(self, frame: npt.NDArray) -> npt.NDArray:
+        if frame.dtype == np.uint8 and self._reference.dtype == np.uint8:
+            # Products of 8-bit values always fit into 16 bits.
+            product = cv2.multiply(frame, self._reference, dtype=_CV_16U)
+            if product.ndim == 2:
+                product = product[:, :, np.newaxis]
+            return product
+        return frame.astype(np.float64) * self._reference.astype(np.float64)
+
+    def __call__(self, frame: npt.NDArray) -> float:
+        """Compares the frame to the reference. (Higher is better.)"""
+        if self._box is None:
+            return 1.0
+
+        frame = self._prepare(frame)
+        frame_mean = self._means(frame)
+        frame_sq_mean = self._means(frame, squared=True)
+        product_mean = self._means(self._product(frame))
+
+        # Mirrors `sewar.full_ref.uqi`, including how it mixes window sums and means.
+        n = self._window**2
+        mean_product = self._reference_mean*frame_mean
+        mean_sq_sum = self._reference_mean**2 + frame_mean**2
+        numerator = 4*(n*product_mean - mean_product)*mean_product
+        denominator_1 = n*(self._reference_sq_mean +
+                           frame_sq_mean) - mean_sq_sum
+        denominator = denominator_1*mean_sq_sum
+
+        q = np.ones(denominator.shape)
+        np.divide(2*mean_product, mean_sq_sum, out=q,
+                  where=(denominator_1 == 0) & (mean_sq_sum != 0))
+        np.divide(numerator, denominator, out=q, where=denominator != 0)
+
+        # All skipped windows score 1.0.
+        skipped = self._windows - q.shape[0]
+        return float(np.mean((np.sum(q, axis=0) + skipped) / self._windows))
+
+
+def thumbnail(frame: npt.NDArray, scale: float) -> npt.NDArray:
+    """Downscale the frame by the given factor."""
+    return cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
 def similar_image(
     img_0: npt.NDArray,
     img_1: npt.NDArray,
-    mask: Optional[npt.NDArray] = None,
+    mask: npt.NDArray | MaskIndex | None = None,
     blur: int = 0
 ) -> float:
     """Compare two images using the Universal Quality Index (UQI). (Higher is better.)"""
-    if mask is not None:
-        img_0 = apply_mask(img_0, mask)
-        img_1 = apply_mask(img_1, mask)
-
-    if blur > 0:
-        img_0 = cv2.blur(img_0, (blur, blur))
-        img_1 = cv2.blur(img_1, (blur, blur))
-
-    return float(similarity(img_0, img_1))
+    return MaskedSimilarity(img_1, mask, blur)(img_0)
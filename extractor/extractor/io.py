@@ -1,5 +1,12 @@
+import bisect
+import json
 import logging
 import os
+import tempfile
+import threading
+import weakref
+from collections.abc import Iterable, Iterator
+from multiprocessing import util
 from os import path
 
 import cv2
@@ -7,6 +14,8 @@ import numpy as np
 import numpy.typing as npt
 from matplotlib import pyplot as plt
 
+from . import constants
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,6 +27,19 @@ def get_frame(file: str, second: float) -> npt.NDArray:
     """
 
     video = cv2.VideoCapture(file)
+    try:
+        return read_frame(video, second, file)
+    finally:
+        video.release()
+
+
+def read_frame(video: cv2.VideoCapture, second: float, file: str = "video") -> npt.NDArray:
+    """
+    Extract a frame at the given second from an open video.
+
+    Returns an `ndarray` of the shape: `(<height>,<width>,3)`.
+    """
+
     ms = 1000*float(second)
     video.set(cv2.CAP_PROP_POS_MSEC, ms)
     success, frame = video.read()
@@ -28,13 +50,227 @@ def get_frame(file: str, second: float) -> npt.NDArray:
     return np.array(frame)
 
 
+def frame_index(video: cv2.VideoCapture, second: float) -> int:
+    """Index of the frame a seek to the given second lands on (mirrors OpenCV's conversion)."""
+    return int(1000*float(second) * video.get(cv2.CAP_PROP_FPS) * 0.001 + 0.5)
+
+
+# OpenCV's ffmpeg backend seeks this many frames before the target and decodes forward from the keyframe preceding that.
+SEEK_PREROLL = 16
+
+
+class KeyframeIndex:
+    def __init__(self, fps: float, frame_count: int, keyframes: list[int]):
+        """Keyframe positions (frame indexes) of a video."""
+        self.fps = fps
+        self.frame_count = frame_count
+        self.keyframes = keyframes
+        # Frame indexes that are cheap to seek to, right after the preroll of every keyframe.
+        self._targets = [keyframe + SEEK_PREROLL for keyframe in keyframes
+                         if keyframe + SEEK_PREROLL < frame_count]
+
+    @property
+    def length(self) -> float:
+        return self.frame_count / self.fps
+
+    def seek_cost(self, index: int) -> int:
+        """Number of frames decoded when seeking to the frame index."""
+        keyframe = bisect.bisect_right(
+            self.keyframes, max(index - SEEK_PREROLL, 0)) - 1
+        return index - self.keyframes[max(keyframe, 0)]
+
+    def align(self, seconds: Iterable[float], tolerance: float) -> list[float]:
+        """Moves every timestamp to the nearest cheap seek target within the tolerance, dropping duplicates."""
+        aligned: list[float] = []
+        seen: set[float] = set()
+        for second in seconds:
+            index = second * self.fps
+            i = bisect.bisect_left(self._targets, index)
+            nearest = min(self._targets[max(i-1, 0):i+1],
+                          key=lambda target: abs(target - index), default=None)
+            if nearest is not None and abs(nearest - index) <= tolerance * self.fps:
+                second = nearest / self.fps
+            if second not in seen:
+                seen.add(second)
+                aligned.append(second)
+
+        return aligned
+
+    @staticmethod
+    def sidecar(file: str) -> str:
+        return file + ".keyframes.json"
+
+    @classmethod
+    def build(cls, file: str) -> "KeyframeIndex":
+        """Lists the keyframes of the video without decoding it."""
+        video = cv2.VideoCapture(file)
+        try:
+            fps = video.get(cv2.CAP_PROP_FPS)
+            video.set(cv2.CAP_PROP_FORMAT, -1)  # Raw packets.
+
+            keyframes: list[int] = []
+            frame_count = 0
+            while video.grab():
+                if video.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    keyframes.append(frame_count)
+                frame_count += 1
+        finally:
+            video.release()
+
+        if frame_count == 0:
+            raise OSError(f"could not index keyframes of {file}")
+
+        return cls(fps, frame_count, keyframes)
+
+    @classmethod
+    def load(cls, file: str) -> "KeyframeIndex":
+        """Loads the index from the sidecar next to the video, building and storing it if it is missing or outdated."""
+        sidecar = cls.sidecar(file)
+        stat = os.stat(file)
+        try:
+            with open(sidecar) as f:
+                stored = json.load(f)
+            if stored["size"] == stat.st_size and stored["mtime"] == stat.st_mtime:
+                return cls(stored["fps"], stored["frame_count"], stored["keyframes"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        index = cls.build(file)
+        try:
+            # Write atomically, since several processes might index the video at once.
+            with tempfile.NamedTemporaryFile("w", dir=path.dirname(sidecar) or ".", suffix=".json", delete=False) as f:
+                json.dump({
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "fps": index.fps,
+                    "frame_count": index.frame_count,
+                    "keyframes": index.keyframes,
+                }, f)
+            os.replace(f.name, sidecar)
+        except OSError as e:
+            logger.warning(f"could not store keyframe index of {file}: {e}")
+
+        return index
+
+
+def read_frames(video: cv2.VideoCapture, seconds: Iterable[float], seek_cost: int = constants.DEFAULT_SEEK_COST, file: str = "video", keyframes: KeyframeIndex | None = None) -> Iterator[tuple[float, npt.NDArray | Exception]]:
+    """
+    Extract the frames at the given (sorted) seconds from an open video.
+
+    Gaps that are cheaper to decode than seeking are decoded sequentially, others are seeked.
+    Without keyframes, seeking is assumed to cost `seek_cost` frames.
+    Frames that cannot be extracted are yielded as their exception.
+    """
+
+    # Index of the next frame to be decoded.
+    position = int(video.get(cv2.CAP_PROP_POS_FRAMES))
+    for second in seconds:
+        index = frame_index(video, second)
+        gap = index - position
+        cost = keyframes.seek_cost(index) if keyframes else seek_cost
+        if position < 0 or gap < 0 or gap > cost:
+            try:
+                frame = read_frame(video, second, file)
+            except Exception as e:
+                position = -1
+                yield second, e
+                continue
+            position = int(video.get(cv2.CAP_PROP_POS_FRAMES))
+            yield second, frame
+            continue
+
+        success = all(video.grab() for _ in range(gap))
+        success = success and video.grab()
+        if success:
+            success, frame = video.retrieve()
+        if not success:
+            position = -1
+            yield second, Exception(f"could not extract frame at {second}s in {file}")
+            continue
+
+        position = index + 1
+        yield second, np.array(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
 def video_length(file: str) -> float:
     video = cv2.VideoCapture(file)
+    try:
+        return capture_length(video)
+    finally:
+        video.release()
+
+
+def capture_length(video: cv2.VideoCapture) -> float:
     fps = video.get(cv2.CAP_PROP_FPS)
     frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
     return frame_count / fps
 
 
+# Open captures of the current process, by file.
+class _Captures:
+    def __init__(self):
+        """The captures of a thread by their file."""
+        self.videos: dict[str, cv2.VideoCapture] = {}
+
+    def release(self, file: str | None = None):
+        for name in [name for name in self.videos if file is None or name == file]:
+            self.videos.pop(name).release()
+
+
+# Captures of the current thread, which are released together with the thread.
+_local = threading.local()
+# Captures of all live threads of this process.
+_captures: weakref.WeakSet[_Captures] = weakref.WeakSet()
+_captures_lock = threading.Lock()
+# Process that releases its captures when it exits.
+_finalized: int | None = None
+
+
+def _thread_captures() -> _Captures:
+    global _finalized
+    captures = getattr(_local, "captures", None)
+    if captures is None:
+        captures = _local.captures = _Captures()
+        with _captures_lock:
+            if _finalized != os.getpid():
+                # Pool workers run these finalizers when they shut down.
+                util.Finalize(None, _release_captures, exitpriority=10)
+                _finalized = os.getpid()
+            _captures.add(captures)
+    return captures
+
+
+def _release_captures(file: str | None = None):
+    with _captures_lock:
+        for captures in list(_captures):
+            captures.release(file)
+
+
+def _forget_captures():
+    global _local, _captures, _captures_lock
+    _local = threading.local()
+    _captures = weakref.WeakSet()
+    _captures_lock = threading.Lock()
+
+
+# Captures inherited from the parent process must not be used concurrently by a forked child.
+os.register_at_fork(after_in_child=_forget_captures)
+
+
+def open_video(file: str) -> cv2.VideoCapture:
+    """Returns the capture of the file for the current thread, opening it only once and releasing it when the thread or process exits."""
+    captures = _thread_captures()
+    video = captures.videos.get(file, None)
+    if video is None:
+        video = captures.videos[file] = cv2.VideoCapture(file)
+    return video
+
+
+def close_video(file: str):
+    """Releases the captures of the file for all threads of the current process (if any)."""
+    _release_captures(file)
+
+
 def show_frame(frame: npt.NDArray):
     plt.imshow(frame)
     plt.show()
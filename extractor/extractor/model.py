@@ -1,6 +1,9 @@
 import datetime
 import json
 
+import numpy as np
+import numpy.typing as npt
+
 
 class ColorUpdate:
     def __init__(self, colors: list[tuple[float, float, float]], temps: list[float], timestamp: float = -1.0):
@@ -74,6 +77,51 @@ class ColorUpdate:
         return ColorUpdate(hues, temps, timestamp)
 
 
+class Timeline:
+    def __init__(self, updates: list[ColorUpdate]):
+        """
+        Stores a sequence of updates as arrays.
+
+        timestamps: npt.NDArray
+            Shape of `(<updates>,)`.
+        colors: npt.NDArray
+            Shape of `(<updates>,<hue areas>,3)` with `(hue, saturation, value)` channels, `nan` for invalid updates.
+        temps: npt.NDArray
+            Shape of `(<updates>,<temperature areas>)`, `nan` for invalid updates.
+        invalid: npt.NDArray
+            Shape of `(<updates>,)`.
+        """
+        valid = [u for u in updates if not u._invalid]
+        colors = {len(u._colors) for u in valid}
+        temps = {len(u._temps) for u in valid}
+        if len(colors) > 1:
+            raise ValueError(
+                f"ColorUpdate colors have different lengths {colors}.")
+        elif len(temps) > 1:
+            raise ValueError(
+                f"ColorUpdate temps have different lengths {temps}.")
+        color_count = colors.pop() if len(colors) > 0 else 0
+        temp_count = temps.pop() if len(temps) > 0 else 0
+
+        self.timestamps: npt.NDArray = np.array(
+            [u._timestamp for u in updates], dtype=np.float64)
+        self.invalid: npt.NDArray = np.array(
+            [u._invalid for u in updates], dtype=bool)
+        self.colors: npt.NDArray = np.full(
+            (len(updates), color_count, 3), np.nan)
+        self.temps: npt.NDArray = np.full((len(updates), temp_count), np.nan)
+        for i, u in enumerate(updates):
+            if u._invalid:
+                continue
+            if color_count > 0:
+                self.colors[i] = u._colors
+            if temp_count > 0:
+                self.temps[i] = u._temps
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
 def to_json(updates: list[ColorUpdate], url: str, compact: bool = False) -> str:
     data = {
         "url": url,
@@ -83,6 +131,65 @@ def to_json(updates: list[ColorUpdate], url: str, compact: bool = False) -> str:
     return json.dumps(data, indent=None if compact else 4, separators=(",", ":") if compact else None)
 
 
+class JSONWriter:
+    def __init__(self, file: str, url: str, compact: bool = False):
+        """
+        Writes updates to a file one at a time, in the format of `to_json`.
+
+        After every update, the file holds valid JSON with the updates so far, so an interruption keeps them.
+        The file is opened when entering the writer and closed when leaving it.
+        """
+        self._file = file
+        self._compact = compact
+        self._count = 0
+        self._empty = to_json([], url, compact)
+        # Everything after the opening bracket of the (empty) updates.
+        self._closing = self._empty[self._empty.rindex("[]")+1:]
+        self._end = 0
+
+    def _close_updates(self):
+        if self._count == 0:
+            self._f.write(self._closing)
+        elif self._compact:
+            self._f.write("]}")
+        else:
+            self._f.write("\n    ]\n}")
+        self._f.truncate()
+        self._f.flush()
+
+    def write(self, update: ColorUpdate):
+        """Appends the update to the file."""
+        if self._compact:
+            element = json.dumps(update.to_dict(), separators=(",", ":"))
+        else:
+            element = "\n        " + \
+                json.dumps(update.to_dict(), indent=4).replace(
+                    "\n", "\n        ")
+
+        self._f.seek(self._end)
+        self._f.write(element if self._count == 0 else "," + element)
+        self._end = self._f.tell()
+        self._count += 1
+        self._close_updates()
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        self._f = open(self._file, "w")
+        try:
+            self._f.write(self._empty[:len(self._empty)-len(self._closing)])
+            self._end = self._f.tell()
+            self._close_updates()
+        except BaseException:
+            self._f.close()
+            raise
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
 def from_json(json_string: str) -> tuple[str, list[ColorUpdate]]:
     data = json.loads(json_string)
     url = data["url"]
@@ -1,4 +1,19 @@
-from extractor import color, constants, data, io, model, search
+import math
+import multiprocessing.pool
+from collections.abc import Iterator
+from functools import lru_cache
+
+from extractor import (
+    cache,
+    color,
+    constants,
+    data,
+    io,
+    model,
+    prefetch,
+    scenecut,
+    search,
+)
 
 
 def extract_from_youtube_video(
@@ -10,11 +25,105 @@ def extract_from_youtube_video(
     step: int = constants.DEFAULT_SEARCH_STEP,
     workers: int = 1,
     refinement_accuracy: float = constants.DEFAULT_REFINEMENT_ACCURACY,
+    frame_cache: bool = False,
+    lookahead: int = constants.DEFAULT_PREFETCH,
+    pool: multiprocessing.pool.Pool | None = None,
+    interpolate: bool = False,
+    min_step: float | None = None,
+    budget: int | None = None,
+    checkpoint: str | None = None,
+    backend: str = constants.DEFAULT_BACKEND,
+    stages: dict[str, tuple[int, int]] | None = None,
+    prepass_step: float | None = None,
+    prepass_quality: str = constants.DEFAULT_PREPASS_QUALITY,
+    quiet: bool = constants.QUIET,
 ) -> list[model.ColorUpdate]:
+    """Extracts all updates at once, see `stream_from_youtube_video`."""
+    return list(stream_from_youtube_video(
+        frames_directory,
+        video_url,
+        quality,
+        brightness_cutoff,
+        valid_threshold,
+        step,
+        workers,
+        refinement_accuracy,
+        frame_cache,
+        lookahead,
+        pool,
+        interpolate=interpolate,
+        min_step=min_step,
+        budget=budget,
+        checkpoint=checkpoint,
+        backend=backend,
+        stages=stages,
+        prepass_step=prepass_step,
+        prepass_quality=prepass_quality,
+        quiet=quiet,
+    ))
+
+
+@lru_cache
+def _frames_memory(frames_directory: str, quality: str) -> tuple[int, int]:
+    """Bytes of the masks and their copies in shared memory, and of a frame (the same for every episode, so they are only loaded once)."""
+    frame_mask, frame, hues, temps = io.find_frames(frames_directory, quality)
+    return 2 * sum(mask.nbytes for mask in [frame_mask, frame, *hues, *temps]), frame.nbytes
+
+
+def episode_memory(
+    frames_directory: str,
+    quality: str = constants.DEFAULT_QUALITY,
+    length: float = constants.DEFAULT_EPISODE_LENGTH,
+    step: int = constants.DEFAULT_SEARCH_STEP,
+    refinement_accuracy: float = constants.DEFAULT_REFINEMENT_ACCURACY,
+    lookahead: int = constants.DEFAULT_PREFETCH,
+    workers: int = 1,
+) -> int:
+    """
+    Rough number of bytes an extraction of a video `length` seconds long holds (the frames being evaluated are held by the workers).
+
+    That is the masks and their copies in shared memory, the frames prefetched ahead of the workers, the manager sharing the evaluations with several worker processes, and the evaluations.
+    The frame cache and checkpoints are kept on disk instead.
+    """
+    masks, frame = _frames_memory(frames_directory, quality)
+    prefetched = min(lookahead * frame, constants.DEFAULT_PREFETCH_MEMORY)
+    # At most, every interval of the coarse pass is refined down to the accuracy.
+    evaluations = (length / step + 1) * \
+        (1 + max(math.log2(step / refinement_accuracy), 0))
+    manager = constants.MANAGER_MEMORY if workers > 1 else 0
+    return masks + prefetched + manager + int(evaluations * constants.EVALUATION_MEMORY)
+
+
+def stream_from_youtube_video(
+    frames_directory: str,
+    video_url: str,
+    quality: str = constants.DEFAULT_QUALITY,
+    brightness_cutoff: float = constants.DEFAULT_BRIGHTNESS_CUTOFF,
+    valid_threshold: float = constants.DEFAULT_VALID_THRESHOLD,
+    step: int = constants.DEFAULT_SEARCH_STEP,
+    workers: int = 1,
+    refinement_accuracy: float = constants.DEFAULT_REFINEMENT_ACCURACY,
+    frame_cache: bool = False,
+    lookahead: int = constants.DEFAULT_PREFETCH,
+    pool: multiprocessing.pool.Pool | None = None,
+    interpolate: bool = False,
+    min_step: float | None = None,
+    budget: int | None = None,
+    checkpoint: str | None = None,
+    backend: str = constants.DEFAULT_BACKEND,
+    stages: dict[str, tuple[int, int]] | None = None,
+    prepass_step: float | None = None,
+    prepass_quality: str = constants.DEFAULT_PREPASS_QUALITY,
+    quiet: bool = constants.QUIET,
+) -> Iterator[model.ColorUpdate]:
     frame_mask, frame, hues, temps = io.find_frames(
         frames_directory, quality)
 
-    d = data.YouTubeVideo(video_url, quality)
+    d: data.FrameGenerator = data.YouTubeVideo(video_url, quality)
+    if frame_cache:
+        d = cache.FrameCache(d)
+    if lookahead > 0:
+        d = prefetch.Prefetcher(d, lookahead)
     sch = search.Extractor(
         color.Color(
             brightness_cutoff=brightness_cutoff,
@@ -26,6 +135,16 @@ def extract_from_youtube_video(
         valid_threshold=valid_threshold
     )
 
+    # The prepass decodes a single (lower quality) download of the whole video instead of downloading every sample, its frames are downscaled anyway.
+    prepass = scenecut.Prepass(
+        data.YouTubeDownload(video_url, prepass_quality),
+        hues + temps,
+        frame_mask,
+        frame,
+        step=prepass_step,
+        valid_threshold=valid_threshold
+    ) if prepass_step is not None else None
+
     s = search.Search(sch, d, step=step,
-                      workers=workers, refinement_accuracy=refinement_accuracy)
-    return s.search()
+                      workers=workers, refinement_accuracy=refinement_accuracy, pool=pool, interpolate=interpolate, min_step=min_step, budget=budget, checkpoint=checkpoint, backend=backend, stages=stages, prepass=prepass, quiet=quiet)
+    return s.stream()
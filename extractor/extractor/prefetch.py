@@ -0,0 +1,144 @@
+import os
+import threading
+from collections import deque
+from collections.abc import Generator, Iterable
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy.typing as npt
+
+from . import constants, data
+
+
+class Prefetcher(data.FrameGenerator):
+    def __init__(self, generator: data.FrameGenerator, lookahead: int = constants.DEFAULT_PREFETCH, memory: int = constants.DEFAULT_PREFETCH_MEMORY):
+        """
+        Streams the frames of the generator on a background thread, so obtaining the next frames overlaps with processing the current one.
+
+        At most `lookahead` frames and `memory` bytes are held ahead of the consumer (but always at least one frame).
+        A single thread streams the frames of every call, since decoders are sequential and not thread-safe.
+        The threads are kept for the following calls (until `close`), so they reuse the resources of the generator (e.g. the captures of a video).
+        """
+        self._generator = generator
+        self._lookahead = lookahead
+        self._memory = memory
+        self._counters = {"hit": 0, "stall": 0, "miss": 0}
+        self._lock = threading.Lock()
+        # Started by the first call of every process.
+        self._executor: ThreadPoolExecutor | None = None
+        self._owner: int | None = None
+
+    def __getstate__(self):
+        # Threads belong to their process, workers start their own.
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_executor"] = None
+        state["_owner"] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._lock = threading.Lock()
+
+    @property
+    def counters(self) -> dict[str, int]:
+        """Frames that were ready when requested (hit), had to be waited for (stall) or were obtained without prefetching (miss)."""
+        with self._lock:
+            return dict(self._counters)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _producer(self) -> ThreadPoolExecutor:
+        with self._lock:
+            # Forked processes inherit the executor, but not its threads.
+            if self._executor is None or self._owner != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    thread_name_prefix="prefetch")
+                self._owner = os.getpid()
+            return self._executor
+
+    def get_frame(self, second: float) -> npt.NDArray:
+        """Obtain a frame at a certain time point (without prefetching)."""
+        self._count("miss")
+        return self._generator.get_frame(second)
+
+    def frames(self, seconds: Iterable[float]) -> Generator[tuple[float, npt.NDArray | Exception], None, None]:
+        """Obtain the frames at the given (sorted) time points, prefetching the upcoming ones."""
+        if self._lookahead <= 0:
+            yield from self._generator.frames(seconds)
+            return
+
+        condition = threading.Condition()
+        ready: deque[tuple[float, npt.NDArray | Exception]] = deque()
+        state = {"size": 0, "done": False, "stop": False}
+        failure: list[BaseException] = []
+
+        def full() -> bool:
+            return len(ready) >= self._lookahead or (len(ready) > 0 and state["size"] >= self._memory)
+
+        def produce():
+            try:
+                for second, frame in self._generator.frames(seconds):
+                    with condition:
+                        condition.wait_for(
+                            lambda: state["stop"] or not full())
+                        if state["stop"]:
+                            return
+                        ready.append((second, frame))
+                        state["size"] += getattr(frame, "nbytes", 0)
+                        condition.notify_all()
+            except Exception as e:
+                failure.append(e)
+            finally:
+                with condition:
+                    state["done"] = True
+                    condition.notify_all()
+
+        producer = self._producer().submit(produce)
+        try:
+            while True:
+                with condition:
+                    stalled = not ready and not state["done"]
+                    condition.wait_for(lambda: ready or state["done"])
+                    if not ready:
+                        break
+
+                    self._count("stall" if stalled else "hit")
+                    second, frame = ready.popleft()
+                    state["size"] -= getattr(frame, "nbytes", 0)
+                    condition.notify_all()
+
+                yield second, frame
+
+            if failure:
+                raise failure[0]
+        finally:
+            with condition:
+                state["stop"] = True
+                condition.notify_all()
+            wait([producer])
+
+    def align(self, seconds: Iterable[float], tolerance: float) -> list[float]:
+        return self._generator.align(seconds, tolerance)
+
+    def close(self):
+        """Stops the threads of the current process and releases the resources of the generator."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._owner == os.getpid():
+            executor.shutdown()
+        self._generator.close()
+
+    @property
+    def identity(self) -> str | None:
+        return self._generator.identity
+
+    @property
+    def frame_rate(self) -> float | None:
+        return self._generator.frame_rate
+
+    @property
+    def length(self) -> float:
+        return self._generator.length
@@ -0,0 +1,92 @@
+import logging
+
+import cv2
+import numpy as np
+import numpy.typing as npt
+
+from . import constants, data, image
+
+logger = logging.getLogger(__name__)
+
+
+class Prepass:
+    def __init__(self, d: data.FrameGenerator, areas: list[npt.NDArray], valid_mask: npt.NDArray, valid_content: npt.NDArray, step: float = constants.DEFAULT_PREPASS_STEP, scale: float = constants.DEFAULT_PREPASS_SCALE, color_threshold: float = constants.DEFAULT_PREPASS_THRESHOLD, valid_threshold: float = constants.DEFAULT_VALID_THRESHOLD):
+        """
+        Localizes color changes cheaply, on frames downscaled by `scale` every `step` seconds.
+
+        Every frame is reduced to the mean color of each area (normalized to `[0,1]`), and checked for validity like the thumbnail check of the extractor.
+        Consecutive valid frames whose mean colors differ by more than `color_threshold` in any channel are candidates for a change.
+        The data may be a cheaper (lower resolution) stream of the same video, frames are resized to the downscaled masks.
+        """
+        self._data = d
+        self._step = step
+        self._scale = scale
+        self._color_threshold = color_threshold
+        self._valid_threshold = valid_threshold
+
+        mask = image.thumbnail(valid_mask, scale)
+        self._size = (mask.shape[1], mask.shape[0])
+        self._valid = image.MaskedSimilarity(
+            image.thumbnail(valid_content, scale), mask)
+        weights = [image.thumbnail(area, scale)[..., 0].astype(
+            np.float64) / 255 for area in areas]
+        # Normalized, so the weighted sum over the pixels is the mean of an area.
+        self._weights = np.stack(
+            [w / max(w.sum(), 1e-9) for w in weights]) if weights else np.zeros((0,) + mask.shape[:2])
+
+    @property
+    def step(self) -> float:
+        return self._step
+
+    @property
+    def parameters(self) -> dict:
+        """Settings that affect the candidates (e.g. to tell checkpoints apart)."""
+        return {
+            "data": self._data.identity,
+            "step": self._step,
+            "scale": self._scale,
+            "color_threshold": self._color_threshold,
+            "valid_threshold": self._valid_threshold,
+        }
+
+    def signal(self, frame: npt.NDArray) -> tuple[npt.NDArray, bool]:
+        """Mean color of every area with a shape of `(<areas>,<channels>)` and whether the frame is valid."""
+        if (frame.shape[1], frame.shape[0]) != self._size:
+            frame = cv2.resize(frame, self._size, interpolation=cv2.INTER_AREA)
+
+        means = np.tensordot(self._weights, frame.astype(
+            np.float64) / 255, axes=([1, 2], [0, 1]))
+        return means, self._valid(frame) > self._valid_threshold
+
+    def signals(self) -> tuple[npt.NDArray, npt.NDArray, npt.NDArray]:
+        """Samples the data, returns `(seconds, means, valid)` with shapes of `(<frames>,)`, `(<frames>,<areas>,<channels>)` and `(<frames>,)`."""
+        seconds = self._data.align(
+            np.arange(0, self._data.length, self._step), self._step/4)
+
+        sampled, means, valid = [], [], []
+        for second, frame in self._data.frames(seconds):
+            if isinstance(frame, Exception):
+                logger.warning(f"frame {second:.2f}s frame error: {frame}")
+                continue
+            m, v = self.signal(frame)
+            sampled.append(second)
+            means.append(m)
+            valid.append(v)
+
+        return np.array(sampled, dtype=np.float64), np.array(means).reshape((len(sampled), len(self._weights), -1)), np.array(valid, dtype=bool)
+
+    def candidates(self) -> tuple[float | None, list[tuple[float, float]]]:
+        """Returns the first valid time point (if any) and the intervals in between valid frames that likely contain a color change."""
+        seconds, means, valid = self.signals()
+        seconds = seconds[valid]
+        means = means[valid]
+        if len(seconds) == 0:
+            return None, []
+
+        changes = np.abs(np.diff(means, axis=0)).max(
+            axis=(1, 2), initial=0.0) > self._color_threshold
+        intervals = [(float(seconds[i]), float(seconds[i+1]))
+                     for i in np.flatnonzero(changes)]
+        logger.info(
+            f"prepass found {len(intervals)} candidates in {len(valid)} frames ({len(seconds)} valid)")
+        return float(seconds[0]), intervals
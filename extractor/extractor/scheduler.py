@@ -0,0 +1,93 @@
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, name: str, function: Callable[[], Any], memory: int = 0):
+        """A unit of work (e.g. an episode) that holds about `memory` bytes while it runs."""
+        self.name = name
+        self.function = function
+        self.memory = memory
+        self.queued = time.perf_counter()
+        self.started: float | None = None
+        self.finished: float | None = None
+
+    @property
+    def waiting(self) -> float:
+        """Seconds the job waited for its turn."""
+        return (self.started or time.perf_counter()) - self.queued
+
+    @property
+    def running(self) -> float:
+        """Seconds the job ran (so far)."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def __str__(self) -> str:
+        return f"{self.name}: waited {self.waiting:.1f}s, ran {self.running:.1f}s"
+
+
+class Scheduler:
+    def __init__(self, concurrency: int = 1, memory: int | None = None):
+        """
+        Runs jobs concurrently on threads, at most `concurrency` at once and (if given) within `memory` bytes.
+
+        Jobs are started in order, a job that does not fit waits for running ones to finish (but a job always runs if no other does).
+        The jobs share the budget of whatever they submit to (e.g. one pool of workers), so their work interleaves instead of adding up.
+        """
+        self._concurrency = max(concurrency, 1)
+        self._memory = memory
+        self._condition = threading.Condition()
+        self._running = 0
+        self._used = 0
+
+    def _fits(self, job: Job) -> bool:
+        if self._running == 0:
+            return True
+        return self._running < self._concurrency and (self._memory is None or self._used + job.memory <= self._memory)
+
+    def run(self, jobs: Iterable[Job]) -> Iterator[tuple[Job, Any | Exception]]:
+        """Yields every job with its result (or the exception it raised) as soon as it finishes."""
+        jobs = list(jobs)
+        finished: queue.Queue[tuple[Job,
+                                    Any | Exception]] = queue.Queue()
+
+        def work(job: Job):
+            result: Any | Exception
+            try:
+                result = job.function()
+            except Exception as e:
+                result = e
+            job.finished = time.perf_counter()
+            with self._condition:
+                self._running -= 1
+                self._used -= job.memory
+                self._condition.notify_all()
+            finished.put((job, result))
+
+        def dispatch():
+            for job in jobs:
+                with self._condition:
+                    self._condition.wait_for(lambda job=job: self._fits(job))
+                    self._running += 1
+                    self._used += job.memory
+                    running = self._running
+                job.started = time.perf_counter()
+                logger.info(
+                    f"started {job.name} after {job.waiting:.1f}s ({running} running)")
+                threading.Thread(target=work, args=(job,), daemon=True).start()
+
+        dispatcher = threading.Thread(target=dispatch, daemon=True)
+        dispatcher.start()
+        for _ in jobs:
+            job, result = finished.get()
+            logger.info(f"finished {job}")
+            yield job, result
+        dispatcher.join()
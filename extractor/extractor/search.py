@@ -1,11 +1,23 @@
+import copy
+import hashlib
 import logging
+import math
+import multiprocessing.pool
+import os
+import pickle
+import tempfile
+import threading
 from abc import ABC, abstractmethod
-from multiprocessing import Pool
+from collections import OrderedDict
+from collections.abc import Callable, Generator, Iterator, MutableMapping
+from contextlib import closing, contextmanager
+from multiprocessing import Manager
+from os import path
 
 import numpy.typing as npt
 import tqdm
 
-from . import color, constants, data, image, model
+from . import color, constants, data, executor, image, model, scenecut, shared, staging
 
 logger = logging.getLogger(__name__)
 
@@ -26,62 +38,577 @@ class AbstractExtractor(ABC):
         """Checks if the two updates are similar."""
         raise NotImplementedError
 
+    def distance(self, update1: model.ColorUpdate, update2: model.ColorUpdate) -> float:
+        """Distance between the two updates, at most `1` if they are similar (without a finer measure, dissimilar updates are infinitely far apart)."""
+        return 0.0 if self.similar(update1, update2) else math.inf
+
+    def similar_neighbours(self, updates: list[model.ColorUpdate]) -> list[bool]:
+        """Checks if every update is similar to the next one."""
+        return [self.similar(updates[i-1], updates[i]) for i in range(1, len(updates))]
+
+    @property
+    def parameters(self) -> dict:
+        """Settings that affect the extracted updates (e.g. to tell checkpoints apart)."""
+        return {}
+
+    def close(self):
+        """Release resources held for a search."""
+
 
 class Extractor(AbstractExtractor):
-    def __init__(self, c: color.AbstractColor, hue_areas: list[npt.NDArray], temp_areas: list[npt.NDArray], valid_mask: npt.NDArray, valid_content: npt.NDArray, valid_threshold: float = 0.8):
-        """Defines how to search for the color and temperature of the image."""
+    def __init__(self, c: color.AbstractColor, hue_areas: list[npt.NDArray], temp_areas: list[npt.NDArray], valid_mask: npt.NDArray, valid_content: npt.NDArray, valid_threshold: float = 0.8, cascade_scale: float = constants.DEFAULT_CASCADE_SCALE, cascade_margin: float = constants.DEFAULT_CASCADE_MARGIN):
+        """
+        Defines how to search for the color and temperature of the image.
+
+        Validity is first checked on thumbnails downscaled by `cascade_scale`, only if that score is within `cascade_margin` of `valid_threshold` the full frame is checked (`cascade_scale=1` always checks the full frame).
+        """
         self._color = c
-        self._hue_areas = hue_areas
-        self._temp_areas = temp_areas
-        self._valid_mask = valid_mask
-        self._valid_content = valid_content
+        self._inputs = (hue_areas, temp_areas, valid_mask, valid_content)
+        self._shared: _SharedInputs | None = None
         self._valid_threshold = valid_threshold
+        # The masks never change during a run, so only compile them once.
+        self._areas = image.MaskSet(hue_areas + temp_areas)
+        self._hue_count = len(hue_areas)
+        self._valid = image.MaskedSimilarity(valid_content, valid_mask)
+
+        self._cascade_scale = cascade_scale
+        self._cascade_margin = cascade_margin
+        self._valid_thumbnail = image.MaskedSimilarity(
+            image.thumbnail(valid_content, cascade_scale),
+            image.thumbnail(valid_mask, cascade_scale)
+        ) if 0 < cascade_scale < 1 else None
+        # Number of frames decided by each stage of the validity check (a search adds those of its worker processes).
+        self.cascade_counters = {"thumbnail": 0, "full": 0}
+        self._counters_lock = threading.Lock()
+
+    def __reduce__(self):
+        # Workers attach to the masks in shared memory instead of receiving copies with every task.
+        if self._shared is None:
+            hue_areas, temp_areas, valid_mask, valid_content = self._inputs
+            self._shared = _SharedInputs(
+                [shared.SharedArray(area) for area in hue_areas],
+                [shared.SharedArray(area) for area in temp_areas],
+                shared.SharedArray(valid_mask),
+                shared.SharedArray(valid_content),
+            )
+
+        return (_attach_extractor, (self._shared, self._color, self._valid_threshold, self._cascade_scale, self._cascade_margin))
+
+    @property
+    def parameters(self) -> dict:
+        hue_areas, temp_areas, valid_mask, valid_content = self._inputs
+        masks = hashlib.sha256()
+        for mask in hue_areas + temp_areas + [valid_mask, valid_content]:
+            masks.update(mask.tobytes())
+        return {
+            "color": self._color.parameters,
+            "areas": (len(hue_areas), len(temp_areas)),
+            "masks": masks.hexdigest(),
+            "valid_threshold": self._valid_threshold,
+            "cascade_scale": self._cascade_scale,
+            "cascade_margin": self._cascade_margin,
+        }
+
+    def close(self):
+        """Frees the masks shared with the workers, which detach from them once they attach to the next extractor."""
+        if self._shared is not None:
+            for array in self._shared.arrays:
+                array.close()
+            self._shared = None
 
     def is_valid(self, frame: npt.NDArray) -> bool:
         """Checks if the frame is valid for the scheme."""
-        return image.similar_image(frame, self._valid_content, self._valid_mask) > self._valid_threshold
+        if self._valid_thumbnail is not None:
+            score = self._valid_thumbnail(
+                image.thumbnail(frame, self._cascade_scale))
+            if abs(score - self._valid_threshold) > self._cascade_margin:
+                self._count("thumbnail")
+                return score > self._valid_threshold
+
+        self._count("full")
+        return self._valid(frame) > self._valid_threshold
+
+    def _count(self, stage: str, frames: int = 1):
+        with self._counters_lock:
+            self.cascade_counters[stage] += frames
 
     def extract(self, frame: npt.NDArray) -> model.ColorUpdate:
         """Extracts the color from the frame."""
         if not self.is_valid(frame):
             raise Exception("Frame is not valid for this scheme.")
 
-        hues = []
-        temps = []
-        for area in self._hue_areas:
-            hue = self._color.hue(frame, area)
-            hues.append(hue)
-        for area in self._temp_areas:
-            temp = self._color.temp(frame, area)
-            temps.append(temp)
+        colors = self._color.hues(frame, self._areas)
+        hues = colors[:self._hue_count]
+        temps = self._color.temperatures(colors[self._hue_count:])
         return model.ColorUpdate(hues, temps)
 
     def similar(self, update1: model.ColorUpdate, update2: model.ColorUpdate) -> bool:
         """Checks if the two updates are similar."""
         return self._color.similar(update1, update2)
 
+    def distance(self, update1: model.ColorUpdate, update2: model.ColorUpdate) -> float:
+        """Distance between the two updates relative to the similarity thresholds."""
+        return self._color.distance(update1, update2)
+
+    def similar_neighbours(self, updates: list[model.ColorUpdate]) -> list[bool]:
+        """Checks if every update is similar to the next one."""
+        return self._color.similar_neighbours(model.Timeline(updates)).tolist()
+
+
+class _SharedInputs:
+    def __init__(self, hue_areas: list[shared.SharedArray], temp_areas: list[shared.SharedArray], valid_mask: shared.SharedArray, valid_content: shared.SharedArray):
+        """The masks of an extractor in shared memory."""
+        self.hue_areas = hue_areas
+        self.temp_areas = temp_areas
+        self.valid_mask = valid_mask
+        self.valid_content = valid_content
+
+    @property
+    def arrays(self) -> list[shared.SharedArray]:
+        return self.hue_areas + self.temp_areas + [self.valid_mask, self.valid_content]
+
+
+# Extractors of the current process by their shared masks (least recently used first), so every task of a worker reuses them.
+_attached: OrderedDict[str, tuple[Extractor, _SharedInputs]] = OrderedDict()
+_attached_limit = constants.DEFAULT_ATTACHED_EXTRACTORS
+
+
+def limit_attached(limit: int):
+    """Keeps up to `limit` extractors attached in the current process, e.g. as the initializer of the workers of `limit` concurrent searches."""
+    global _attached_limit
+    _attached_limit = max(limit, 1)
+
+
+def _attach_extractor(inputs: _SharedInputs, c: color.AbstractColor, valid_threshold: float, cascade_scale: float, cascade_margin: float) -> Extractor:
+    key = inputs.valid_content.name
+    if key in _attached:
+        _attached.move_to_end(key)
+        return _attached[key][0]
+
+    # Searches that ended (e.g. previous episodes of a playlist) freed their masks, the least recently used ones make room for the new extractor.
+    for name, (_, previous) in list(_attached.items()):
+        if previous.valid_content.freed or len(_attached) >= _attached_limit:
+            for array in previous.arrays:
+                array.close()
+            del _attached[name]
+
+    extractor = Extractor(
+        c,
+        [area.array for area in inputs.hue_areas],
+        [area.array for area in inputs.temp_areas],
+        inputs.valid_mask.array,
+        inputs.valid_content.array,
+        valid_threshold=valid_threshold,
+        cascade_scale=cascade_scale,
+        cascade_margin=cascade_margin,
+    )
+    extractor._shared = inputs
+    _attached[key] = (extractor, inputs)
+    return extractor
+
+
+def _difference(after: dict[str, int], before: dict[str, int]) -> dict[str, int]:
+    return {name: count - before.get(name, 0) for name, count in after.items()}
+
+
+class _Refinement:
+    factors = (0.5, 0.25, 0.75, 0.1, 0.9)
+
+    def __init__(self, first: model.ColorUpdate, second: model.ColorUpdate, accuracy: float, distance: Callable[[model.ColorUpdate, model.ColorUpdate], float] | None = None):
+        """
+        Narrows down the transition between two updates, one round of probes at a time.
+
+        A round either splits the interval evenly with several probes, or probes it once at the next factor when that found no clean split.
+        With a `distance`, every round instead probes once (regardless of `k`) where the color is interpolated to be as far from `first` as from `second` (regula falsi).
+        This converges on gradual transitions (fades) too, and bisects while both ends are still similar to the original updates.
+        """
+        if first._timestamp >= second._timestamp:
+            raise Exception("First update must be before second update.")
+        elif second._invalid:
+            raise Exception("Second update must be valid.")
+
+        self._first = first
+        self._second = second
+        self._accuracy = accuracy
+        self._factor = 0
+        self._fallback = False
+        self._distance = distance
+        if distance is not None:
+            # Signed position of the ends between the original updates, negative towards `first`.
+            self._start = first
+            self._end = second
+            self._values = [self._position(first), self._position(second)]
+            # The end that stayed in the last round (none yet).
+            self._retained = -1
+            self._interpolated = False
+            self._stalled = False
+        # The refined timestamp of the second update, once done.
+        self.timestamp: float | None = None
+
+    def probe(self, k: int = 1) -> list[float]:
+        """Returns the (up to `k`) timestamps to evaluate next, none once done."""
+        width = self._second._timestamp - self._first._timestamp
+        if self.timestamp is None and abs(width) < self._accuracy:
+            self.timestamp = self._second._timestamp
+        if self.timestamp is not None:
+            return []
+
+        if self._distance is not None:
+            return [self._first._timestamp + width * self._interpolate()]
+
+        # More probes than needed to get below the accuracy would be wasted.
+        k = min(k, max(1, int(width / self._accuracy)))
+        if k == 1 or self._fallback:
+            return [self._first._timestamp + width * self.factors[self._factor]]
+
+        return [self._first._timestamp + width * (i+1) / (k+1) for i in range(k)]
+
+    def advance(self, probes: list[model.ColorUpdate], similar: Callable[[model.ColorUpdate, model.ColorUpdate], bool]):
+        """Narrows the transition down with the evaluated probes (in order)."""
+        if self._distance is not None:
+            for probe in probes:
+                self._advance_interpolate(probe)
+            return
+        elif len(probes) == 1:
+            self._advance_factor(probes[0], similar)
+            return
+
+        left = 0
+        while left < len(probes) and (probes[left]._invalid or similar(self._first, probes[left])):
+            self._first = probes[left]
+            left += 1
+        right = len(probes)
+        while right > left and similar(probes[right-1], self._second):
+            self._second = probes[right-1]
+            right -= 1
+
+        if left == 0 and right == len(probes):
+            logger.debug(
+                f"could not split from {self._first.timestring} to {self._second.timestring} evenly, trying factors")
+            self._fallback = True
+            self._factor = 0
+
+    def _advance_factor(self, probe: model.ColorUpdate, similar: Callable[[model.ColorUpdate, model.ColorUpdate], bool]):
+        if probe._invalid or similar(self._first, probe):
+            self._first = probe
+            self._factor = 0
+            self._fallback = False
+            return
+        elif similar(probe, self._second):
+            self._second = probe
+            self._factor = 0
+            self._fallback = False
+            return
+
+        logger.debug(
+            f"could not refine from {self._first.timestring} to {self._second.timestring} with factor {self.factors[self._factor]}, trying next factor")
+        self._factor += 1
+        if self._factor == len(self.factors):
+            logger.warning(
+                f"could not refine from {self._first.timestring} to {self._second.timestring}, color transition might be longer than refinement_accuracy={self._accuracy:.1f}s")
+            self.timestamp = self._second._timestamp
+
+    def __getstate__(self):
+        # The distance belongs to the extractor, which is not part of the progress.
+        state = self.__dict__.copy()
+        state["_distance"] = None
+        return state
+
+    def attach(self, distance: Callable[[model.ColorUpdate, model.ColorUpdate], float] | None):
+        """Restores the distance of an unpickled refinement."""
+        self._distance = distance
+
+    def _position(self, update: model.ColorUpdate) -> float:
+        if update._invalid:
+            return -math.inf
+
+        assert self._distance is not None
+        return self._distance(self._start, update) - self._distance(update, self._end)
+
+    def _interpolate(self) -> float:
+        """The fraction of the interval to probe next."""
+        assert self._distance is not None
+        low, high = self._values
+        plateau = self._distance(self._start, self._first) <= 1 and self._distance(
+            self._second, self._end) <= 1
+        self._interpolated = not plateau and not self._stalled and math.isfinite(
+            low) and math.isfinite(high) and low < high
+        if not self._interpolated:
+            return 0.5
+
+        # Keep away from the ends, an estimate there narrows the interval barely.
+        return min(max(low / (low - high), 0.05), 0.95)
+
+    def _advance_interpolate(self, probe: model.ColorUpdate):
+        width = self._second._timestamp - self._first._timestamp
+        position = self._position(probe)
+        side = 0 if position <= 0 else 1
+        if side == 0:
+            self._first = probe
+        else:
+            self._second = probe
+
+        if self._interpolated and self._retained == 1 - side:
+            # Illinois: halve the value of an end that stays, so the estimates approach it as well.
+            self._values[self._retained] /= 2
+        self._values[side] = position
+        self._retained = 1 - side
+        # Bisect after an estimate that did not halve the interval (e.g. on a plateau in between), so it never converges slower than bisection.
+        self._stalled = self._interpolated and self._second._timestamp - \
+            self._first._timestamp > width / 2
+
 
 class Search:
-    def __init__(self, s: AbstractExtractor, d: data.FrameGenerator, step: int = 120, refinement_accuracy: float = 10.0, workers: int = 1, quiet: bool = constants.QUIET):
-        """Extracts the color and temperature of the data in a binary-search fashion."""
+    def __init__(self, s: AbstractExtractor, d: data.FrameGenerator, step: int = 120, refinement_accuracy: float = 10.0, workers: int = 1, quiet: bool = constants.QUIET, pool: multiprocessing.pool.Pool | executor.Executor | None = None, memoize: bool = True, interpolate: bool = False, min_step: float | None = None, budget: int | None = None, checkpoint: str | None = None, backend: str = constants.DEFAULT_BACKEND, stages: dict[str, tuple[int, int]] | None = None, prepass: scenecut.Prepass | None = None):
+        """
+        Extracts the color and temperature of the data in a binary-search fashion.
+
+        Without a `pool` (or executor), one of the `backend` (see `executor.BACKENDS`) with `workers` workers is started for the duration of the search (a single worker process runs inline instead).
+        With `memoize`, every frame (quantized to the frame rate) is only evaluated once per search, across all workers.
+        With `interpolate`, transitions are refined by interpolating the color distance instead of bisecting, which needs fewer frames on fades.
+        With a `min_step`, the coarse pass starts at `step` and splits intervals whose ends differ until they are `min_step` apart.
+        It evaluates at most `budget` frames (but always the initial ones) and reports the share of the length it resolved as `coverage`.
+        With a `checkpoint` file, the progress (coarse updates, pending refinements and evaluations) is saved there as the search goes.
+        Only the evaluations since the last save are appended to it, it is compacted when a search resumes from it.
+        A search with the same parameters resumes from it without evaluating frames again, and removes it once done.
+        Checkpoints imply `memoize`.
+        With `stages`, frames are evaluated by a pipeline of processes instead of by the workers, which shows which stage limits the throughput.
+        Its "decode", "validate" and "extract" stages map to their number of processes and the size of their input queue (by default `workers` and `DEFAULT_STAGE_QUEUE`).
+        The utilization of every stage is logged and kept in `stage_metrics`.
+        The counters of the data (e.g. the hits and stalls of a prefetcher) are added up across the workers, logged and kept in `frame_counters`.
+        With a `prepass`, the coarse pass also extracts the frames around its candidates for a change, which finds changes in between the steps.
+        """
         self._scheme = s
         self._data = d
         self._step = step
         self._refinement_accuracy = refinement_accuracy
         self._workers = workers
         self._quiet = quiet
+        # A single worker process would only add the cost of sending it every task (and of sharing the evaluations with it).
+        self._backend = "inline" if stages is not None or (
+            backend == "process" and workers <= 1) else backend
+        self._stages = stages
+        self._prepass = prepass
+        self.stage_metrics: dict[str, staging.StageMetrics] = {}
+        self.frame_counters: dict[str, int] = {}
+        self._pool: executor.Executor | None = executor.ProcessExecutor(
+            pool=pool) if isinstance(pool, multiprocessing.pool.Pool) else pool
+        self._memoize = memoize or checkpoint is not None
+        self._checkpoint = checkpoint
+        self._interpolate = interpolate
+        self._min_step = min_step
+        self._budget = budget
+        self._frame_rate = d.frame_rate or constants.DEFAULT_FRAME_RATE
+        # Shared with the workers during a search.
+        self._evaluations: MutableMapping[int, model.ColorUpdate] | None = None
+        self._saved: MutableMapping[tuple[int, int], int] | None = None
+        self.saved_evaluations = 0
+        self.coverage = 1.0
+        # Keys of the evaluations in the checkpoint, `None` until it belongs to this search.
+        self._logged: set[int] | None = None
+
+    def __getstate__(self):
+        # Pools cannot be sent to their own workers, which do not need the prepass either.
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        state["_prepass"] = None
+        state["_logged"] = None
+        return state
+
+    @contextmanager
+    def _workers_pool(self) -> Iterator[executor.Executor]:
+        if self._pool is not None:
+            yield self._pool
+            return
+
+        with executor.create(self._backend, self._workers) as e:
+            self._pool = e
+            try:
+                yield e
+            finally:
+                self._pool = None
+
+    @contextmanager
+    def _memoized(self) -> Iterator[None]:
+        if not self._memoize or self._evaluations is not None:
+            yield
+            return
+
+        # Only worker processes need a manager to share the evaluations.
+        in_process = self._pool.in_process if self._pool is not None else self._backend != "process"
+        if in_process:
+            self._evaluations = {}
+            self._saved = {}
+            try:
+                yield
+            finally:
+                self.saved_evaluations = sum(self._saved.values())
+                self._evaluations = None
+                self._saved = None
+            return
+
+        with Manager() as manager:
+            self._evaluations = manager.dict()
+            # Counted per worker, so no update is lost.
+            self._saved = manager.dict()
+            try:
+                yield
+            finally:
+                self.saved_evaluations = sum(self._saved.values())
+                self._evaluations = None
+                self._saved = None
+
+    def _recall(self, step: float) -> model.ColorUpdate | None:
+        """Returns a copy of the evaluation of the frame (if any)."""
+        if self._evaluations is None or self._saved is None:
+            return None
+
+        update = self._evaluations.get(round(step * self._frame_rate), None)
+        if update is None:
+            return None
+
+        worker = (os.getpid(), threading.get_ident())
+        self._saved[worker] = self._saved.get(worker, 0) + 1
+        # Workers in the same process share the evaluation itself.
+        update = copy.copy(update)
+        update.set_timestamp(step)
+        return update
+
+    def _remember(self, step: float, update: model.ColorUpdate):
+        if self._evaluations is not None:
+            self._evaluations[round(step * self._frame_rate)] = update
 
     def _search_step(self, step: float) -> model.ColorUpdate:
+        update = self._recall(step)
+        if update is not None:
+            return update
+
         try:
             frame = self._data.get_frame(step)
         except Exception as e:
-            logger.warning(f"frame {step:.2f}s frame error: {e}")
+            return self._evaluate(step, e)
+
+        return self._evaluate(step, frame)
+
+    def _search_steps(self, steps: list[float]) -> list[model.ColorUpdate]:
+        """Evaluates consecutive steps, streaming their frames from the data."""
+        recalled = {step: self._recall(step) for step in steps}
+        updates = {step: update for step,
+                   update in recalled.items() if update is not None}
+        missing = [step for step in steps if step not in updates]
+        for step, frame in self._data.frames(missing):
+            updates[step] = self._evaluate(step, frame)
+
+        return [updates[step] for step in steps]
+
+    def _counters(self) -> tuple[dict[str, int], dict[str, int]]:
+        """Counters of the current process, how many frames each stage of the validity check decided and how the data obtained them."""
+        return dict(self._scheme.cascade_counters) if isinstance(self._scheme, Extractor) else {}, self._data.counters
+
+    def _search_steps_counted(self, steps: list[float]) -> tuple[list[model.ColorUpdate], tuple[dict[str, int], dict[str, int]]]:
+        """Like `_search_steps`, but also returns how the counters changed (in this worker process)."""
+        cascade, frames = self._counters()
+        updates = self._search_steps(steps)
+        cascade_after, frames_after = self._counters()
+        return updates, (_difference(cascade_after, cascade), _difference(frames_after, frames))
+
+    def _counted(self, result: tuple[list[model.ColorUpdate], tuple[dict[str, int], dict[str, int]]]) -> list[model.ColorUpdate]:
+        """Adds the counters of a worker process to those of this process."""
+        updates, (cascade, frames) = result
+        if isinstance(self._scheme, Extractor):
+            for stage, count in cascade.items():
+                self._scheme._count(stage, count)
+        self._count_frames(frames)
+        return updates
+
+    def _count_frames(self, counters: dict[str, int]):
+        for name, count in counters.items():
+            self.frame_counters[name] = self.frame_counters.get(
+                name, 0) + count
+
+    def _imap_steps(self, p: executor.Executor, chunks: list[list[float]]) -> Iterator[list[model.ColorUpdate]]:
+        """Evaluates the chunks of steps on the workers (or the stages), yielding the updates of every chunk in order."""
+        if self._stages is None and not p.in_process:
+            return map(self._counted, p.imap(self._search_steps_counted, chunks))
+        if self._stages is None:
+            return p.imap(self._search_steps, chunks)
+
+        recalled = {step: self._recall(step)
+                    for chunk in chunks for step in chunk}
+        updates = {step: update for step,
+                   update in recalled.items() if update is not None}
+        missing = [[step for step in chunk if step not in updates]
+                   for chunk in chunks]
+        # The stages are forked from this process, so their counters start at the current ones.
+        cascade, frames = self._counters()
+        pipeline = self._staged()
+        for step, update, remember in pipeline.run([chunk for chunk in missing if chunk]):
+            # The stages only evaluate frames, this process remembers them.
+            if remember:
+                self._remember(step, update)
+            updates[step] = update
+        for cascade_after, frames_after in pipeline.reports:
+            self._counted(
+                ([], (_difference(cascade_after, cascade), _difference(frames_after, frames))))
+        return iter([[updates[step] for step in chunk] for chunk in chunks])
+
+    def _staged(self) -> staging.Pipeline:
+        assert self._stages is not None
+        decode, validate, extract = [self._stages.get(name, (self._workers, constants.DEFAULT_STAGE_QUEUE))
+                                     for name in ["decode", "validate", "extract"]]
+        # Frames of the size of the masks pass between the stages through shared memory.
+        frame_size = self._scheme._inputs[3].nbytes if isinstance(
+            self._scheme, Extractor) else 0
+        pipeline = staging.Pipeline([
+            staging.Stage("decode", self._data.frames, *decode),
+            staging.Stage("validate", self._validate_stage, *validate),
+            staging.Stage("extract", self._extract_stage, *extract),
+        ], frame_size=frame_size, report=self._counters)
+        # Accumulated across the runs of a search.
+        for name, metrics in pipeline.metrics.items():
+            pipeline.metrics[name] = self.stage_metrics.setdefault(
+                name, metrics)
+        return pipeline
+
+    def _validate_stage(self, item: tuple[float, npt.NDArray | Exception]) -> Iterator[tuple[float, npt.NDArray | model.ColorUpdate, bool]]:
+        """Passes valid frames on, yields the updates of the others with whether to remember them."""
+        step, frame = item
+        if isinstance(frame, Exception):
+            yield step, self._evaluate(step, frame), False
+        elif not self._valid(step, frame):
+            yield step, model.ColorUpdate.invalid(timestamp=step), True
+        else:
+            yield step, frame, True
+
+    def _extract_stage(self, item: tuple[float, npt.NDArray | model.ColorUpdate, bool]) -> Iterator[tuple[float, model.ColorUpdate, bool]]:
+        step, frame, remember = item
+        if isinstance(frame, model.ColorUpdate):
+            yield step, frame, remember
+        else:
+            yield step, self._extract_valid(step, frame), True
+
+    def _evaluate(self, step: float, frame: npt.NDArray | Exception) -> model.ColorUpdate:
+        if isinstance(frame, Exception):
+            # Not remembered, since obtaining the frame might succeed on a retry.
+            logger.warning(f"frame {step:.2f}s frame error: {frame}")
             return model.ColorUpdate.invalid(timestamp=step)
 
+        update = self._extract(step, frame)
+        self._remember(step, update)
+        return update
+
+    def _extract(self, step: float, frame: npt.NDArray) -> model.ColorUpdate:
+        if not self._valid(step, frame):
+            return model.ColorUpdate.invalid(timestamp=step)
+        return self._extract_valid(step, frame)
+
+    def _valid(self, step: float, frame: npt.NDArray) -> bool:
         if not self._scheme.is_valid(frame):
             logger.debug(f"frame {step:.2f}s not valid")
-            return model.ColorUpdate.invalid(timestamp=step)
+            return False
+        return True
 
+    def _extract_valid(self, step: float, frame: npt.NDArray) -> model.ColorUpdate:
         try:
             update = self._scheme.extract(frame)
         except Exception as e:
@@ -91,96 +618,297 @@ class Search:
         update.set_timestamp(step)
         return update
 
+    def _chunks(self, steps: list[float]) -> list[list[float]]:
+        # Contiguous chunks keep the frames of a worker close together, several per worker balance the load.
+        count = min(len(steps), 4*self._workers)
+        return [steps[i*len(steps)//count:(i+1)*len(steps)//count]
+                for i in range(count)]
+
     def _search_raw(self) -> list[model.ColorUpdate]:
-        steps = int(self._data.length / self._step)
+        steps = self._data.align(
+            range(0, int(self._data.length)+1, self._step), self._step/4)
 
-        with Pool(self._workers) as p:
-            updates = list(
-                tqdm.tqdm(p.imap(
-                    self._search_step,
-                    range(0, int(self._data.length)+1, self._step)
-                ), total=steps, disable=self._quiet))
+        updates: list[model.ColorUpdate] = []
+        with self._workers_pool() as p, tqdm.tqdm(total=len(steps), disable=self._quiet) as progress:
+            for chunk in self._imap_steps(p, self._chunks(steps)):
+                updates.extend(chunk)
+                progress.update(len(chunk))
+                self._save()
 
-            p.close()
-            p.join()
+        return updates
 
-            return updates
+    def _search_candidates(self) -> list[model.ColorUpdate]:
+        """Extracts every `step` like the coarse pass, as well as the first valid frame and both ends of every candidate interval of the prepass."""
+        assert self._prepass is not None
+        start, intervals = self._prepass.candidates()
+        # The prepass may sample another stream, so the ends move to cheap frames of the searched data, but only outwards to keep the change in between.
+        tolerance = self._prepass.step / 4
+        ends = [end for first, second in intervals for end in (
+            min(first, self._data.align([first], tolerance)[0]),
+            max(second, self._data.align([second], tolerance)[0]))]
+        # The coarse steps find the changes the prepass misses (at their resolution).
+        steps: list[float] = sorted({*self._data.align(range(0, int(self._data.length)+1, self._step), self._step/4),
+                                     *ends, *([start] if start is not None else [])})
+
+        updates: list[model.ColorUpdate] = []
+        with self._workers_pool() as p, tqdm.tqdm(total=len(steps), disable=self._quiet) as progress:
+            for chunk in self._imap_steps(p, self._chunks(steps)):
+                updates.extend(chunk)
+                progress.update(len(chunk))
+                self._save()
+
+        return updates
+
+    def _search_adaptive(self) -> list[model.ColorUpdate]:
+        """Samples sparsely first, then splits the intervals whose ends differ (widest first)."""
+        assert self._min_step is not None
+        with self._workers_pool() as p, tqdm.tqdm(disable=self._quiet) as progress:
+            def evaluate(steps: list[float]) -> list[model.ColorUpdate]:
+                steps = sorted(steps)
+                updates: list[model.ColorUpdate] = []
+                for chunk in self._imap_steps(p, self._chunks(steps)):
+                    updates.extend(chunk)
+                    progress.update(len(chunk))
+                    self._save()
+                return updates
+
+            updates = evaluate(self._data.align(
+                range(0, int(self._data.length)+1, self._step), self._step/4))
+            evaluations = len(updates)
+            while True:
+                similar = self._scheme.similar_neighbours(updates)
+                unresolved = [(updates[i]._timestamp, updates[i+1]._timestamp) for i in range(len(similar))
+                              if not similar[i] and updates[i+1]._timestamp - updates[i]._timestamp >= 2*self._min_step]
+                remaining = len(unresolved) if self._budget is None else min(
+                    len(unresolved), self._budget - evaluations)
+                if remaining <= 0:
+                    break
+
+                splits = sorted(unresolved, key=lambda interval: interval[1] - interval[0], reverse=True)[
+                    :remaining]
+                # Keyframes close to the middle are cheaper and keep both halves above the minimum step.
+                steps = [self._data.align([(first + second) / 2], (second - first) / 8)[0]
+                         for first, second in splits]
+                updates = sorted(updates + evaluate(steps),
+                                 key=lambda update: update._timestamp)
+                evaluations += len(steps)
+
+        length = updates[-1]._timestamp - \
+            updates[0]._timestamp if updates else 0.0
+        if length > 0:
+            self.coverage = 1 - \
+                sum(second - first for first, second in unresolved) / length
+        logger.info(
+            f"evaluated {evaluations} coarse frames, resolved {self.coverage:.1%} of the length")
+        return updates
 
     def _search_compact(self, raw: list[model.ColorUpdate]) -> list[model.ColorUpdate]:
+        return list(self._stream_compact(raw))
+
+    def _stream_compact(self, raw: list[model.ColorUpdate], refinements: list[_Refinement] | None = None) -> Iterator[model.ColorUpdate]:
+        """Refines the transitions (continuing the given `refinements`), yielding every update (in order) once the interval before it is refined."""
+        similar = self._scheme.similar_neighbours(raw)
         to_refine: list[tuple[model.ColorUpdate, model.ColorUpdate]] = []
         for i in range(1, len(raw)):
             first = raw[i-1]
             second = raw[i]
             if second._invalid:
                 continue
-            elif self._scheme.similar(first, second):
+            elif similar[i-1]:
                 continue
             to_refine.append((first, second))
 
-        with Pool(self._workers) as p:
-            refined = list(
-                tqdm.tqdm(p.imap(
-                    self._refine,
-                    to_refine
-                ), total=len(to_refine), disable=self._quiet))
-
-            p.close()
-            p.join()
-
-        updates: list[model.ColorUpdate] = []
         # Include the first update since it is not part of the refinement.
-        if not raw[0]._invalid:
-            updates.append(raw[0])
-
-        for i in range(len(to_refine)):
-            first, second = to_refine[i]
-            second.set_timestamp(refined[i])
-            updates.append(second)
+        if raw and not raw[0]._invalid:
+            yield raw[0]
+
+        if refinements is None:
+            refinements = [self._refinement(first, second)
+                           for first, second in to_refine]
+        self._save(raw, refinements)
+        finished = 0
+        with self._workers_pool() as p, tqdm.tqdm(total=len(refinements), disable=self._quiet) as progress:
+            # Every pending refinement advances by one round of probes per wave, so all workers stay busy.
+            pending = [
+                refinement for refinement in refinements if refinement.timestamp is None]
+            while pending:
+                # Idle workers split the pending intervals into more parts.
+                k = max(1, self._workers // len(pending))
+                probes = [refinement.probe(k) for refinement in pending]
+                steps = sorted(step for steps in probes for step in steps)
+                evaluated: dict[float, model.ColorUpdate] = {}
+                for chunk, chunk_updates in zip(self._chunks(steps), self._imap_steps(p, self._chunks(steps))):
+                    evaluated.update(zip(chunk, chunk_updates))
+
+                for refinement, steps in zip(pending, probes):
+                    if steps:
+                        refinement.advance([evaluated[step]
+                                           for step in steps], self._scheme.similar)
+
+                remaining = [
+                    refinement for refinement in pending if refinement.timestamp is None]
+                progress.update(len(pending) - len(remaining))
+                pending = remaining
+                self._save(raw, refinements)
+
+                while finished < len(refinements) and refinements[finished].timestamp is not None:
+                    yield self._refined(refinements[finished], to_refine[finished][1])
+                    finished += 1
+
+        # Refinements done before the first wave.
+        for refinement, (_, second) in zip(refinements[finished:], to_refine[finished:]):
+            yield self._refined(refinement, second)
+
+    @staticmethod
+    def _refined(refinement: _Refinement, second: model.ColorUpdate) -> model.ColorUpdate:
+        assert refinement.timestamp is not None
+        logger.debug(
+            f"refined {second._timestamp:.2f}s to {refinement.timestamp:.2f}s")
+        # A copy, since the update might still be the first end of a pending refinement.
+        update = copy.copy(second)
+        update.set_timestamp(refinement.timestamp)
+        return update
 
-        return updates
+    def _refinement(self, first: model.ColorUpdate, second: model.ColorUpdate) -> _Refinement:
+        return _Refinement(first, second, self._refinement_accuracy, self._scheme.distance if self._interpolate else None)
 
     def _refine(self, updates: tuple[model.ColorUpdate, model.ColorUpdate]) -> float:
-        """Computes a more accurate timestamp for the second update."""
+        """Computes a more accurate timestamp for the second update (one probe at a time)."""
         first, second = updates
-        if first._timestamp >= second._timestamp:
-            raise Exception("First update must be before second update.")
-        elif second._invalid:
-            raise Exception("Second update must be valid.")
-
-        update = self._refine_recursion(first, second)
-        logger.debug(f"refined {second._timestamp:.2f}s to {update:.2f}s")
-        return update
-
-    def _refine_recursion(self, first: model.ColorUpdate, second: model.ColorUpdate) -> float:
-        """Recursively computes a more accurate timestamp for the second update."""
-        if abs(first._timestamp - second._timestamp) < self._refinement_accuracy:
-            return second._timestamp
+        refinement = self._refinement(first, second)
+        while steps := refinement.probe():
+            refinement.advance([self._search_step(step)
+                               for step in steps], self._scheme.similar)
 
-        for factor in [0.5, 0.25, 0.75, 0.1, 0.9]:
-            mid = first._timestamp + \
-                (second._timestamp-first._timestamp) * factor
-            mid_update = self._search_step(mid)
-
-            if mid_update._invalid or self._scheme.similar(first, mid_update):
-                return self._refine_recursion(mid_update, second)
-            elif self._scheme.similar(mid_update, second):
-                return self._refine_recursion(first, mid_update)
-
-            logger.debug(
-                f"could not refine from {first.timestring} to {second.timestring} with factor {factor}, trying next factor")
-
-        logger.warning(
-            f"could not refine from {first.timestring} to {second.timestring}, color transition might be longer than refinement_accuracy={self._refinement_accuracy:.1f}s")
-        return second._timestamp
+        assert refinement.timestamp is not None
+        logger.debug(
+            f"refined {second._timestamp:.2f}s to {refinement.timestamp:.2f}s")
+        return refinement.timestamp
 
     def search(self) -> list[model.ColorUpdate]:
         """Searches for the color and temperature of the data in a binary-search fashion."""
-        logger.info(f"color extraction pass (every {self._step/60:.1f}min)")
-        updates = self._search_raw()
-        logger.debug(f"obtained {len(updates)} color updates")
-        logger.info(
-            f"color refinement pass (down to {self._refinement_accuracy:.1f}s)")
-        updates = self._search_compact(updates)
+        updates = list(self.stream())
         logger.debug(f"refined {len(updates)} color updates")
-
         return updates
+
+    def stream(self) -> Generator[model.ColorUpdate, None, None]:
+        """Searches like `search`, but yields every update (in order) as soon as it is final."""
+        state = self._load()
+        # Counted by the data itself if it is obtained in this process.
+        counters = self._data.counters
+        # Both passes share the same workers and evaluations, the resources of the data (e.g. its captures) and of the scheme (e.g. its shared masks) are released afterwards.
+        with closing(self._data), closing(self._scheme), self._workers_pool(), self._memoized():
+            if self._evaluations is not None:
+                self._evaluations.update(state.get("evaluations", {}))
+
+            updates = state.get("raw", None)
+            if updates is None and self._prepass is not None:
+                logger.info(
+                    f"color extraction pass (every {self._step/60:.1f}min and around prepass candidates)")
+                updates = self._search_candidates()
+            elif updates is None:
+                logger.info(
+                    f"color extraction pass (every {self._step/60:.1f}min)")
+                updates = self._search_raw() if self._min_step is None else self._search_adaptive()
+            else:
+                self.coverage = state["coverage"]
+            logger.debug(f"obtained {len(updates)} color updates")
+            logger.info(
+                f"color refinement pass (down to {self._refinement_accuracy:.1f}s)")
+            yield from self._stream_compact(updates, state.get("refinements", None))
+
+        self._count_frames(_difference(self._data.counters, counters))
+        if self._memoize:
+            logger.info(f"saved {self.saved_evaluations} frame evaluations")
+        if self.frame_counters:
+            logger.info(f"frames {self.frame_counters}")
+        for metrics in self.stage_metrics.values():
+            logger.info(f"stage {metrics}")
+        if self._checkpoint is not None and path.exists(self._checkpoint):
+            os.remove(self._checkpoint)
+
+    def _parameters(self) -> dict:
+        """Identifies the search a checkpoint belongs to."""
+        return {
+            "scheme": type(self._scheme).__name__,
+            "data": self._data.identity,
+            "length": self._data.length,
+            "step": self._step,
+            "refinement_accuracy": self._refinement_accuracy,
+            "interpolate": self._interpolate,
+            "min_step": self._min_step,
+            "budget": self._budget,
+            "scheme_parameters": self._scheme.parameters,
+            "prepass": self._prepass.parameters if self._prepass is not None else None,
+        }
+
+    def _save(self, raw: list[model.ColorUpdate] | None = None, refinements: list[_Refinement] | None = None):
+        """Appends the new evaluations (and with `raw`, the coarse updates and pending refinements) to the checkpoint."""
+        if self._checkpoint is None:
+            return
+
+        evaluations = self._evaluations if self._evaluations is not None else {}
+        if self._logged is None:
+            self._logged = set(evaluations.keys())
+            self._write({
+                "parameters": self._parameters(),
+                "evaluations": dict(evaluations),
+                "raw": raw,
+                "coverage": self.coverage,
+                "refinements": refinements,
+            })
+            return
+
+        # A single call on a manager, which would send every key separately when iterated.
+        new = [key for key in evaluations.keys()
+               if key not in self._logged]
+        self._logged.update(new)
+        record: dict = {"evaluations": {key: evaluations[key] for key in new}}
+        if raw is not None:
+            record.update(raw=raw, coverage=self.coverage,
+                          refinements=refinements)
+        with open(self._checkpoint, "ab") as f:
+            pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _write(self, state: dict):
+        """Replaces the checkpoint with a single record of the state."""
+        assert self._checkpoint is not None
+        # Write atomically, so an interruption keeps the previous checkpoint.
+        directory = path.dirname(path.abspath(self._checkpoint))
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp", delete=False) as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f.name, self._checkpoint)
+
+    def _load(self) -> dict:
+        """Returns the saved progress of this search (if any), compacting the checkpoint into a single record."""
+        self._logged = None
+        if self._checkpoint is None or not path.exists(self._checkpoint):
+            return {}
+
+        try:
+            with open(self._checkpoint, "rb") as f:
+                state = pickle.load(f)
+                while True:
+                    try:
+                        record = pickle.load(f)
+                    except (EOFError, pickle.UnpicklingError):
+                        break  # The end, or a record cut off by an interruption.
+                    state["evaluations"].update(record.pop("evaluations"))
+                    state.update(record)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning(
+                f"could not load checkpoint {self._checkpoint}, starting over: {e}")
+            return {}
+
+        if state["parameters"] != self._parameters():
+            logger.warning(
+                f"checkpoint {self._checkpoint} belongs to a different search, starting over")
+            return {}
+
+        self._write(state)
+        self._logged = set(state["evaluations"].keys())
+        for refinement in state["refinements"] or []:
+            refinement.attach(
+                self._scheme.distance if self._interpolate else None)
+        logger.info(f"resuming from checkpoint {self._checkpoint}")
+        return state
@@ -0,0 +1,156 @@
+import os
+import queue
+import weakref
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.context import BaseContext
+from os import path
+
+import numpy as np
+import numpy.typing as npt
+
+_SHM = "/dev/shm"
+
+
+def _tracker() -> int | None:
+    """Process of the resource tracker of the current process (if it started or inherited one)."""
+    return getattr(getattr(resource_tracker, "_resource_tracker", None), "_pid", None)
+
+
+def _close(memory: shared_memory.SharedMemory):
+    try:
+        memory.close()
+    except BufferError:
+        # Still viewed, the mapping is released together with the last view.
+        pass
+
+
+def _unlink(memory: shared_memory.SharedMemory, owner: int):
+    _close(memory)
+    # Forked children inherit the owning object, but must not free the memory.
+    if os.getpid() == owner:
+        try:
+            memory.unlink()
+        except FileNotFoundError:
+            # Already unlinked (e.g. by the resource tracker of a process that attached to it), which keeps it registered with ours.
+            resource_tracker.unregister(
+                getattr(memory, "_name"), "shared_memory")
+
+
+class SharedArray:
+    def __init__(self, array: npt.NDArray):
+        """
+        Copies the array into shared memory, which other processes attach to instead of copying it again.
+
+        Pickling only transfers the name of the memory, which is freed once the creating object is gone.
+        """
+        self.shape = array.shape
+        self.dtype = np.dtype(array.dtype)
+        self._memory: shared_memory.SharedMemory | None = shared_memory.SharedMemory(
+            create=True, size=max(array.nbytes, 1))
+        self.name = self._memory.name
+        self._tracker = _tracker()
+        self._array: npt.NDArray | None = None
+        np.copyto(self._view(), array)
+        self._finalizer = weakref.finalize(
+            self, _unlink, self._memory, os.getpid())
+
+    def _view(self) -> npt.NDArray:
+        assert self._memory is not None
+        return np.ndarray(self.shape, self.dtype, buffer=self._memory.buf)
+
+    @property
+    def array(self) -> npt.NDArray:
+        """Read-only view of the shared array, attaching to the memory on first use."""
+        if self._array is None:
+            if self._memory is None:
+                self._memory = shared_memory.SharedMemory(self.name)
+                # Attaching registers the memory with the tracker of this process, which would unlink it once the process exits.
+                # Only the creating object frees it, so it is unregistered (unless the tracker is shared with the creator, e.g. after a fork).
+                if _tracker() != self._tracker:
+                    resource_tracker.unregister(
+                        getattr(self._memory, "_name"), "shared_memory")
+            self._array = self._view()
+            self._array.flags.writeable = False
+        return self._array
+
+    @property
+    def freed(self) -> bool:
+        """Whether the creating object freed the memory, so it cannot be attached to anymore (only known where it is listed in `/dev/shm`)."""
+        return path.isdir(_SHM) and not path.exists(path.join(_SHM, self.name.lstrip("/")))
+
+    def close(self):
+        """Frees the memory (if this object created it)."""
+        self._array = None
+        if hasattr(self, "_finalizer"):
+            self._finalizer()
+        elif self._memory is not None:
+            _close(self._memory)
+        self._memory = None
+
+    def __getstate__(self):
+        return {"name": self.name, "shape": self.shape, "dtype": self.dtype, "tracker": self._tracker}
+
+    def __setstate__(self, state):
+        self.name = state["name"]
+        self.shape = state["shape"]
+        self.dtype = state["dtype"]
+        self._tracker = state["tracker"]
+        self._memory = None
+        self._array = None
+
+
+class Slot:
+    def __init__(self, index: int, shape: tuple[int, ...], dtype: np.dtype):
+        """Refers to an array stored in a slot of `FrameBuffers`."""
+        self.index = index
+        self.shape = shape
+        self.dtype = dtype
+
+
+class FrameBuffers:
+    def __init__(self, slots: int, size: int, context: BaseContext):
+        """
+        Shared memory of `slots` slots of `size` bytes, through which (forked) processes of the context pass arrays to each other instead of pickling them.
+
+        A process stores an array in a free slot and sends the `Slot`, the receiving process loads it and releases the slot once done with the array.
+        The memory is freed once the creating object is gone (or closed).
+        """
+        self._size = size
+        self._memory = shared_memory.SharedMemory(
+            create=True, size=max(slots * size, 1))
+        self._free = context.Queue()
+        for index in range(slots):
+            self._free.put(index)
+        self._finalizer = weakref.finalize(
+            self, _unlink, self._memory, os.getpid())
+
+    def _view(self, slot: Slot) -> npt.NDArray:
+        return np.ndarray(slot.shape, slot.dtype, buffer=self._memory.buf, offset=slot.index * self._size)
+
+    def store(self, array: npt.NDArray, timeout: float = 0.05) -> Slot | npt.NDArray:
+        """Copies the array into a free slot, returns the array itself if it is too large or no slot is freed within the timeout (to be pickled instead)."""
+        if array.nbytes > self._size:
+            return array
+        try:
+            index = self._free.get(timeout=timeout)
+        except queue.Empty:
+            return array
+
+        slot = Slot(index, array.shape, np.dtype(array.dtype))
+        np.copyto(self._view(slot), array)
+        return slot
+
+    def load(self, slot: Slot) -> npt.NDArray:
+        """Read-only view of the array in the slot, which is only valid until the slot is released."""
+        array = self._view(slot)
+        array.flags.writeable = False
+        return array
+
+    def release(self, slot: Slot):
+        """Frees the slot for the next array."""
+        self._free.put(slot.index)
+
+    def close(self):
+        """Frees the memory (in the creating process)."""
+        self._free.close()
+        self._finalizer()
@@ -0,0 +1,274 @@
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable
+from multiprocessing.sharedctypes import Synchronized
+from typing import Any
+
+import numpy as np
+
+from . import constants, shared
+
+# Stages inherit their functions (and everything they refer to) instead of receiving them pickled.
+_context = multiprocessing.get_context("fork")
+
+
+class _Done:
+    """Follows the items every process (or the feeder) puts into a queue (the class itself, which keeps its identity when pickled)."""
+
+
+class _End:
+    """Ends the workers of a stage once every process of the previous one is done."""
+
+
+class _Stopped(Exception):
+    pass
+
+
+class StageMetrics:
+    def __init__(self, name: str, workers: int):
+        """Time the processes of a stage spent working, waiting for input (starved) and waiting for space in the next queue (blocked)."""
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items: int = 0, busy: float = 0.0, starved: float = 0.0, blocked: float = 0.0):
+        with self._lock:
+            self.items += items
+            self.busy += busy
+            self.starved += starved
+            self.blocked += blocked
+
+    @property
+    def utilization(self) -> float:
+        """Share of the time the processes of the stage were working."""
+        total = self.busy + self.starved + self.blocked
+        return self.busy / total if total > 0 else 0.0
+
+    def __str__(self) -> str:
+        total = max(self.busy + self.starved + self.blocked, 1e-9)
+        return f"{self.name} ({self.workers} processes, {self.items} items): {self.busy/total:.0%} busy, {self.starved/total:.0%} starved, {self.blocked/total:.0%} blocked"
+
+
+class Stage:
+    def __init__(self, name: str, function: Callable[[Any], Iterable[Any]], workers: int = 1, queue_size: int = constants.DEFAULT_STAGE_QUEUE):
+        """A step of a pipeline, mapping every item to any number of items for the next stage on `workers` processes, with at most `queue_size` items waiting for it."""
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.queue_size = queue_size
+
+
+class Pipeline:
+    def __init__(self, stages: list[Stage], frame_size: int = 0, report: Callable[[], Any] | None = None, poll: float = 0.05):
+        """
+        Runs items through the stages, which are connected by bounded queues and run concurrently on forked processes.
+
+        A full queue blocks the stage before it (backpressure), so a slow stage limits the memory held by the others.
+        Arrays of at most `frame_size` bytes in the items (tuples) passed between the stages are sent through shared memory instead of being pickled.
+        A stage receives read-only views of them, which are only valid while it processes the item, and passes a view on without copying it by yielding it again.
+        Every worker process returns what `report` returns (e.g. its counters) once a run is done, which the run keeps in `reports`.
+        The `metrics` of every stage accumulate across runs.
+        """
+        self._stages = stages
+        self._frame_size = frame_size
+        self._report = report
+        self._poll = poll
+        self.metrics = {stage.name: StageMetrics(
+            stage.name, stage.workers) for stage in stages}
+        self.reports: list[Any] = []
+
+    def run(self, items: Iterable[Any]) -> list[Any]:
+        """Returns the items coming out of the last stage (in no particular order)."""
+        queues = [_context.Queue(stage.queue_size) for stage in self._stages]
+        # Outputs, reports and failures of the workers.
+        results = _context.Queue()
+        stop = _context.Event()
+        # Processes of the previous stage that are done, for every stage.
+        done = [_context.Value("i", 0) for _ in self._stages]
+        # Enough for every frame waiting in a queue or held by a worker, besides the one being stored.
+        buffers = shared.FrameBuffers(sum(stage.queue_size + stage.workers for stage in self._stages) + 1,
+                                      self._frame_size, _context) if self._frame_size > 0 else None
+        failure: list[Exception] = []
+        self.reports = []
+
+        def feed():
+            try:
+                for item in items:
+                    _put(queues[0], item, stop, self._poll)
+                _put(queues[0], _Done, stop, self._poll)
+            except _Stopped:
+                pass
+            except Exception as e:
+                failure.append(e)
+                stop.set()
+
+        processes = [_context.Process(target=self._work, args=(i, queues, results, stop, done, buffers), daemon=True)
+                     for i, stage in enumerate(self._stages) for _ in range(stage.workers)]
+        for process in processes:
+            process.start()
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+
+        outputs = []
+        reported = 0
+        try:
+            while reported < len(processes) and not failure:
+                try:
+                    kind, *content = results.get(timeout=self._poll)
+                except queue.Empty:
+                    exited = [process.exitcode for process in processes
+                              if process.exitcode not in (None, 0)]
+                    if exited:
+                        failure.append(RuntimeError(
+                            f"a stage process exited with code {exited[0]}"))
+                    continue
+
+                if kind == "output":
+                    outputs.append(content[0])
+                elif kind == "report":
+                    i, metrics, report = content
+                    self.metrics[self._stages[i].name].add(*metrics)
+                    self.reports.append(report)
+                    reported += 1
+                else:
+                    failure.append(content[0])
+        finally:
+            stop.set()
+            feeder.join()
+            for process in processes:
+                process.join(self._poll if failure else None)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+            for q in queues + [results]:
+                if failure:
+                    # Items left in the queues must not keep this process from exiting.
+                    q.cancel_join_thread()
+                q.close()
+            if buffers is not None:
+                buffers.close()
+
+        if failure:
+            raise failure[0]
+        return outputs
+
+    def _work(self, i: int, queues: list, results, stop, done: list[Synchronized], buffers: shared.FrameBuffers | None):
+        stage = self._stages[i]
+        last_stage = i + 1 == len(self._stages)
+        producers = self._stages[i-1].workers if i > 0 else 1
+        metrics = StageMetrics(stage.name, stage.workers)
+        try:
+            while True:
+                start = time.perf_counter()
+                item = _get(queues[i], stop, self._poll)
+                metrics.add(starved=time.perf_counter() - start)
+                if item is _End:
+                    break
+                if item is _Done:
+                    with done[i].get_lock():
+                        done[i].value += 1
+                        finished = done[i].value == producers
+                    if finished:
+                        # The items of a process precede its marker, so all of them were taken.
+                        for _ in range(stage.workers - 1):
+                            _put(queues[i], _End, stop, self._poll)
+                        break
+                    continue
+
+                # Views of the frames of the item and their slots, until passed on or done with.
+                held: dict[int, tuple[np.ndarray, shared.Slot]] = {}
+                outputs = iter(stage.function(_unpack(item, buffers, held)))
+                while True:
+                    start = time.perf_counter()
+                    output = next(outputs, _Done)
+                    metrics.add(busy=time.perf_counter() - start)
+                    if output is _Done:
+                        break
+
+                    start = time.perf_counter()
+                    if last_stage:
+                        results.put(("output", output))
+                    else:
+                        _put(queues[i+1], _pack(output, buffers, held), stop, self._poll)
+                    metrics.add(blocked=time.perf_counter() - start)
+                metrics.add(items=1)
+                if buffers is not None:
+                    for _, slot in held.values():
+                        buffers.release(slot)
+
+            # Items of other processes may still be on their way, so every process marks the end of its own.
+            if not last_stage:
+                _put(queues[i+1], _Done, stop, self._poll)
+            results.put(("report", i, (metrics.items, metrics.busy, metrics.starved,
+                        metrics.blocked), self._report() if self._report is not None else None))
+        except _Stopped:
+            for q in queues:
+                q.cancel_join_thread()
+        except Exception as e:
+            try:
+                pickle.dumps(e)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                e = RuntimeError(f"{stage.name} failed: {e!r}")
+            results.put(("failure", e))
+            stop.set()
+            for q in queues:
+                q.cancel_join_thread()
+
+
+def _put(q, item: Any, stop, poll: float):
+    while True:
+        try:
+            q.put(item, timeout=poll)
+            return
+        except queue.Full:
+            if stop.is_set():
+                raise _Stopped()
+
+
+def _get(q, stop, poll: float) -> Any:
+    while True:
+        try:
+            return q.get(timeout=poll)
+        except queue.Empty:
+            if stop.is_set():
+                raise _Stopped()
+
+
+def _pack(item: Any, buffers: shared.FrameBuffers | None, held: dict[int, tuple[np.ndarray, shared.Slot]]) -> Any:
+    """Replaces the arrays of the item by slots of the buffers, handing over the slots of the views that are passed on."""
+    if buffers is None or not isinstance(item, tuple):
+        return item
+
+    def pack(value: Any) -> Any:
+        if not isinstance(value, np.ndarray):
+            return value
+        if id(value) in held:
+            return held.pop(id(value))[1]
+        return buffers.store(value)
+
+    return tuple(pack(value) for value in item)
+
+
+def _unpack(item: Any, buffers: shared.FrameBuffers | None, held: dict[int, tuple[np.ndarray, shared.Slot]]) -> Any:
+    """Replaces the slots of the item by views of the buffers, which are held until they are released."""
+    if buffers is None or not isinstance(item, tuple):
+        return item
+
+    def unpack(value: Any) -> Any:
+        if isinstance(value, np.ndarray):
+            # Pickled instead, but just as read-only.
+            value.flags.writeable = False
+        if not isinstance(value, shared.Slot):
+            return value
+        array = buffers.load(value)
+        held[id(array)] = (array, value)
+        return array
+
+    return tuple(unpack(value) for value in item)
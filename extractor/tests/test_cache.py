@@ -0,0 +1,146 @@
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+import numpy.typing as npt
+from numpy import testing as nptest
+
+from extractor import cache, data
+
+
+class CountingFrameGenerator(data.FrameGenerator):
+    def __init__(self, length: int, identity: str | None = "counting") -> None:
+        self._length = length
+        self._identity = identity
+        self.requested: list[float] = []
+
+    def get_frame(self, second: float) -> npt.NDArray:
+        if second > self._length:
+            raise ValueError(f"no frame for {second}s")
+        self.requested.append(second)
+        return np.full((4, 4, 3), int(second), dtype=np.uint8)
+
+    @property
+    def identity(self) -> str | None:
+        return self._identity
+
+    @property
+    def length(self) -> float:
+        return self._length
+
+
+class TestFrameCache(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_get_frame(self):
+        generator = CountingFrameGenerator(5)
+        c = cache.FrameCache(generator, self.directory)
+
+        first = c.get_frame(2.0)
+        second = c.get_frame(2.0)
+        nptest.assert_equal(first, second)
+        self.assertEqual(generator.requested, [2.0])
+
+        # Reads are mapped, not copied.
+        self.assertIsInstance(second, np.memmap)
+        self.assertFalse(second.flags.writeable)
+
+        # The cache persists across instances.
+        generator = CountingFrameGenerator(5)
+        nptest.assert_equal(cache.FrameCache(
+            generator, self.directory).get_frame(2.0), first)
+        self.assertEqual(generator.requested, [])
+
+    def test_identity(self):
+        cache.FrameCache(CountingFrameGenerator(
+            5, "first"), self.directory).get_frame(2.0)
+
+        generator = CountingFrameGenerator(5, "second")
+        cache.FrameCache(generator, self.directory).get_frame(2.0)
+        self.assertEqual(generator.requested, [2.0])
+
+    def test_no_identity(self):
+        generator = CountingFrameGenerator(5, None)
+        c = cache.FrameCache(generator, self.directory)
+
+        c.get_frame(2.0)
+        c.get_frame(2.0)
+        self.assertEqual(generator.requested, [2.0, 2.0])
+
+    def test_frames(self):
+        generator = CountingFrameGenerator(5)
+        c = cache.FrameCache(generator, self.directory)
+        c.get_frame(1.0)
+        c.get_frame(3.0)
+
+        actual = list(c.frames([0.0, 1.0, 2.0, 3.0, 6.0]))
+        self.assertEqual([second for second, _ in actual], [
+                         0.0, 1.0, 2.0, 3.0, 6.0])
+        for second, frame in actual[:4]:
+            nptest.assert_equal(frame, np.full((4, 4, 3), int(second)))
+        self.assertIsInstance(actual[4][1], Exception)
+        self.assertEqual(generator.requested, [1.0, 3.0, 0.0, 2.0])
+
+    def test_evict(self):
+        generator = CountingFrameGenerator(5)
+        # Room for two frames (128 byte header + 48 byte frame).
+        c = cache.FrameCache(generator, self.directory, max_size=2*176)
+
+        c.get_frame(0.0)
+        c.get_frame(1.0)
+        c.get_frame(0.0)  # Mark as recently used.
+        c.get_frame(2.0)
+        c.get_frame(0.0)
+        c.get_frame(2.0)
+        c.get_frame(1.0)
+
+        self.assertEqual(generator.requested, [0.0, 1.0, 2.0, 1.0])
+
+    def test_evict_tracked(self):
+        cache.FrameCache(CountingFrameGenerator(5),
+                         self.directory).get_frame(0.0)
+        generator = CountingFrameGenerator(5)
+        c = cache.FrameCache(generator, self.directory, max_size=2*176)
+
+        # The directory is listed once, then the frames are tracked in memory.
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            for second in [1.0, 2.0, 3.0, 4.0]:
+                c.get_frame(second)
+        self.assertEqual(scandir.call_count, 1)
+
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted(
+            os.path.basename(c._file(second)) for second in [3.0, 4.0]))
+
+    def test_threads(self):
+        generator = CountingFrameGenerator(50)
+        c = cache.FrameCache(generator, self.directory, max_size=4*176)
+
+        # Threads evict each other's frames while they use and store them, switching as often as possible.
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        with ThreadPoolExecutor(8) as threads:
+            for frame in threads.map(c.get_frame, [float(second % 50) for second in range(2000)]):
+                self.assertEqual(frame.shape, (4, 4, 3))
+
+        files = sorted(os.listdir(self.directory))
+        self.assertLessEqual(len(files), 4)
+        assert c._entries is not None
+        self.assertEqual(sorted(os.path.basename(file)
+                         for file in c._entries), files)
+        self.assertEqual(c._size, 176 * len(files))
+
+    def test_pickle(self):
+        c = cache.FrameCache(CountingFrameGenerator(5), self.directory)
+        c.get_frame(1.0)
+
+        restored = pickle.loads(pickle.dumps(c))
+        self.assertIsNone(restored._entries)
+        nptest.assert_equal(restored.get_frame(1.0), c.get_frame(1.0))
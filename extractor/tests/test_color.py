@@ -1,7 +1,13 @@
+import colorsys
+import math
+import tempfile
 import unittest
 from os import path
 
-from extractor import color, io, model
+import numpy as np
+import numpy.typing as npt
+
+from extractor import color, image, io, model
 
 from .constants import TESTING
 
@@ -33,7 +39,129 @@ class TestExtractColor(unittest.TestCase):
         )
 
 
+def reference_extract_color(
+        frame: npt.NDArray,
+        mask: npt.NDArray,
+        brightness_cutoff=0.5
+) -> tuple[float, float, float]:
+    """Pixel-by-pixel implementation the vectorized `color.extract_color` has to match."""
+
+    frame = image.apply_mask(frame, mask)/255
+    colors = np.reshape(frame, (-1, 3)).tolist()
+    colors = list(
+        filter(lambda rgb: not rgb[0] == rgb[1] == rgb[2] == 0, colors))
+    colors = [colorsys.rgb_to_hsv(*rgb) for rgb in colors]
+    if len(colors) == 0:
+        return (0.0, 0.0, 0.0)
+
+    v_m = np.mean(np.array(colors), 0)[2]
+    colors = list(filter(lambda c: c[2] > brightness_cutoff*v_m, colors))
+    if len(colors) == 0:
+        return (0.0, 0.0, 0.0)
+
+    h_m, s_m, _ = np.mean(np.array(colors), 0)
+    h_d, s_d, _ = np.std(np.array(colors), 0)
+    colors = list(
+        filter(lambda c: c[1] < s_m + s_d and c[1] > s_m - s_d, colors))
+    colors = list(
+        filter(lambda c: c[0] < h_m + h_d and c[0] > h_m - h_d, colors))
+    if len(colors) == 0:
+        return (0.0, 0.0, 0.0)
+
+    h, s, v = np.mean(np.array(colors), 0).tolist()
+    return (h, s, v)
+
+
+class TestExtractColorParity(unittest.TestCase):
+    def validate(self, frame: npt.NDArray, mask: npt.NDArray, brightness_cutoff: float):
+        expected = reference_extract_color(frame, mask, brightness_cutoff)
+        actual = color.extract_color(frame, mask, brightness_cutoff)
+
+        np.testing.assert_allclose(actual, expected, atol=1e-9)
+
+    def test_rgb_to_hsv(self):
+        rng = np.random.default_rng(0)
+        rgb = rng.integers(0, 256, (1000, 3))
+        # Include gray and black pixels.
+        rgb[:10] = rgb[:10, :1]
+        rgb[10] = 0
+        rgb = rgb/255
+
+        actual = color.rgb_to_hsv(rgb)
+        expected = np.array([colorsys.rgb_to_hsv(*c) for c in rgb.tolist()])
+
+        np.testing.assert_array_equal(actual, expected)
+
+    def test_testdata(self):
+        for frame_file in ["day_0_0.png", "night_0_0.png"]:
+            for mask_file in ["mask_lamps.png", "mask_windows.png"]:
+                for brightness_cutoff in [0.25, 0.5]:
+                    with self.subTest(frame=frame_file, mask=mask_file, brightness_cutoff=brightness_cutoff):
+                        self.validate(
+                            io.load_frame(path.join(TESTING, frame_file)),
+                            io.load_frame(path.join(TESTING, mask_file)),
+                            brightness_cutoff,
+                        )
+
+    def test_random(self):
+        rng = np.random.default_rng(0)
+        for i in range(10):
+            with self.subTest(i=i):
+                frame = rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)
+                mask = np.repeat(
+                    rng.integers(0, 2, (48, 64, 1), dtype=np.uint8)*255, 3, axis=2)
+                self.validate(frame, mask, 0.25)
+
+    def test_mask_index(self):
+        frame = io.load_frame(path.join(TESTING, "day_0_0.png"))
+        mask = io.load_frame(path.join(TESTING, "mask_windows.png"))
+        expected = color.extract_color(frame, mask)
+        actual = color.extract_color(frame, image.MaskIndex(mask))
+
+        self.assertEqual(actual, expected)
+
+    def test_empty(self):
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        mask = np.full((48, 64, 3), 255, dtype=np.uint8)
+
+        self.assertEqual(color.extract_color(frame, mask), (0.0, 0.0, 0.0))
+
+
+class TestExtractColors(unittest.TestCase):
+    def test_overlapping_areas(self):
+        frame = io.load_frame(path.join(TESTING, "night_0_5.png"))
+        masks = [
+            io.load_frame(path.join(TESTING, "mask_lamps.png")),
+            io.load_frame(path.join(TESTING, "mask_windows.png")),
+            # Overlaps with the windows.
+            io.load_frame(path.join(TESTING, "night_0_5_mask.png")),
+        ]
+        actual = color.extract_colors(frame, image.MaskSet(masks), 0.25)
+        expected = [reference_extract_color(
+            frame, mask, 0.25) for mask in masks]
+
+        np.testing.assert_allclose(actual, expected, atol=1e-9)
+
+    def test_empty_area(self):
+        frame = io.load_frame(path.join(TESTING, "day_0_0.png"))
+        masks = [
+            np.zeros_like(frame),
+            io.load_frame(path.join(TESTING, "mask_lamps.png")),
+        ]
+        actual = color.extract_colors(frame, image.MaskSet(masks))
+
+        self.assertEqual(actual[0], (0.0, 0.0, 0.0))
+        self.assertEqual(actual[1], color.extract_color(frame, masks[1]))
+
+
 class TestHueToTemperature(unittest.TestCase):
+    def test_vectorized(self):
+        hsv = np.random.default_rng(0).random((10, 3))
+        actual = color.hues_to_temperatures(hsv)
+        expected = [color.hue_to_temperature(*c) for c in hsv.tolist()]
+
+        np.testing.assert_array_equal(actual, expected)
+
     def test_warm(self):
         self.assertAlmostEqual(
             color.hue_to_temperature(0.0, 1, 1),  # Red.
@@ -56,6 +184,69 @@ class TestHueToTemperature(unittest.TestCase):
         )
 
 
+class TestHsvToRgb(unittest.TestCase):
+    def test_colorsys(self):
+        rng = np.random.default_rng(0)
+        hsv = rng.random((1000, 3))
+        hsv[:10, 1] = 0.0  # Include gray pixels.
+
+        actual = color.hsv_to_rgb(hsv)
+        expected = np.array([colorsys.hsv_to_rgb(*c) for c in hsv.tolist()])
+
+        np.testing.assert_array_equal(actual, expected)
+
+
+class TestTemperatureTable(unittest.TestCase):
+    def setUp(self):
+        self.cache = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache.cleanup()
+
+    def test_error_bound(self):
+        table = color.TemperatureTable(
+            13, 5, max_error=100, cache=self.cache.name)
+        # The error is measured on a grid with twice the resolution.
+        h, s = np.meshgrid(np.linspace(0.0, 1.0, 25),
+                           np.linspace(0.0, 1.0, 9), indexing="ij")
+        hsv = np.stack([h, s, np.full_like(h, 0.5)], axis=-1)
+        expected = color.hues_to_temperatures(hsv)
+        actual = table(hsv)
+
+        self.assertEqual(actual.shape, expected.shape)
+        self.assertLessEqual(np.max(np.abs(actual - expected)), 100)
+
+    def test_error_bound_off_grid(self):
+        table = color.TemperatureTable(
+            13, 5, max_error=100, cache=self.cache.name)
+        # Colors in between the points the error was measured at.
+        hsv = np.random.default_rng(0).random((200, 3))
+        expected = color.hues_to_temperatures(hsv)
+
+        self.assertLessEqual(np.max(np.abs(table(hsv) - expected)), 100)
+
+    def test_exact(self):
+        table = color.TemperatureTable(
+            13, 5, max_error=0, cache=self.cache.name)
+        hsv = np.random.default_rng(0).random((10, 3))
+
+        np.testing.assert_array_equal(
+            table(hsv), color.hues_to_temperatures(hsv))
+
+    def test_black(self):
+        table = color.TemperatureTable(
+            13, 5, max_error=100, cache=self.cache.name)
+
+        self.assertEqual(table(np.array([0.3, 0.5, 0.0])),
+                         color.hue_to_temperature(0.3, 0.5, 0.0))
+
+    def test_cache(self):
+        color.TemperatureTable(3, 2, cache=self.cache.name)
+
+        self.assertTrue(
+            path.exists(path.join(self.cache.name, "temperature_3x2.npz")))
+
+
 class TestSimilar(unittest.TestCase):
     def setUp(self):
         self.c = color.Color()
@@ -95,5 +286,64 @@ class TestSimilar(unittest.TestCase):
         self.assertFalse(self.c.similar(update1, update2))
 
 
+class TestDistance(unittest.TestCase):
+    def test_similar(self):
+        c = color.Color()
+        rng = np.random.default_rng(0)
+        updates = []
+        for i in range(200):
+            if rng.random() < 0.1:
+                updates.append(model.ColorUpdate.invalid(float(i)))
+                continue
+            colors = [tuple((0.5 + rng.normal(0, 0.05, 3)).tolist())
+                      for _ in range(2)]
+            temps = (4000 + rng.normal(0, 300, 3)).tolist()
+            updates.append(model.ColorUpdate(colors, temps, float(i)))
+
+        for i in range(1, len(updates)):
+            self.assertEqual(c.distance(
+                updates[i-1], updates[i]) <= 1, c.similar(updates[i-1], updates[i]))
+
+    def test_relative(self):
+        c = color.Color()
+        update1 = model.ColorUpdate([(0.1, 0.2, 0.3)], [3000.0])
+        update2 = model.ColorUpdate([(0.15, 0.2, 0.3)], [4500.0])
+
+        self.assertAlmostEqual(c.distance(update1, update2), 1.5)
+        self.assertEqual(c.distance(update1, update1), 0.0)
+        self.assertEqual(c.distance(
+            update1, model.ColorUpdate.invalid()), math.inf)
+
+
+class TestSimilarNeighbours(unittest.TestCase):
+    def test_similar(self):
+        c = color.Color()
+        rng = np.random.default_rng(0)
+        updates = []
+        for i in range(200):
+            if rng.random() < 0.1:
+                updates.append(model.ColorUpdate.invalid(float(i)))
+                continue
+            colors = [tuple((0.5 + rng.normal(0, 0.05, 3)).tolist())
+                      for _ in range(2)]
+            temps = (4000 + rng.normal(0, 300, 3)).tolist()
+            updates.append(model.ColorUpdate(colors, temps, float(i)))
+
+        actual = c.similar_neighbours(model.Timeline(updates))
+        expected = [c.similar(updates[i-1], updates[i])
+                    for i in range(1, len(updates))]
+
+        self.assertEqual(actual.tolist(), expected)
+        # Make sure all cases are covered.
+        self.assertIn(True, expected)
+        self.assertIn(False, expected)
+
+    def test_empty(self):
+        c = color.Color()
+        actual = c.similar_neighbours(model.Timeline([]))
+
+        self.assertEqual(actual.tolist(), [])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,7 +1,14 @@
+import gc
+import multiprocessing
+import shutil
+import tempfile
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from os import path
 from typing import Dict, Tuple
 
+import cv2
 import numpy.typing as npt
 from numpy import testing as nptest
 
@@ -57,6 +64,97 @@ class TestVideoFile(unittest.TestCase):
             path.join(TESTING, "night_2_0.png"),
         )
 
+    def test_no_keyframes(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        file = path.join(directory.name, "night.mp4")
+        shutil.copy(path.join(TESTING, "night.mp4"), file)
+        f = data.VideoFile(file, keyframes=False)
+        self.addCleanup(f.close)
+        indexed = data.VideoFile(file, keyframes=True)
+        self.addCleanup(indexed.close)
+
+        self.assertAlmostEqual(f.length, indexed.length)
+        self.assertEqual(f.align([1.0, 4.0], 1.0), [1.0, 4.0])
+        nptest.assert_equal(f.get_frame(2.0), io.load_frame(
+            path.join(TESTING, "night_2_0.png")))
+
+    def test_reused_capture(self):
+        file = path.join(TESTING, "night.mp4")
+        f = data.VideoFile(file)
+        self.addCleanup(f.close)
+
+        # Seeking backwards on the reused capture yields the same frames as a fresh one.
+        for second in [2.0, 0.5, 0.0, 2.0]:
+            nptest.assert_equal(f.get_frame(second),
+                                io.get_frame(file, second))
+        self.assertIs(io.open_video(file), io.open_video(file))
+
+    def test_close(self):
+        file = path.join(TESTING, "night.mp4")
+        f = data.VideoFile(file)
+        capture = io.open_video(file)
+
+        f.close()
+        self.assertFalse(capture.isOpened())
+        self.assertNotIn(
+            file, [name for captures in io._captures for name in captures.videos])
+
+        # The video is opened again on demand.
+        nptest.assert_equal(f.get_frame(0.5), io.load_frame(
+            path.join(TESTING, "night_0_5.png")))
+        f.close()
+
+    def test_pool(self):
+        file = path.join(TESTING, "night.mp4")
+        f = data.VideoFile(file)
+        self.addCleanup(f.close)
+        f.get_frame(2.0)
+
+        # Workers must not share the capture of the parent process.
+        with multiprocessing.get_context("fork").Pool(2) as pool:
+            frames = pool.map(f.get_frame, [0.0, 0.5, 2.0, 0.5])
+        for second, frame in zip([0.0, 0.5, 2.0, 0.5], frames):
+            nptest.assert_equal(frame, io.get_frame(file, second))
+
+    def test_threads(self):
+        file = path.join(TESTING, "night.mp4")
+        f = data.VideoFile(file)
+        self.addCleanup(f.close)
+
+        # Every thread decodes with its own capture.
+        with ThreadPoolExecutor(2) as threads:
+            captures = list(threads.map(
+                lambda _: io.open_video(file), range(2)))
+            frames = list(threads.map(f.get_frame, [0.0, 0.5, 2.0, 0.5]))
+        self.assertIsNot(captures[0], io.open_video(file))
+        for second, frame in zip([0.0, 0.5, 2.0, 0.5], frames):
+            nptest.assert_equal(frame, io.get_frame(file, second))
+
+    def test_thread_exit(self):
+        file = path.join(TESTING, "night.mp4")
+        f = data.VideoFile(file)
+        self.addCleanup(f.close)
+        gc.collect()
+        live = len(io._captures)
+
+        # The captures of a thread are released once it is gone.
+        thread = threading.Thread(target=f.get_frame, args=(0.5,))
+        thread.start()
+        thread.join()
+        del thread
+        gc.collect()
+        self.assertEqual(len(io._captures), live)
+
+    def test_frames(self):
+        file = path.join(TESTING, "night.mp4")
+        f = data.VideoFile(file)
+        self.addCleanup(f.close)
+
+        actual = dict(f.frames([0.0, 0.5, 2.0]))
+        for second, expected in image_files.items():
+            nptest.assert_equal(actual[second], io.load_frame(expected))
+
 
 image_files = {
     0.0: path.join(TESTING, "night_0_0.png"),
@@ -131,6 +229,113 @@ class TestYouTubeVideo(unittest.TestCase):
         )
 
 
+class LocalDownloader(data.Downloader):
+    def __init__(self, file: str, broken: bool = False) -> None:
+        """Serves sections of a local video file losslessly."""
+        self._file = file
+        self._broken = broken
+        self.invocations = 0
+
+    def length(self, url: str) -> float:
+        return io.video_length(self._file)
+
+    def download(self, url: str, format: str, sections: list[tuple[float, float]], directory: str) -> list[str | None]:
+        self.invocations += 1
+        if self._broken:
+            raise OSError("download failed")
+
+        video = cv2.VideoCapture(self._file)
+        fps = video.get(cv2.CAP_PROP_FPS)
+        files: list[str | None] = []
+        for i, (start, end) in enumerate(sections):
+            file = path.join(directory, f"section_{i}.avi")
+            first = io.frame_index(video, start)
+            video.set(cv2.CAP_PROP_POS_FRAMES, first)
+            writer = cv2.VideoWriter(
+                file, cv2.VideoWriter.fourcc(*"FFV1"), fps, (int(video.get(cv2.CAP_PROP_FRAME_WIDTH)), int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))))
+            for _ in range(first, io.frame_index(video, end) + 1):
+                success, frame = video.read()
+                if success:
+                    writer.write(frame)
+            writer.release()
+            files.append(file)
+        video.release()
+
+        return files
+
+    def download_video(self, url: str, format: str, directory: str) -> str | None:
+        self.invocations += 1
+        if self._broken:
+            raise OSError("download failed")
+
+        return shutil.copy(self._file, directory)
+
+
+class TestYouTubeVideoBatch(unittest.TestCase):
+    def test_frames(self):
+        downloader = LocalDownloader(path.join(TESTING, "night.mp4"))
+        f = data.YouTubeVideo("local", downloader=downloader)
+
+        actual = list(f.frames([0.5, 2.0, 60.0]))
+        self.assertEqual(downloader.invocations, 1)
+        self.assertEqual([second for second, _ in actual], [0.5, 2.0, 60.0])
+        nptest.assert_equal(actual[0][1], io.load_frame(image_files[0.5]))
+        nptest.assert_equal(actual[1][1], io.load_frame(image_files[2.0]))
+        self.assertIsInstance(actual[2][1], Exception)
+
+    def test_batch(self):
+        downloader = LocalDownloader(path.join(TESTING, "night.mp4"))
+        f = data.YouTubeVideo("local", downloader=downloader, batch=2)
+
+        actual = list(f.frames([0.5, 1.0, 1.5, 2.0, 2.5]))
+        self.assertEqual(downloader.invocations, 3)
+        self.assertEqual([second for second, _ in actual],
+                         [0.5, 1.0, 1.5, 2.0, 2.5])
+
+    def test_get_frame(self):
+        f = data.YouTubeVideo(
+            "local", downloader=LocalDownloader(path.join(TESTING, "night.mp4")))
+
+        nptest.assert_equal(f.get_frame(2.0), io.load_frame(image_files[2.0]))
+        self.assertIsNone(f.get_frame(60.0))
+
+    def test_broken(self):
+        f = data.YouTubeVideo("local", downloader=LocalDownloader(
+            path.join(TESTING, "night.mp4"), broken=True))
+
+        for _, frame in f.frames([0.5, 2.0]):
+            self.assertIsInstance(frame, OSError)
+        with self.assertRaises(OSError):
+            f.get_frame(0.5)
+
+
+class TestYouTubeDownload(unittest.TestCase):
+    def test_frames(self):
+        downloader = LocalDownloader(path.join(TESTING, "night.mp4"))
+        f = data.YouTubeDownload("local", downloader=downloader)
+
+        actual = list(f.frames([0.5, 1.0, 1.5, 2.0]))
+        self.assertEqual(downloader.invocations, 1)
+        self.assertEqual([second for second, _ in actual], [0.5, 1.0, 1.5, 2.0])
+        nptest.assert_equal(actual[0][1], io.load_frame(image_files[0.5]))
+        nptest.assert_equal(actual[3][1], io.load_frame(image_files[2.0]))
+        self.assertEqual(f.identity, "youtube:local:396")
+
+    def test_close(self):
+        f = data.YouTubeDownload("local", downloader=LocalDownloader(
+            path.join(TESTING, "night.mp4")))
+        f.get_frame(2.0)
+        directory = f._directory.name
+
+        f.close()
+        self.assertFalse(path.exists(directory))
+
+    def test_broken(self):
+        with self.assertRaises(OSError):
+            data.YouTubeDownload("local", downloader=LocalDownloader(
+                path.join(TESTING, "night.mp4"), broken=True))
+
+
 class TestFrameGenerator(unittest.TestCase):
     def test_video_1_0(self):
         video = data.VideoFile(path.join(TESTING, "night.mp4"))
@@ -0,0 +1,40 @@
+import unittest
+
+from extractor import executor, search
+
+from .test_search import FrameIndexGenerator, StepExtractor
+
+
+def square(x: int) -> int:
+    return x * x
+
+
+class TestExecutor(unittest.TestCase):
+    def test_imap(self):
+        for backend in executor.BACKENDS:
+            with self.subTest(backend=backend), executor.create(backend, 3) as e:
+                self.assertEqual(list(e.imap(square, range(20))),
+                                 [x * x for x in range(20)])
+                # Executors are reusable.
+                self.assertEqual(list(e.imap(square, [])), [])
+                self.assertEqual(list(e.imap(square, [3])), [9])
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            executor.create("gpu")
+
+    def test_search(self):
+        generator = FrameIndexGenerator(60)
+        extractor = StepExtractor(7*60)
+
+        expected = search.Search(extractor, generator, step=10, workers=2,
+                                 refinement_accuracy=0.1, quiet=True).search()
+        for backend in executor.BACKENDS:
+            with self.subTest(backend=backend):
+                s = search.Search(extractor, generator, step=10, workers=2,
+                                  refinement_accuracy=0.1, quiet=True, backend=backend)
+                self.assertEqual(s.search(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
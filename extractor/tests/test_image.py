@@ -1,6 +1,11 @@
 import unittest
 from os import path
 
+import cv2
+import numpy as np
+from numpy import testing as nptest
+from sewar.full_ref import uqi
+
 from extractor import image, io
 
 from .constants import TESTING
@@ -39,5 +44,90 @@ class TestSimilarImage(unittest.TestCase):
         self.assertLess(actual, 0.95)
 
 
+class TestMaskedSimilarity(unittest.TestCase):
+    def validate(self, frame: str, blur: int = 0, masked: bool = True):
+        img = io.load_frame(path.join(TESTING, frame))
+        ref = io.load_frame(path.join(TESTING, "frame_hd.png"))
+        mask = io.load_frame(path.join(TESTING, "frame_mask_hd.png"))
+        expected_img = image.apply_mask(img, mask) if masked else img
+        expected_ref = image.apply_mask(ref, mask) if masked else ref
+        if blur > 0:
+            expected_img = cv2.blur(expected_img, (blur, blur))
+            expected_ref = cv2.blur(expected_ref, (blur, blur))
+        expected = float(uqi(expected_img, expected_ref))
+        actual = image.MaskedSimilarity(
+            ref, mask if masked else None, blur)(img)
+
+        self.assertAlmostEqual(actual, expected, delta=1e-9)
+
+    def test_sewar(self):
+        for frame in ["day_0_0.png", "night_2_0.png", "frame_mask_hd.png"]:
+            with self.subTest(frame=frame):
+                self.validate(frame)
+
+    def test_sewar_unmasked(self):
+        self.validate("day_0_0.png", masked=False)
+
+    def test_sewar_blur(self):
+        self.validate("day_0_0.png", blur=5)
+
+    def test_empty_mask(self):
+        img = io.load_frame(path.join(TESTING, "day_0_0.png"))
+        ref = io.load_frame(path.join(TESTING, "frame_hd.png"))
+        actual = image.MaskedSimilarity(ref, np.zeros_like(ref))(img)
+
+        self.assertEqual(actual, 1.0)
+
+
+class TestMaskIndex(unittest.TestCase):
+    def test_apply(self):
+        frame = io.load_frame(path.join(TESTING, "day_0_0.png"))
+        mask = io.load_frame(path.join(TESTING, "mask_windows.png"))
+        actual = image.MaskIndex(mask).apply(frame)
+        expected = image.apply_mask(frame, mask)
+
+        nptest.assert_equal(actual, expected)
+
+    def test_gather(self):
+        frame = np.arange(4*5*3).reshape((4, 5, 3))
+        mask = np.zeros((4, 5, 3), dtype=np.uint8)
+        mask[1, 2] = 255
+        mask[3, 0] = 255
+        index = image.MaskIndex(mask)
+
+        self.assertEqual(len(index), 2)
+        nptest.assert_equal(index.gather(frame), [frame[1, 2], frame[3, 0]])
+
+    def test_shape_mismatch(self):
+        index = image.MaskIndex(np.zeros((4, 5, 3), dtype=np.uint8))
+
+        with self.assertRaises(ValueError):
+            index.gather(np.zeros((5, 4, 3)))
+
+
+class TestMaskSet(unittest.TestCase):
+    def test_segments(self):
+        frame = np.arange(2*3*3).reshape((2, 3, 3))
+        mask_0 = np.zeros((2, 3, 3), dtype=np.uint8)
+        mask_0[0, :2] = 255
+        mask_1 = np.zeros((2, 3, 3), dtype=np.uint8)
+        mask_1[0, 1:] = 255
+        mask_1[1, 2] = 255
+        masks = image.MaskSet([mask_0, mask_1])
+
+        self.assertEqual(masks.count, 2)
+        pixels = masks.gather(frame)
+        # Overlapping pixels are only gathered once.
+        self.assertEqual(len(pixels), 4)
+        nptest.assert_equal(masks.segments, [0, 0, 1, 1, 1])
+        for i, mask in enumerate([mask_0, mask_1]):
+            nptest.assert_equal(
+                pixels[masks.positions[masks.segments == i]], image.MaskIndex(mask).gather(frame))
+
+    def test_shape_mismatch(self):
+        with self.assertRaises(ValueError):
+            image.MaskSet([np.zeros((4, 5, 3)), np.zeros((5, 4, 3))])
+
+
 if __name__ == "__main__":
     unittest.main()
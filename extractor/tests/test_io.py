@@ -1,7 +1,10 @@
+import shutil
 import tempfile
 import unittest
 from os import path
+from unittest import mock
 
+import cv2
 import numpy as np
 from numpy import testing as nptest
 
@@ -39,6 +42,99 @@ class TestGetFrame(unittest.TestCase):
         )
 
 
+class TestReadFrames(unittest.TestCase):
+    def validate(self, seconds: list[float], seek_cost: int):
+        file = path.join(TESTING, "night.mp4")
+        video = cv2.VideoCapture(file)
+        self.addCleanup(video.release)
+
+        actual = list(io.read_frames(video, seconds, seek_cost))
+        self.assertEqual([second for second, _ in actual], seconds)
+        for second, frame in actual:
+            nptest.assert_equal(frame, io.get_frame(file, second))
+
+    def test_sequential(self):
+        self.validate([0.0, 0.5, 0.5, 1.0, 1.7, 2.0, 5.0], 1000)
+
+    def test_seek(self):
+        self.validate([0.0, 0.5, 1.0, 2.0, 5.0], 0)
+
+    def test_mixed(self):
+        self.validate([0.0, 0.5, 1.0, 20.0, 20.1, 40.0], 100)
+
+    def test_keyframes(self):
+        file = path.join(TESTING, "night.mp4")
+        video = cv2.VideoCapture(file)
+        self.addCleanup(video.release)
+        keyframes = io.KeyframeIndex.build(file)
+
+        seconds = [0.0, 0.5, 3.0, 4.5, 17.0, 17.1, 30.0]
+        for second, frame in io.read_frames(video, seconds, keyframes=keyframes):
+            nptest.assert_equal(frame, io.get_frame(file, second))
+
+    def test_end(self):
+        video = cv2.VideoCapture(path.join(TESTING, "night.mp4"))
+        self.addCleanup(video.release)
+
+        actual = list(io.read_frames(video, [53.0, 54.0, 60.0], 1000))
+        self.assertIsInstance(actual[0][1], np.ndarray)
+        self.assertIsInstance(actual[1][1], Exception)
+        self.assertIsInstance(actual[2][1], Exception)
+
+
+class TestKeyframeIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.file = path.join(directory.name, "night.mp4")
+        shutil.copy(path.join(TESTING, "night.mp4"), self.file)
+
+    def test_build(self):
+        index = io.KeyframeIndex.build(self.file)
+
+        self.assertEqual(index.frame_count, 1596)
+        self.assertEqual(index.keyframes, [
+                         0, 120, 330, 510, 720, 810, 990, 1200, 1290, 1500])
+        self.assertAlmostEqual(index.length, io.video_length(self.file))
+
+    def test_load(self):
+        built = io.KeyframeIndex.load(self.file)
+        self.assertTrue(path.exists(io.KeyframeIndex.sidecar(self.file)))
+
+        # The stored index is reused without probing the video.
+        with mock.patch.object(io.KeyframeIndex, "build") as build:
+            loaded = io.KeyframeIndex.load(self.file)
+        build.assert_not_called()
+        self.assertEqual(loaded.keyframes, built.keyframes)
+        self.assertEqual(loaded.fps, built.fps)
+
+    def test_load_outdated(self):
+        io.KeyframeIndex.load(self.file)
+        with open(self.file, "ab") as f:
+            f.write(b"\0")
+
+        with mock.patch.object(io.KeyframeIndex, "build", return_value=io.KeyframeIndex(1.0, 1, [0])) as build:
+            io.KeyframeIndex.load(self.file)
+        build.assert_called_once()
+
+    def test_seek_cost(self):
+        index = io.KeyframeIndex(30.0, 300, [0, 100, 200])
+
+        self.assertEqual(index.seek_cost(0), 0)
+        self.assertEqual(index.seek_cost(116), 16)
+        # Targets right after a keyframe are seeked from the previous one.
+        self.assertEqual(index.seek_cost(115), 115)
+        self.assertEqual(index.seek_cost(250), 50)
+
+    def test_align(self):
+        index = io.KeyframeIndex(10.0, 300, [0, 100, 200])
+
+        self.assertEqual(index.align([0.0, 10.0, 15.0, 20.0], 2.0), [
+                         1.6, 11.6, 15.0, 21.6])
+        self.assertEqual(index.align([11.0, 12.0], 1.0), [11.6])
+        self.assertEqual(index.align([10.0], 0.0), [10.0])
+
+
 class TestFindFrames(unittest.TestCase):
     def test_find_frames(self):
         frame_mask = np.ones((720, 1280, 3))
@@ -1,4 +1,8 @@
+import tempfile
 import unittest
+from os import path
+
+import numpy as np
 
 from extractor import model
 
@@ -21,6 +25,25 @@ class TestModel(unittest.TestCase):
         self.assertEqual(
             actual, '{"url":"www.example.com","updates":[{"time":0.0,"hue":[[1.0,1.0,1.0]],"temp":[1.0]}]}')
 
+    def test_json_writer(self):
+        updates = [model.ColorUpdate([(1.0, 0.5, 0.25), (0.0, 0.0, 0.0)], [1.0, 2.0], 0.0),
+                   model.ColorUpdate([], [3000], 1.5),
+                   model.ColorUpdate([(0.1, 0.2, 0.3)], [], 20.0)]
+        with tempfile.TemporaryDirectory() as directory:
+            file = path.join(directory, "updates.json")
+            for compact in [False, True]:
+                for count in range(len(updates)+1):
+                    with model.JSONWriter(file, "www.example.com", compact) as writer:
+                        for update in updates[:count]:
+                            writer.write(update)
+                            # Valid after every update.
+                            with open(file) as f:
+                                model.from_json(f.read())
+
+                    with open(file) as f:
+                        self.assertEqual(f.read(), model.to_json(
+                            updates[:count], "www.example.com", compact))
+
     def test_from_json_empty(self):
         url, updates = model.from_json('{"url":"","updates":[]}')
         self.assertEqual(updates, [])
@@ -65,5 +88,33 @@ class TestModel(unittest.TestCase):
                 '{"url":"www.example.com","updates":[{"hue":[[1.0,1.0,1.0]],"temp":[1.0],"time":-1.0}]}')
 
 
+class TestTimeline(unittest.TestCase):
+    def test_timeline(self):
+        timeline = model.Timeline([
+            model.ColorUpdate([(0.1, 0.2, 0.3)], [1000.0, 2000.0], 0.0),
+            model.ColorUpdate.invalid(1.0),
+        ])
+
+        self.assertEqual(len(timeline), 2)
+        self.assertEqual(timeline.timestamps.tolist(), [0.0, 1.0])
+        self.assertEqual(timeline.invalid.tolist(), [False, True])
+        self.assertEqual(timeline.colors.shape, (2, 1, 3))
+        self.assertEqual(timeline.colors[0].tolist(), [[0.1, 0.2, 0.3]])
+        self.assertEqual(timeline.temps[0].tolist(), [1000.0, 2000.0])
+        self.assertTrue(np.all(np.isnan(timeline.temps[1])))
+
+    def test_timeline_invalid(self):
+        with self.assertRaises(ValueError):
+            model.Timeline([
+                model.ColorUpdate([(0.1, 0.2, 0.3)], [], 0.0),
+                model.ColorUpdate([], [], 1.0),
+            ])
+        with self.assertRaises(ValueError):
+            model.Timeline([
+                model.ColorUpdate([], [1000.0], 0.0),
+                model.ColorUpdate([], [], 1.0),
+            ])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+import unittest
+from os import path
+from unittest import mock
+
+import cv2
+import numpy as np
+import numpy.typing as npt
+
+from extractor import data, io, prefetch, search
+
+from .constants import TESTING
+from .test_search import FrameIndexGenerator, StepExtractor
+
+
+class SlowFrameGenerator(data.FrameGenerator):
+    def __init__(self, length: int, delay: float = 0.0) -> None:
+        self._length = length
+        self._delay = delay
+        self.fetched = 0
+        self.consumed = 0
+        self.ahead = 0
+
+    def get_frame(self, second: float) -> npt.NDArray:
+        if second > self._length:
+            raise ValueError(f"no frame for {second}s")
+        time.sleep(self._delay)
+        self.fetched += 1
+        self.ahead = max(self.ahead, self.fetched - self.consumed)
+        return np.full((10, 10, 3), int(second), dtype=np.uint8)
+
+    @property
+    def length(self) -> float:
+        return self._length
+
+
+class BrokenStreamGenerator(SlowFrameGenerator):
+    def frames(self, seconds):
+        yield 0.0, self.get_frame(0.0)
+        raise RuntimeError("stream failed")
+
+
+class TestPrefetcher(unittest.TestCase):
+    def consume(self, generator: SlowFrameGenerator, p: prefetch.Prefetcher, seconds: list[float], delay: float = 0.0):
+        actual = []
+        for second, frame in p.frames(seconds):
+            generator.consumed += 1
+            time.sleep(delay)
+            actual.append((second, frame))
+        return actual
+
+    def test_frames(self):
+        generator = SlowFrameGenerator(10)
+        p = prefetch.Prefetcher(generator, lookahead=3)
+
+        actual = self.consume(generator, p, [0.0, 1.0, 5.0, 11.0])
+        self.assertEqual([second for second, _ in actual],
+                         [0.0, 1.0, 5.0, 11.0])
+        for second, frame in actual[:3]:
+            np.testing.assert_equal(frame, np.full((10, 10, 3), int(second)))
+        self.assertIsInstance(actual[3][1], Exception)
+        self.assertEqual(p.counters["hit"] + p.counters["stall"], 4)
+
+    def test_slow_generator(self):
+        generator = SlowFrameGenerator(10, delay=0.02)
+        p = prefetch.Prefetcher(generator, lookahead=3)
+
+        self.consume(generator, p, [float(i) for i in range(5)])
+        self.assertEqual(p.counters["stall"], 5)
+
+    def test_slow_consumer(self):
+        generator = SlowFrameGenerator(10)
+        p = prefetch.Prefetcher(generator, lookahead=3)
+
+        self.consume(generator, p, [float(i)
+                     for i in range(10)], delay=0.02)
+        self.assertGreaterEqual(p.counters["hit"], 8)
+        # The yielded frame is consumed, plus the queued ones and the one waiting to be queued.
+        self.assertLessEqual(generator.ahead, 3 + 2)
+
+    def test_memory(self):
+        generator = SlowFrameGenerator(10)
+        p = prefetch.Prefetcher(generator, lookahead=8, memory=300)
+
+        self.consume(generator, p, [float(i)
+                     for i in range(10)], delay=0.02)
+        self.assertLessEqual(generator.ahead, 1 + 2)
+
+    def test_stop(self):
+        generator = SlowFrameGenerator(100)
+        p = prefetch.Prefetcher(generator, lookahead=2)
+        threads = threading.active_count()
+
+        frames = p.frames([float(i) for i in range(100)])
+        next(frames)
+        frames.close()
+        self.assertLess(generator.fetched, 10)
+        # The thread is kept for the next frames.
+        self.assertEqual(threading.active_count(), threads + 1)
+        p.close()
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_reused_thread(self):
+        file = path.join(TESTING, "night.mp4")
+        video = data.VideoFile(file)
+        p = prefetch.Prefetcher(video)
+        self.addCleanup(p.close)
+
+        # Every call streams on the same thread, which opens the video once.
+        with mock.patch("cv2.VideoCapture", wraps=cv2.VideoCapture) as capture:
+            actual = [frame for seconds in [[0.0, 0.5], [2.0], [0.5, 2.0]]
+                      for frame in p.frames(seconds)]
+        self.assertEqual(capture.call_count, 1)
+        for second, frame in actual:
+            np.testing.assert_equal(frame, io.get_frame(file, second))
+
+    def test_failure(self):
+        p = prefetch.Prefetcher(BrokenStreamGenerator(10))
+
+        with self.assertRaises(RuntimeError):
+            list(p.frames([0.0, 1.0]))
+
+    def test_get_frame(self):
+        p = prefetch.Prefetcher(SlowFrameGenerator(10))
+
+        np.testing.assert_equal(p.get_frame(2.0), np.full((10, 10, 3), 2))
+        self.assertEqual(p.counters["miss"], 1)
+
+
+class TestPrefetchedSearch(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(level=logging.ERROR)
+
+    def test_frame_counters(self):
+        def counters(**kwargs) -> dict[str, int]:
+            s = search.Search(StepExtractor(7*60), prefetch.Prefetcher(FrameIndexGenerator(60)),
+                              step=10, refinement_accuracy=0.1, quiet=True, **kwargs)
+            s.search()
+            return s.frame_counters
+
+        threads = counters(workers=2, backend="thread")
+        self.assertGreater(threads["hit"] + threads["stall"], 0)
+        # Counted by the worker processes, but added up in this process.
+        processes = counters(workers=2, backend="process")
+        self.assertEqual(processes["hit"] + processes["stall"],
+                         threads["hit"] + threads["stall"])
+
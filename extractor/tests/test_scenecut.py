@@ -0,0 +1,116 @@
+import colorsys
+import logging
+import unittest
+from collections.abc import Sequence
+from os import path
+
+import numpy as np
+import numpy.typing as npt
+
+from extractor import color, data, io, scenecut, search
+
+from .constants import TESTING
+
+
+class TintedVideo(data.FrameGenerator):
+    def __init__(self, length: float, transitions: list[float], cutaways: Sequence[tuple[float, float]] = ()):
+        """The lamps and windows of a frame change their color at the transitions, other shots are shown during the cutaways."""
+        self._length = length
+        self._transitions = transitions
+        self._cutaways = cutaways
+        self._frame = io.load_frame(path.join(TESTING, "day_0_0.png"))
+        self._other = io.load_frame(path.join(TESTING, "frame_mask_hd.png"))
+        self._areas = np.any([io.load_frame(path.join(TESTING, mask)) > 127 for mask in [
+            "mask_lamps.png", "mask_windows.png"]], axis=0)
+        self.frames_obtained = 0
+
+    def get_frame(self, second: float) -> npt.NDArray:
+        self.frames_obtained += 1
+        if any(start <= second < end for start, end in self._cutaways):
+            return self._other
+
+        index = sum(second >= transition for transition in self._transitions)
+        r, g, b = colorsys.hsv_to_rgb((index * 0.3) % 1.0, 0.8, 0.9)
+        tint = np.array([b, g, r]) * 255
+        return np.where(self._areas, (0.3 * self._frame + 0.7 * tint).astype(np.uint8), self._frame)
+
+    @property
+    def frame_rate(self) -> float | None:
+        return 60.0
+
+    @property
+    def length(self) -> float:
+        return self._length
+
+
+def masks() -> tuple[list[npt.NDArray], list[npt.NDArray], npt.NDArray, npt.NDArray]:
+    hues = [io.load_frame(path.join(TESTING, "mask_lamps.png")),
+            io.load_frame(path.join(TESTING, "mask_windows.png"))]
+    temps = [io.load_frame(path.join(TESTING, "night_0_5_mask.png"))]
+    return hues, temps, io.load_frame(path.join(TESTING, "frame_mask_hd.png")), io.load_frame(path.join(TESTING, "frame_hd.png"))
+
+
+class TestPrepass(unittest.TestCase):
+    def test_candidates(self):
+        hues, _, valid_mask, valid_content = masks()
+        video = TintedVideo(120, [30.5, 71.0], [(50.0, 60.0)])
+        prepass = scenecut.Prepass(
+            video, hues, valid_mask, valid_content, step=2.0, valid_threshold=0.9)
+
+        start, intervals = prepass.candidates()
+
+        self.assertEqual(start, 0.0)
+        # The cutaway is skipped instead of reported as two changes.
+        self.assertEqual(intervals, [(30.0, 32.0), (70.0, 72.0)])
+
+    def test_no_valid_frames(self):
+        hues, _, valid_mask, valid_content = masks()
+        video = TintedVideo(10, [], [(0.0, 10.0)])
+        prepass = scenecut.Prepass(
+            video, hues, valid_mask, valid_content, step=2.0, valid_threshold=0.9)
+
+        self.assertEqual(prepass.candidates(), (None, []))
+
+
+class TestPrepassSearch(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(level=logging.ERROR)
+
+    def test_search(self):
+        hues, temps, valid_mask, valid_content = masks()
+        extractor = search.Extractor(color.Color(
+            temp_error=0), hues, temps, valid_mask, valid_content, valid_threshold=0.9)
+        video = TintedVideo(200, [60.3, 61.9, 150.0], [(100.0, 120.0)])
+        prepass = scenecut.Prepass(
+            video, hues, valid_mask, valid_content, step=1.0, valid_threshold=0.9)
+
+        full = search.Search(extractor, video, step=20, refinement_accuracy=0.5,
+                             quiet=True, backend="inline").search()
+        updates = search.Search(extractor, video, step=20, refinement_accuracy=0.5,
+                                quiet=True, backend="inline", prepass=prepass).search()
+
+        # The short segment falls in between the steps of the full search, but not of the prepass.
+        self.assertEqual([round(u._timestamp)
+                         for u in full], [0, 62, 120, 150])
+        self.assertEqual([round(u._timestamp)
+                         for u in updates], [0, 60, 62, 120, 150])
+
+    def test_missed_candidates(self):
+        hues, temps, valid_mask, valid_content = masks()
+        extractor = search.Extractor(color.Color(
+            temp_error=0), hues, temps, valid_mask, valid_content, valid_threshold=0.9)
+        video = TintedVideo(200, [60.3, 61.9, 150.0])
+        # A threshold no change exceeds, so the prepass finds no candidates.
+        prepass = scenecut.Prepass(
+            video, hues, valid_mask, valid_content, step=1.0, color_threshold=1.0, valid_threshold=0.9)
+        self.assertEqual(prepass.candidates(), (0.0, []))
+
+        updates = search.Search(extractor, video, step=20, refinement_accuracy=0.5,
+                                quiet=True, backend="inline", prepass=prepass).search()
+
+        # The changes across the steps are still found.
+        self.assertEqual([round(u._timestamp) for u in updates], [0, 62, 150])
+
+
+if __name__ == "__main__":
+    unittest.main()
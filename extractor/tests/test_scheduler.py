@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+import unittest
+from multiprocessing.pool import ThreadPool
+
+from extractor import scheduler, search
+
+from .test_search import FrameIndexGenerator, StepExtractor
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(level=logging.ERROR)
+
+    def _tracked(self, concurrency: int, memory=None, job_memory=0, count=6):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def work(i: int):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return i
+
+        jobs = [scheduler.Job(str(i), lambda i=i: work(i), job_memory)
+                for i in range(count)]
+        results = {job.name: result for job, result in scheduler.Scheduler(
+            concurrency, memory).run(jobs)}
+        return jobs, results, peak[0]
+
+    def test_concurrency(self):
+        jobs, results, peak = self._tracked(3)
+
+        self.assertEqual(results, {str(i): i for i in range(6)})
+        self.assertEqual(peak, 3)
+        for job in jobs:
+            self.assertIsNotNone(job.finished)
+            self.assertGreater(job.running, 0.0)
+
+    def test_memory(self):
+        _, _, peak = self._tracked(4, memory=250, job_memory=100)
+
+        self.assertEqual(peak, 2)
+
+    def test_oversized(self):
+        # A job always runs on its own, even if it exceeds the budget.
+        _, results, peak = self._tracked(2, memory=50, job_memory=100, count=2)
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(peak, 1)
+
+    def test_finish_order(self):
+        jobs = [scheduler.Job("slow", lambda: time.sleep(0.2)),
+                scheduler.Job("fast", lambda: None)]
+
+        self.assertEqual([job.name for job, _ in scheduler.Scheduler(2).run(jobs)], [
+                         "fast", "slow"])
+
+    def test_failure(self):
+        def broken():
+            raise ValueError("broken")
+
+        results = list(scheduler.Scheduler(2).run(
+            [scheduler.Job("broken", broken), scheduler.Job("fine", lambda: 1)]))
+
+        self.assertEqual(len(results), 2)
+        self.assertIsInstance(
+            {job.name: result for job, result in results}["broken"], ValueError)
+
+    def test_shared_pool(self):
+        extractor = StepExtractor(7*60)
+        expected = search.Search(extractor, FrameIndexGenerator(
+            60), step=10, refinement_accuracy=0.1, quiet=True, backend="inline").search()
+
+        with ThreadPool(2) as pool:
+            jobs = [scheduler.Job(str(i), lambda: search.Search(extractor, FrameIndexGenerator(60), step=10, workers=2, refinement_accuracy=0.1, quiet=True, pool=pool).search())
+                    for i in range(3)]
+            for _, updates in scheduler.Scheduler(3).run(jobs):
+                self.assertEqual(updates, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,17 +1,28 @@
+import itertools
 import logging
+import multiprocessing
+import multiprocessing.pool
+import pickle
+import subprocess
+import sys
+import tempfile
 import unittest
+from os import path
+from unittest import mock
 
 import numpy as np
 import numpy.typing as npt
 
-from extractor import data, model, search
+from extractor import color, data, image, io, model, search
+
+from .constants import ROOT, TESTING
 
 
 class TestExtractor(search.AbstractExtractor):
-    def __init__(self, valid_frames: list[int] = [], similar_frames: dict[int, int] = {}, updates: dict[int, model.ColorUpdate] = {}) -> None:
-        self._valid_frames = valid_frames
-        self._updates = updates
-        self._similar_frames = similar_frames
+    def __init__(self, valid_frames: list[int] | None = None, similar_frames: dict[int, int] | None = None, updates: dict[int, model.ColorUpdate] | None = None) -> None:
+        self._valid_frames = valid_frames or []
+        self._updates = updates or {}
+        self._similar_frames = similar_frames or {}
 
     def is_valid(self, frame: npt.NDArray) -> bool:
         """Checks if the frame is valid for the scheme."""
@@ -69,6 +80,280 @@ class BrokenFrameGenerator(data.FrameGenerator):
         return float(self._length)
 
 
+class FrameIndexGenerator(data.FrameGenerator):
+    def __init__(self, length: int) -> None:
+        """Frames are their index at 60fps."""
+        self._length = length
+
+    def get_frame(self, second: float) -> npt.NDArray:
+        return np.array([round(second * 60)])
+
+    @property
+    def frame_rate(self) -> float | None:
+        return 60.0
+
+    @property
+    def length(self) -> float:
+        return self._length
+
+
+class StepExtractor(search.AbstractExtractor):
+    def __init__(self, frames: int) -> None:
+        """The color changes every number of frames."""
+        self._frames = frames
+
+    def is_valid(self, frame: npt.NDArray) -> bool:
+        return True
+
+    def extract(self, frame: npt.NDArray) -> model.ColorUpdate:
+        return model.ColorUpdate([], [int(frame.item()) // self._frames])
+
+    def similar(self, update1: model.ColorUpdate, update2: model.ColorUpdate) -> bool:
+        return update1._temps == update2._temps
+
+
+class TransitionExtractor(search.AbstractExtractor):
+    def __init__(self, transitions: list[float]) -> None:
+        """The color changes at the given seconds (of frames at 60fps)."""
+        self._transitions = [round(t * 60) for t in transitions]
+
+    def is_valid(self, frame: npt.NDArray) -> bool:
+        return True
+
+    def extract(self, frame: npt.NDArray) -> model.ColorUpdate:
+        return model.ColorUpdate([], [sum(int(frame.item()) >= t for t in self._transitions)])
+
+    def similar(self, update1: model.ColorUpdate, update2: model.ColorUpdate) -> bool:
+        return update1._temps == update2._temps
+
+
+class TestColorExtractor(unittest.TestCase):
+    def setUp(self) -> None:
+        self.c = color.Color()
+        self.hues = [
+            io.load_frame(path.join(TESTING, "mask_lamps.png")),
+            io.load_frame(path.join(TESTING, "mask_windows.png")),
+        ]
+        self.temps = [
+            io.load_frame(path.join(TESTING, "night_0_5_mask.png")),
+        ]
+        self.valid_mask = io.load_frame(
+            path.join(TESTING, "frame_mask_hd.png"))
+        self.valid_content = io.load_frame(path.join(TESTING, "frame_hd.png"))
+        self.extractor = search.Extractor(
+            self.c, self.hues, self.temps, self.valid_mask, self.valid_content, valid_threshold=0.95)
+
+    def test_is_valid(self):
+        frame = io.load_frame(path.join(TESTING, "day_0_0.png"))
+        expected = image.similar_image(
+            frame, self.valid_content, self.valid_mask)
+
+        self.assertTrue(self.extractor.is_valid(frame))
+        self.assertGreater(expected, 0.95)
+        self.assertFalse(self.extractor.is_valid(self.valid_mask))
+
+    def test_is_valid_cascade(self):
+        frame = io.load_frame(path.join(TESTING, "day_0_0.png"))
+        extractor = search.Extractor(
+            self.c, self.hues, self.temps, self.valid_mask, self.valid_content, valid_threshold=0.95, cascade_scale=0.25, cascade_margin=0.05)
+
+        # Close to the threshold, so the full frame is checked.
+        self.assertTrue(extractor.is_valid(frame))
+        self.assertEqual(extractor.cascade_counters, {
+                         "thumbnail": 0, "full": 1})
+        # Obviously different, so the thumbnail decides.
+        self.assertFalse(extractor.is_valid(self.valid_mask))
+        self.assertEqual(extractor.cascade_counters, {
+                         "thumbnail": 1, "full": 1})
+
+    def test_is_valid_no_cascade(self):
+        extractor = search.Extractor(
+            self.c, self.hues, self.temps, self.valid_mask, self.valid_content, valid_threshold=0.95, cascade_scale=1)
+
+        self.assertFalse(extractor.is_valid(self.valid_mask))
+        self.assertEqual(extractor.cascade_counters, {
+                         "thumbnail": 0, "full": 1})
+
+    def test_extract(self):
+        frame = io.load_frame(path.join(TESTING, "day_0_0.png"))
+        actual = self.extractor.extract(frame)
+        expected = model.ColorUpdate(
+            [self.c.hue(frame, area) for area in self.hues],
+            [self.c.temp(frame, area) for area in self.temps],
+        )
+
+        self.assertEqual(actual, expected)
+
+    def test_pickle(self):
+        frame = io.load_frame(path.join(TESTING, "day_0_0.png"))
+        pickled = pickle.dumps(self.extractor)
+
+        # Only references to the shared masks are pickled.
+        self.assertLess(len(pickled), 10000)
+        restored = pickle.loads(pickled)
+        self.assertIs(pickle.loads(pickled), restored)
+        self.assertEqual(restored.extract(frame),
+                         self.extractor.extract(frame))
+
+    def test_attached(self):
+        def extractor() -> search.Extractor:
+            return search.Extractor(
+                self.c, self.hues, self.temps, self.valid_mask, self.valid_content, valid_threshold=0.95)
+
+        first, second, third = extractor(), extractor(), extractor()
+        self.addCleanup(first.close)
+        self.addCleanup(second.close)
+        self.addCleanup(third.close)
+        restored = pickle.loads(pickle.dumps(first))
+
+        # Concurrent searches keep their extractors attached, up to the limit.
+        with mock.patch.object(search, "_attached_limit", 2):
+            pickle.loads(pickle.dumps(second))
+            self.assertIs(pickle.loads(pickle.dumps(first)), restored)
+            pickle.loads(pickle.dumps(third))
+            self.assertIs(pickle.loads(pickle.dumps(first)), restored)
+            assert second._shared is not None
+            self.assertNotIn(second._shared.valid_content.name, search._attached)
+
+        # The extractor of a search that ended is detached.
+        assert first._shared is not None
+        name = first._shared.valid_content.name
+        first.close()
+        pickle.loads(pickle.dumps(second))
+        self.assertNotIn(name, search._attached)
+
+    def test_workers_shared_memory(self):
+        # In a new interpreter, so no memory was shared before the workers start (like `critrole_extract.py -w 2`).
+        script = """
+from os import path
+from extractor import color, data, io, search
+from tests.constants import TESTING
+extractor = search.Extractor(color.Color(), [io.load_frame(path.join(TESTING, "mask_lamps.png"))], [io.load_frame(path.join(TESTING, "night_0_5_mask.png"))],
+                             io.load_frame(path.join(TESTING, "frame_mask_hd.png")), io.load_frame(path.join(TESTING, "frame_hd.png")))
+search.Search(extractor, data.VideoFile(path.join(TESTING, "night.mp4")), step=1, workers=2, quiet=True).search()
+"""
+        result = subprocess.run([sys.executable, "-c", script],
+                                cwd=path.dirname(ROOT), capture_output=True, text=True, check=False)
+
+        # The masks are freed once by this process, not by the workers.
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertNotIn("leaked", result.stderr)
+        self.assertNotIn("Traceback", result.stderr)
+
+    def test_pool(self):
+        frames = [io.load_frame(path.join(TESTING, "day_0_0.png")),
+                  self.valid_mask]
+        with multiprocessing.get_context("fork").Pool(2) as p:
+            actual = p.map(self.extractor.is_valid, frames)
+
+        self.assertEqual(actual, [True, False])
+
+    def test_cascade_counters_workers(self):
+        files = {0: "day_0_0.png", 1: "frame_mask_hd.png", 2: "day_0_0.png"}
+        d = data.ImageFiles({second: path.join(TESTING, file)
+                            for second, file in files.items()})
+        inline = search.Extractor(
+            self.c, self.hues, self.temps, self.valid_mask, self.valid_content, valid_threshold=0.95)
+        search.Search(inline, d, step=1, quiet=True,
+                      backend="inline").search()
+        search.Search(self.extractor, d, step=1, workers=2,
+                      quiet=True, backend="process").search()
+
+        # Counted by the workers, but added up in this process.
+        self.assertGreater(sum(inline.cascade_counters.values()), 0)
+        self.assertEqual(self.extractor.cascade_counters,
+                         inline.cascade_counters)
+        # The masks shared with the workers are freed once the search ends.
+        self.assertIsNone(self.extractor._shared)
+
+
+class TestRefinement(unittest.TestCase):
+    @staticmethod
+    def update(second: float, transitions: list[float]) -> model.ColorUpdate:
+        color = sum(second >= transition for transition in transitions)
+        return model.ColorUpdate([], [color], second)
+
+    @staticmethod
+    def similar(update1: model.ColorUpdate, update2: model.ColorUpdate) -> bool:
+        return update1._temps == update2._temps
+
+    def refine(self, transitions: list[float], k: int) -> tuple[float, int]:
+        refinement = search._Refinement(self.update(
+            0.0, transitions), self.update(100.0, transitions), 1.0)
+        rounds = 0
+        while steps := refinement.probe(k):
+            refinement.advance([self.update(step, transitions)
+                               for step in steps], self.similar)
+            rounds += 1
+
+        assert refinement.timestamp is not None
+        return refinement.timestamp, rounds
+
+    def test_probe(self):
+        refinement = search._Refinement(self.update(
+            0.0, [50.0]), self.update(100.0, [50.0]), 1.0)
+
+        self.assertEqual(refinement.probe(), [50.0])
+        self.assertEqual(refinement.probe(3), [25.0, 50.0, 75.0])
+        # No more probes than needed for the accuracy.
+        self.assertEqual(len(refinement.probe(1000)), 100)
+
+    def test_k_ary(self):
+        binary, binary_rounds = self.refine([37.3], 1)
+        k_ary, k_ary_rounds = self.refine([37.3], 7)
+
+        self.assertTrue(37.3 <= binary < 38.3)
+        self.assertTrue(37.3 <= k_ary < 38.3)
+        self.assertEqual(binary_rounds, 7)
+        self.assertEqual(k_ary_rounds, 3)
+
+    def test_fallback(self):
+        # Two transitions in between the probes, so the even split is not clean.
+        refinement = search._Refinement(self.update(
+            0.0, [10.0, 90.0]), self.update(100.0, [10.0, 90.0]), 1.0)
+        steps = refinement.probe(3)
+        refinement.advance([self.update(step, [10.0, 90.0])
+                           for step in steps], self.similar)
+
+        self.assertEqual(refinement.probe(3), [50.0])
+
+
+class TestInterpolation(unittest.TestCase):
+    @staticmethod
+    def update(second: float, start: float, end: float) -> model.ColorUpdate:
+        # Fades the temperature from 0 to 10 in between start and end.
+        return model.ColorUpdate([], [min(max((second - start) / (end - start), 0.0), 1.0) * 10], second)
+
+    @staticmethod
+    def distance(update1: model.ColorUpdate, update2: model.ColorUpdate) -> float:
+        return abs(update1._temps[0] - update2._temps[0])
+
+    def refine(self, start: float, end: float, interpolate: bool) -> tuple[float, int]:
+        refinement = search._Refinement(self.update(0.0, start, end), self.update(
+            100.0, start, end), 1.0, self.distance if interpolate else None)
+        probes = 0
+        while steps := refinement.probe():
+            refinement.advance([self.update(step, start, end)
+                               for step in steps], lambda u1, u2: self.distance(u1, u2) <= 1)
+            probes += len(steps)
+
+        assert refinement.timestamp is not None
+        return refinement.timestamp, probes
+
+    def test_fade(self):
+        _, bisect_probes = self.refine(30.0, 50.0, False)
+        interpolate, interpolate_probes = self.refine(30.0, 50.0, True)
+
+        # Where the fade is halfway.
+        self.assertTrue(39.0 <= interpolate < 41.0)
+        self.assertLess(interpolate_probes, bisect_probes)
+
+    def test_cut(self):
+        # Bisects in between the plateaus, just like without the distance.
+        self.assertEqual(self.refine(37.3, 37.3001, True),
+                         self.refine(37.3, 37.3001, False))
+
+
 class TestSearch(unittest.TestCase):
     def setUp(self) -> None:
         logging.basicConfig(level=logging.ERROR)
@@ -99,6 +384,19 @@ class TestSearch(unittest.TestCase):
 
         self.assertEqual(actual, expected)
 
+    def test_search_raw_workers(self):
+        generator = TestFrameGenerator(20)
+        extractor = TestExtractor(
+            updates={i: model.ColorUpdate([], [i]) for i in range(21)},
+            valid_frames=list(range(0, 21, 2)),
+        )
+        actual = search.Search(extractor, generator,
+                               step=2, workers=3, quiet=True)._search_raw()
+        expected = [model.ColorUpdate([], [i], float(i))
+                    for i in range(0, 21, 2)]
+
+        self.assertEqual(actual, expected)
+
     def test_search_raw_broken_generator(self):
         generator = BrokenFrameGenerator(3)
         extractor = TestExtractor()
@@ -162,6 +460,259 @@ class TestSearch(unittest.TestCase):
 
         self.assertEqual(actual, expected)
 
+    def test_search_pool(self):
+        generator = TestFrameGenerator(4)
+        extractor = TestExtractor(
+            updates={i: model.ColorUpdate([], [i]) for i in range(5)},
+            valid_frames=list(range(5)),
+        )
+
+        with multiprocessing.Pool(2) as p:
+            for _ in range(2):
+                s = search.Search(extractor, generator,
+                                  step=2, quiet=True, pool=p)
+                actual = s.search()
+                self.assertEqual(actual, [model.ColorUpdate(
+                    [], [i], float(i)) for i in [0, 2, 4]])
+                # The pool is left open for the next search.
+                self.assertEqual(p.apply(abs, (-1,)), 1)
+
+    def test_memoize(self):
+        generator = TestFrameGenerator(15)
+        extractor = TestExtractor(
+            updates={8: model.ColorUpdate([], [8])},
+            valid_frames=list(range(16)),
+        )
+        s = search.Search(extractor, generator, quiet=True)
+
+        with s._memoized():
+            self.assertEqual(s._search_step(8.0),
+                             model.ColorUpdate([], [8], 8.0))
+            # Within the same frame, the copy carries the requested timestamp.
+            self.assertEqual(s._search_step(8.001),
+                             model.ColorUpdate([], [8], 8.001))
+            self.assertEqual(s._search_steps([4.0, 8.0]), [
+                model.ColorUpdate.invalid(4.0), model.ColorUpdate([], [8], 8.0)])
+            self.assertEqual(s._search_step(4.0),
+                             model.ColorUpdate.invalid(4.0))
+        self.assertEqual(s.saved_evaluations, 3)
+
+    def test_memoize_manager(self):
+        extractor = StepExtractor(5*60)
+
+        # Only worker processes share the evaluations through a manager.
+        for backend, workers, expected in [("process", 1, 0), ("thread", 2, 0), ("process", 2, 1)]:
+            with self.subTest(backend=backend, workers=workers), mock.patch("extractor.search.Manager", wraps=multiprocessing.Manager) as manager:
+                search.Search(extractor, FrameIndexGenerator(16), step=4, workers=workers,
+                              quiet=True, backend=backend).search()
+                self.assertEqual(manager.call_count, expected)
+
+    def test_close_data(self):
+        class ClosingGenerator(FrameIndexGenerator):
+            closed = 0
+
+            def close(self):
+                ClosingGenerator.closed += 1
+
+        extractor = StepExtractor(5*60)
+        search.Search(extractor, ClosingGenerator(16),
+                      step=4, quiet=True).search()
+        self.assertEqual(ClosingGenerator.closed, 1)
+
+        # Also when the stream is not consumed to the end.
+        stream = search.Search(extractor, ClosingGenerator(
+            16), step=4, quiet=True).stream()
+        next(stream)
+        stream.close()
+        self.assertEqual(ClosingGenerator.closed, 2)
+
+    def test_memoize_search(self):
+        generator = FrameIndexGenerator(16)
+        extractor = StepExtractor(5*60)
+
+        expected = search.Search(extractor, generator, step=4, workers=2,
+                                 refinement_accuracy=0.001, quiet=True, memoize=False).search()
+        s = search.Search(extractor, generator, step=4, workers=2,
+                          refinement_accuracy=0.001, quiet=True)
+        self.assertEqual(s.search(), expected)
+        # Below the frame rate, refinements land on already evaluated frames.
+        self.assertGreater(s.saved_evaluations, 0)
+
+    def test_search_compact_waves(self):
+        generator = FrameIndexGenerator(60)
+        # Transitions every 7s, some several per coarse step.
+        extractor = StepExtractor(7*60)
+        raw = [model.ColorUpdate([], [round(t*60) // (7*60)], float(t))
+               for t in range(0, 61, 10)]
+
+        s = search.Search(extractor, generator, workers=3,
+                          refinement_accuracy=0.1, quiet=True, memoize=False)
+        expected = [s._refine((first, second))
+                    for first, second in itertools.pairwise(raw) if not extractor.similar(first, second)]
+        actual = s._search_compact(raw)
+
+        self.assertEqual(
+            [update._timestamp for update in actual[1:]], expected)
+
+    def test_search_adaptive(self):
+        generator = FrameIndexGenerator(600)
+        # Several transitions within one coarse step.
+        extractor = TransitionExtractor([100.0, 110.0, 120.0, 300.0])
+
+        fixed = search.Search(extractor, generator, step=120,
+                              refinement_accuracy=0.5, quiet=True).search()
+        s = search.Search(extractor, generator, step=120,
+                          refinement_accuracy=0.5, quiet=True, min_step=2.0)
+        adaptive = s.search()
+
+        self.assertEqual(len(fixed), 3)
+        self.assertEqual([round(update._timestamp) for update in adaptive], [
+                         0, 100, 110, 120, 300])
+        self.assertEqual(s.coverage, 1.0)
+
+    def test_search_adaptive_budget(self):
+        generator = FrameIndexGenerator(600)
+        extractor = TransitionExtractor([100.0, 110.0, 120.0, 300.0])
+
+        s = search.Search(extractor, generator, step=120,
+                          quiet=True, min_step=2.0, budget=8)
+        raw = s._search_adaptive()
+
+        self.assertEqual(len(raw), 8)
+        self.assertLess(s.coverage, 1.0)
+
+    def test_stream(self):
+        generator = FrameIndexGenerator(60)
+        extractor = StepExtractor(7*60)
+
+        expected = search.Search(extractor, generator, step=10,
+                                 refinement_accuracy=0.1, quiet=True).search()
+        actual = list(search.Search(extractor, generator, step=10,
+                                    refinement_accuracy=0.1, quiet=True).stream())
+
+        self.assertEqual(actual, expected)
+
+    def test_stream_compact_early(self):
+        class CountingGenerator(FrameIndexGenerator):
+            frames_obtained = 0
+
+            def get_frame(self, second: float) -> npt.NDArray:
+                CountingGenerator.frames_obtained += 1
+                return super().get_frame(second)
+
+        extractor = TransitionExtractor([1.0, 30.0])
+        raw = [model.ColorUpdate([], [0], 0.0), model.ColorUpdate(
+            [], [1], 2.0), model.ColorUpdate([], [2], 60.0)]
+
+        with multiprocessing.pool.ThreadPool(1) as p:
+            s = search.Search(extractor, CountingGenerator(60), refinement_accuracy=0.1,
+                              quiet=True, pool=p, memoize=False)
+            stream = s._stream_compact(raw)
+            self.assertEqual(next(stream)._timestamp, 0.0)
+            self.assertAlmostEqual(next(stream)._timestamp, 1.0, delta=0.1)
+            # The short interval is final long before the long one.
+            early = CountingGenerator.frames_obtained
+            self.assertAlmostEqual(next(stream)._timestamp, 30.0, delta=0.1)
+            self.assertLess(early, CountingGenerator.frames_obtained)
+
+    def test_checkpoint(self):
+        class CountingGenerator(FrameIndexGenerator):
+            frames_obtained = 0
+
+            def get_frame(self, second: float) -> npt.NDArray:
+                CountingGenerator.frames_obtained += 1
+                return super().get_frame(second)
+
+        extractor = TransitionExtractor([3.0, 7.0, 31.0, 44.0])
+        with tempfile.TemporaryDirectory() as directory, multiprocessing.pool.ThreadPool(2) as p:
+            def run(checkpoint: str | None = None):
+                return search.Search(extractor, CountingGenerator(60), step=10, workers=2, refinement_accuracy=0.1,
+                                     quiet=True, pool=p, checkpoint=checkpoint)
+
+            expected = run().search()
+            uninterrupted = CountingGenerator.frames_obtained
+
+            CountingGenerator.frames_obtained = 0
+            checkpoint = path.join(directory, "search.checkpoint")
+            stream = run(checkpoint).stream()
+            # Interrupted once the first transitions are refined.
+            updates = [next(stream), next(stream)]
+            stream.close()
+            self.assertTrue(path.exists(checkpoint))
+
+            actual = run(checkpoint).search()
+
+            self.assertEqual(actual, expected)
+            self.assertEqual(actual[:2], updates)
+            # No frame is obtained twice.
+            self.assertEqual(
+                CountingGenerator.frames_obtained, uninterrupted)
+            self.assertFalse(path.exists(checkpoint))
+
+    def test_checkpoint_different_search(self):
+        generator = FrameIndexGenerator(60)
+        extractor = TransitionExtractor([3.0, 31.0])
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = path.join(directory, "search.checkpoint")
+            s = search.Search(extractor, generator, step=10,
+                              quiet=True, checkpoint=checkpoint)
+            with s._memoized():
+                s._save(s._search_raw())
+
+            other = search.Search(extractor, generator, step=20,
+                                  quiet=True, checkpoint=checkpoint)
+            self.assertEqual(other._load(), {})
+            self.assertEqual(other.search(), search.Search(
+                extractor, generator, step=20, quiet=True).search())
+
+    def test_checkpoint_log(self):
+        generator = FrameIndexGenerator(60)
+        extractor = TransitionExtractor([3.0, 7.0, 31.0, 44.0])
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = path.join(directory, "search.checkpoint")
+            stream = search.Search(extractor, generator, step=10, refinement_accuracy=0.1,
+                                   quiet=True, checkpoint=checkpoint).stream()
+            next(stream)
+            next(stream)
+            stream.close()
+
+            records = []
+            with open(checkpoint, "rb") as f:
+                while f.peek(1):
+                    records.append(pickle.load(f))
+            # Every record only holds the evaluations since the previous one.
+            self.assertGreater(len(records), 2)
+            keys = [key for record in records for key in record["evaluations"]]
+            self.assertEqual(len(keys), len(set(keys)))
+
+            # A record cut off by an interruption is left out.
+            with open(checkpoint, "ab") as f:
+                f.write(pickle.dumps(records[-1])[:10])
+            s = search.Search(extractor, generator, step=10, refinement_accuracy=0.1,
+                              quiet=True, checkpoint=checkpoint)
+            state = s._load()
+            self.assertEqual(set(state["evaluations"]), set(keys))
+            # The checkpoint is compacted when resuming.
+            with open(checkpoint, "rb") as f:
+                pickle.load(f)
+                self.assertEqual(f.read(), b"")
+            self.assertEqual(s.search(), search.Search(
+                extractor, generator, step=10, refinement_accuracy=0.1, quiet=True).search())
+
+    def test_checkpoint_parameters(self):
+        c = color.Color()
+        masks = [np.zeros((4, 4, 3), dtype=np.uint8)] * 4
+
+        def parameters(**kwargs) -> dict:
+            extractor = search.Extractor(
+                kwargs.pop("c", c), masks[:1], masks[1:2], masks[2], masks[3], **kwargs)
+            return search.Search(extractor, FrameIndexGenerator(60), quiet=True)._parameters()
+
+        self.assertEqual(parameters(), parameters())
+        for changed in [{"valid_threshold": 0.5}, {"cascade_scale": 0.5}, {"cascade_margin": 0.2}, {"c": color.Color(brightness_cutoff=0.1)}, {"c": color.Color(temp_error=0)}]:
+            with self.subTest(changed=changed):
+                self.assertNotEqual(parameters(**changed), parameters())
+
     def test_search_compact_factors(self):
         generator = TestFrameGenerator(3)
         extractor = TestExtractor(
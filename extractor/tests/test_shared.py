@@ -0,0 +1,80 @@
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+import unittest
+from multiprocessing import shared_memory
+from os import path
+
+import numpy as np
+from numpy import testing as nptest
+
+from extractor import shared
+
+from .constants import ROOT
+
+
+def _sum(array: shared.SharedArray) -> int:
+    return int(array.array.sum())
+
+
+class TestSharedArray(unittest.TestCase):
+    def test_pickle(self):
+        expected = np.arange(1000*1000, dtype=np.int64).reshape(1000, 1000)
+        array = shared.SharedArray(expected)
+        self.addCleanup(array.close)
+
+        pickled = pickle.dumps(array)
+        self.assertLess(len(pickled), 1000)
+        restored = pickle.loads(pickled)
+        nptest.assert_equal(restored.array, expected)
+        self.assertFalse(restored.array.flags.writeable)
+
+    def test_processes(self):
+        expected = np.ones((100, 100, 3), dtype=np.uint8)
+        array = shared.SharedArray(expected)
+        self.addCleanup(array.close)
+
+        with multiprocessing.Pool(2) as p:
+            self.assertEqual(p.map(_sum, [array, array]), [30000, 30000])
+
+    def test_workers_exit(self):
+        # In a new interpreter, so the workers start before any resource tracker and start their own.
+        script = """
+import multiprocessing
+import numpy as np
+from extractor import shared
+from tests.test_shared import _sum
+with multiprocessing.get_context("fork").Pool(2) as p:
+    array = shared.SharedArray(np.ones(10))
+    assert p.map(_sum, [array, array]) == [10, 10]
+assert not array.freed
+array.close()
+assert array.freed
+"""
+        result = subprocess.run([sys.executable, "-c", script],
+                                cwd=path.dirname(ROOT), capture_output=True, text=True, check=False)
+
+        # The memory outlives the workers that attached to it, until its creator frees it.
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertNotIn("leaked", result.stderr)
+
+    def test_close(self):
+        array = shared.SharedArray(np.ones(10))
+        name = array.name
+        restored = pickle.loads(pickle.dumps(array))
+        self.assertFalse(restored.freed)
+        array.close()
+        self.assertTrue(restored.freed)
+
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name)
+
+    def test_close_unlinked(self):
+        array = shared.SharedArray(np.ones(10))
+        # Unlinked by another process (e.g. its resource tracker).
+        os.remove(path.join("/dev/shm", array.name))
+
+        array.close()
+        self.assertTrue(array.freed)
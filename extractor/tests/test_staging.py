@@ -0,0 +1,186 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import unittest
+from os import path
+
+import numpy as np
+
+from extractor import color, data, io, model, search, staging
+
+from .constants import TESTING
+from .test_search import (
+    FrameIndexGenerator,
+    StepExtractor,
+    TestExtractor,
+    TestFrameGenerator,
+)
+
+
+class TestPipeline(unittest.TestCase):
+    def test_run(self):
+        pipeline = staging.Pipeline([
+            staging.Stage("split", lambda x: [x, -x], workers=2),
+            staging.Stage("square", lambda x: [x * x], workers=3),
+        ])
+
+        self.assertEqual(sorted(pipeline.run(range(10))), sorted(
+            [x * x for x in range(10)] * 2))
+        self.assertEqual(pipeline.metrics["split"].items, 10)
+        self.assertEqual(pipeline.metrics["square"].items, 20)
+
+    def test_backpressure(self):
+        context = multiprocessing.get_context("fork")
+        produced = context.Value("i", 0)
+        consumed = context.Event()
+
+        def produce(x):
+            with produced.get_lock():
+                produced.value += 1
+            yield x
+
+        def consume(x):
+            consumed.wait()
+            yield x
+
+        pipeline = staging.Pipeline([
+            staging.Stage("produce", produce, queue_size=1),
+            staging.Stage("consume", consume, queue_size=2),
+        ])
+        thread = threading.Thread(target=pipeline.run, args=(range(100),))
+        thread.start()
+        time.sleep(0.5)
+        # One item in the consumer, two waiting for it and one blocked in the producer.
+        self.assertLessEqual(produced.value, 4)
+        consumed.set()
+        thread.join()
+        self.assertEqual(produced.value, 100)
+
+    def test_frames(self):
+        frames = [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(20)]
+
+        def decode(i):
+            yield i, frames[i]
+
+        def check(item):
+            i, frame = item
+            self.assertFalse(frame.flags.writeable)
+            yield i, frame
+
+        def mean(item):
+            i, frame = item
+            yield i, float(frame.mean())
+
+        pipeline = staging.Pipeline([
+            staging.Stage("decode", decode, queue_size=2),
+            staging.Stage("check", check, workers=2, queue_size=2),
+            staging.Stage("mean", mean, workers=2),
+        ], frame_size=frames[0].nbytes)
+
+        self.assertEqual(sorted(pipeline.run(range(20))),
+                         [(i, float(i)) for i in range(20)])
+
+    def test_large_frames(self):
+        pipeline = staging.Pipeline([
+            staging.Stage("decode", lambda i: [(i, np.full(100, i))]),
+            staging.Stage("sum", lambda item: [int(item[1].sum())]),
+        ], frame_size=8)
+
+        self.assertEqual(sorted(pipeline.run(range(5))),
+                         [100 * i for i in range(5)])
+
+    def test_reports(self):
+        pipeline = staging.Pipeline([
+            staging.Stage("identity", lambda x: [x], workers=2),
+            staging.Stage("pid", lambda x: [os.getpid()], workers=3),
+        ], report=os.getpid)
+
+        pids = pipeline.run(range(20))
+        self.assertEqual(len(pipeline.reports), 5)
+        self.assertNotIn(os.getpid(), pipeline.reports)
+        self.assertLessEqual(set(pids), set(pipeline.reports))
+
+    def test_failure(self):
+        def broken(x):
+            raise ValueError("broken")
+
+        pipeline = staging.Pipeline([
+            staging.Stage("identity", lambda x: [x]),
+            staging.Stage("broken", broken, workers=2),
+        ])
+        with self.assertRaises(ValueError):
+            pipeline.run(range(100))
+
+    def test_failure_items(self):
+        def items():
+            yield from range(10)
+            raise ValueError("broken")
+
+        pipeline = staging.Pipeline([
+            staging.Stage("identity", lambda x: [x], workers=2)])
+        with self.assertRaises(ValueError):
+            pipeline.run(items())
+
+    def test_bottleneck(self):
+        def slow(x):
+            time.sleep(0.01)
+            yield x
+
+        pipeline = staging.Pipeline([
+            staging.Stage("fast", lambda x: [x]),
+            staging.Stage("slow", slow),
+        ])
+        pipeline.run(range(20))
+
+        self.assertGreater(pipeline.metrics["slow"].utilization, 0.8)
+        self.assertLess(pipeline.metrics["fast"].utilization, 0.5)
+
+
+class TestStagedSearch(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.basicConfig(level=logging.ERROR)
+
+    def test_search(self):
+        generator = FrameIndexGenerator(60)
+        extractor = StepExtractor(7*60)
+
+        expected = search.Search(extractor, generator, step=10, workers=2,
+                                 refinement_accuracy=0.1, quiet=True).search()
+        s = search.Search(extractor, generator, step=10, workers=2, refinement_accuracy=0.1,
+                          quiet=True, stages={"decode": (1, 2), "extract": (3, 4)})
+
+        self.assertEqual(s.search(), expected)
+        self.assertEqual(s.stage_metrics["decode"].workers, 1)
+        self.assertEqual(s.stage_metrics["validate"].workers, 2)
+        self.assertEqual(s.stage_metrics["extract"].workers, 3)
+        self.assertGreater(s.stage_metrics["extract"].items, 0)
+
+    def test_invalid(self):
+        generator = TestFrameGenerator(10)
+        extractor = TestExtractor(valid_frames=[])
+        s = search.Search(extractor, generator, step=2,
+                          quiet=True, stages={})
+
+        self.assertEqual(s._search_raw(), [
+            model.ColorUpdate.invalid(float(i)) for i in range(0, 11, 2)])
+
+    def test_extractor(self):
+        files = {0: "day_0_0.png", 1: "frame_mask_hd.png", 2: "day_0_0.png"}
+        d = data.ImageFiles({second: path.join(TESTING, file)
+                            for second, file in files.items()})
+
+        def extractor() -> search.Extractor:
+            return search.Extractor(color.Color(), [io.load_frame(path.join(TESTING, "mask_lamps.png"))], [io.load_frame(path.join(TESTING, "night_0_5_mask.png"))],
+                                    io.load_frame(path.join(TESTING, "frame_mask_hd.png")), io.load_frame(path.join(TESTING, "frame_hd.png")), valid_threshold=0.95)
+
+        inline, staged = extractor(), extractor()
+        expected = search.Search(
+            inline, d, step=1, quiet=True, backend="inline").search()
+        s = search.Search(staged, d, step=1, quiet=True, stages={})
+
+        # The frames pass between the stages through shared memory, the counters of the stages are added up in this process.
+        self.assertEqual(s.search(), expected)
+        self.assertEqual(staged.cascade_counters, inline.cascade_counters)
+        self.assertEqual(s.stage_metrics["extract"].items, 3)